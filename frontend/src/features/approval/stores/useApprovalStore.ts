@@ -49,7 +49,8 @@ export const useApprovalStore = create<ApprovalStore>()(
           sendMessage({
             type: 'approval_response',
             approval_id: currentRequest.approval_id,
-            approved
+            approved,
+            ...(currentRequest.conversation_id ? { conversation_id: currentRequest.conversation_id } : {})
           })
         }
 
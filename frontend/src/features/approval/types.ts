@@ -9,6 +9,8 @@ export interface ToolInstance {
   name: string
   status: ToolStatus
   timestamp: Date
+  // Arguments as JSON text; partial while the model is still generating them
+  args?: string
   result?: string
 }
 
@@ -62,6 +62,7 @@ function ToolItem({ tool }: ToolItemProps) {
         <div className="tool-item-inline">
           <div className={`tool-status-dot ${statusInfo.dot}`}></div>
           <span className="tool-name">{tool.name}</span>
+          {tool.args && <span className="tool-args" title={tool.args}>{tool.args}</span>}
           <span className="tool-status-text">— {statusInfo.text}</span>
         </div>
       </div>
@@ -80,13 +80,15 @@ export class MessageService {
 
   static createToolInstance(
     toolId: string,
-    name: string
+    name: string,
+    args?: string
   ): ToolInstance {
     return {
       id: toolId,
       name,
       status: 'pending_approval',
-      timestamp: this.now()
+      timestamp: this.now(),
+      ...(args ? { args } : {})
     }
   }
 }
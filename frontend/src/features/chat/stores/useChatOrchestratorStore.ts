@@ -7,6 +7,7 @@ import { useApprovalStore } from '../../approval/stores/useApprovalStore'
 import { useConnectionStore } from '../../connection/stores/useConnectionStore'
 import { useMessagesStore } from './useMessagesStore'
 import { useConversationStore } from '../../conversations/stores/useConversationStore'
+import { getApiBase } from '../../../shared/utils/api'
 
 interface ChatOrchestratorActions {
   // Idempotent stub creation flags
@@ -30,6 +31,7 @@ interface ChatOrchestratorActions {
   handleThinkingDelta: (content: string) => void
   handleThinkingComplete: () => void
   handleToolSessionStart: () => void
+  handleToolArgsDelta: (toolId: string, argsDelta?: string, args?: Record<string, any>) => void
   handleToolStart: (toolId: string, toolName: string) => void
   handleToolComplete: (toolId: string, content: string) => void
   handleToolBlocked: (toolId: string) => void
@@ -41,6 +43,9 @@ interface ChatOrchestratorActions {
 
 type ChatOrchestratorStore = ChatOrchestratorActions
 
+// Arguments streamed for tool calls, by tool ID, until their tool instance exists
+const streamingToolArgs: Record<string, string> = {}
+
 export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
   devtools(
     (set, get) => ({
@@ -56,24 +61,41 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
         const { conversationId } = convStore
         const { addMessage } = msgStore
 
-        // Helper function to convert images to base64
-        const convertImagesToBase64 = async (images: ImageAttachment[]): Promise<Array<{id: string, data: string, media_type: string, name: string}>> => {
-          const promises = images.map(async (img) => {
-            return new Promise<{id: string, data: string, media_type: string, name: string}>((resolve) => {
-              const reader = new FileReader()
-              reader.onload = () => {
-                const base64 = (reader.result as string).split(',')[1] // Remove data:image/...;base64, prefix
-                resolve({
-                  id: img.id,
-                  data: base64,
-                  media_type: img.media_type,
-                  name: img.name
-                })
-              }
-              reader.readAsDataURL(img.file!)
+        // Upload images out-of-band so the WebSocket only carries their IDs
+        const uploadImages = async (images: ImageAttachment[]): Promise<string[]> => {
+          const base = getApiBase()
+          return Promise.all(images.map(async (img) => {
+            const response = await fetch(`${base}/api/attachments?name=${encodeURIComponent(img.name)}`, {
+              method: 'POST',
+              headers: { 'Content-Type': img.media_type },
+              body: img.file!
             })
-          })
-          return Promise.all(promises)
+            if (!response.ok) {
+              const detail = await response.json().catch(() => null)
+              throw new Error(detail?.detail || `${response.status} ${response.statusText}`)
+            }
+            const data = await response.json()
+            return data.attachment.id as string
+          }))
+        }
+
+        // Send a chat message, uploading its images first
+        const sendChatMessage = async (cid: string, text: string, msgImages?: ImageAttachment[]) => {
+          if (!msgImages || msgImages.length === 0) {
+            wsSend({ type: 'chat_message', content: text, conversation_id: cid } as MCPClientMessage)
+            return
+          }
+          try {
+            const attachmentIds = await uploadImages(msgImages)
+            wsSend({
+              type: 'chat_message',
+              content: text,
+              conversation_id: cid,
+              attachment_ids: attachmentIds
+            } as MCPClientMessage)
+          } catch (err: any) {
+            handleError(`Failed to upload image: ${err.message}`)
+          }
         }
 
         // Optimistically add user message
@@ -91,18 +113,7 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
 
         // If conversation already exists, send immediately
         if (conversationId) {
-          if (images && images.length > 0) {
-            convertImagesToBase64(images).then(base64Images => {
-              wsSend({ 
-                type: 'chat_message', 
-                content, 
-                conversation_id: conversationId,
-                images: base64Images
-              } as MCPClientMessage)
-            })
-          } else {
-            wsSend({ type: 'chat_message', content, conversation_id: conversationId } as MCPClientMessage)
-          }
+          sendChatMessage(conversationId, content, images)
           return
         }
 
@@ -118,20 +129,9 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
           .then(() => {
             const newCid = useConversationStore.getState().conversationId!
             // Flush queued messages
-            get().pendingMessages.forEach(async (msg) => {
-              if (msg.images && msg.images.length > 0) {
-                const base64Images = await convertImagesToBase64(msg.images)
-                wsSend({ 
-                  type: 'chat_message', 
-                  content: msg.content, 
-                  conversation_id: newCid,
-                  images: base64Images
-                } as MCPClientMessage)
-              } else {
-                wsSend({ type: 'chat_message', content: msg.content, conversation_id: newCid } as MCPClientMessage)
-              }
+            get().pendingMessages.forEach((msg) => {
+              sendChatMessage(newCid, msg.content, msg.images)
             })
-            
           })
           .catch((err: any) => {
             handleError(`Failed to start conversation: ${err.message}`)
@@ -217,6 +217,9 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
           case 'tool_session_start':
             get().handleToolSessionStart()
             break
+          case 'tool_args_delta':
+            get().handleToolArgsDelta(message.tool_id, message.args_delta, message.args)
+            break
           case 'tool_start':
             get().handleToolStart(message.tool_id, message.tool_name)
             break
@@ -232,6 +235,17 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
           case 'approval_request':
             get().handleRawApprovalRequest(message)
             break
+          case 'approval_batch_request':
+            // Queue each call so it can still be answered individually
+            message.items.forEach((item) => {
+              get().handleRawApprovalRequest({
+                type: 'approval_request',
+                batch_id: message.batch_id,
+                conversation_id: message.conversation_id,
+                ...item
+              })
+            })
+            break
           case 'tool_session_complete':
             get().handleToolSessionComplete()
             break
@@ -367,6 +381,25 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
         setCurrentToolSessionId(session.id)
       },
 
+      handleToolArgsDelta: (toolId: string, argsDelta?: string, args?: Record<string, any>) => {
+        // Text deltas are appended; dict arguments arrive whole and replace what came before
+        const current = args !== undefined
+          ? JSON.stringify(args)
+          : (streamingToolArgs[toolId] ?? '') + (argsDelta ?? '')
+        streamingToolArgs[toolId] = current
+
+        // Update the tool instance if the call already started
+        const { messages, updateMessage } = useMessagesStore.getState()
+        const toolSession = messages.find(m =>
+          m.type === 'tool_session' && m.tools?.some(t => t.id === toolId)
+        )
+        if (toolSession && toolSession.type === 'tool_session') {
+          updateMessage(toolSession.id, {
+            tools: toolSession.tools.map(t => t.id === toolId ? { ...t, args: current } : t)
+          })
+        }
+      },
+
       handleToolStart: (toolId: string, toolName: string) => {
         const { currentToolSessionId, messages, updateMessage } = useMessagesStore.getState()
         
@@ -374,7 +407,8 @@ export const useChatOrchestratorStore = create<ChatOrchestratorStore>()(
         
         const sessionMessage = messages.find(m => m.id === currentToolSessionId)
         if (sessionMessage && sessionMessage.type === 'tool_session') {
-          const newTool = MessageService.createToolInstance(toolId, toolName)
+          const newTool = MessageService.createToolInstance(toolId, toolName, streamingToolArgs[toolId])
+          delete streamingToolArgs[toolId]
           const updatedTools = [...(sessionMessage.tools || []), newTool]
           updateMessage(currentToolSessionId, { tools: updatedTools })
         }
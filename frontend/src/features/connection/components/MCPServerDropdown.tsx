@@ -20,15 +20,19 @@ const MCPServerDropdown: React.FC = () => {
     }
   }
 
-  const getServerStatusColor = (server: { enabled: boolean; running: boolean }) => {
+  const getServerStatusColor = (server: { enabled: boolean; running: boolean; state?: string }) => {
     if (!server.enabled) return '#6c757d' // Gray for disabled
     if (server.running) return '#28a745' // Green for running
+    if (server.state === 'starting') return '#ffc107' // Amber while starting
+    if (server.state === 'idle') return '#17a2b8' // Teal for lazy servers waiting for first use
     return '#dc3545' // Red for enabled but not running (error)
   }
 
-  const getServerStatusText = (server: { enabled: boolean; running: boolean }) => {
+  const getServerStatusText = (server: { enabled: boolean; running: boolean; state?: string }) => {
     if (!server.enabled) return 'Disabled'
     if (server.running) return 'Running'
+    if (server.state === 'starting') return 'Starting'
+    if (server.state === 'idle') return 'Idle'
     return 'Error'
   }
 
@@ -87,6 +91,7 @@ const MCPServerDropdown: React.FC = () => {
                       <div 
                         className="mcp-server-status"
                         style={{ color: getServerStatusColor(server) }}
+                        title={server.error ?? undefined}
                       >
                         {getServerStatusText(server)}
                       </div>
@@ -76,6 +76,12 @@ export function useMCPWebSocket({ onMessage, onApprovalRequest }: UseMCPWebSocke
         try {
           const message = JSON.parse(event.data)
           
+          // Answer server heartbeats so the session is not reclaimed as idle
+          if (message.type === 'ping') {
+            wsRef.current?.send(JSON.stringify({ type: 'pong', ts: message.ts }))
+            return
+          }
+          
           // Handle approval requests specially
           if (message.type === 'approval_request') {
             onApprovalRequest?.(message)
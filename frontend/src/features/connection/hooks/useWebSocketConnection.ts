@@ -1,19 +1,41 @@
-import { useEffect } from 'react'
+import { useCallback, useEffect } from 'react'
 import { useMCPWebSocket } from './useMCPWebSocket'
 import { useMessageHandlers } from '../../../shared/hooks/useMessageHandlers'
 import { useConnectionStore } from '../stores/useConnectionStore'
-import { invalidateAllQueries } from '../../../shared/api/queryClient'
+import { useConversationStore } from '../../conversations/stores/useConversationStore'
+import { useSettingsStore } from '../../ui/stores/useSettingsStore'
+import { invalidateAllQueries, queryClient } from '../../../shared/api/queryClient'
+import { applyMCPServerStateChanges, llmProviderKeys } from '../../../shared/api/queries'
+import type { ServerToClientMessage } from '../../../protocol/messages'
 
 export function useWebSocketConnection() {
   const { handleServerMessage, handleRawApprovalRequest } = useMessageHandlers()
   const { markConnected, markDisconnected, setServerPort, status } = useConnectionStore()
+  const conversationId = useConversationStore((state) => state.conversationId)
+
+  // Application-wide pushes patch cached state; everything else belongs to the chat
+  const handleMessage = useCallback((message: ServerToClientMessage) => {
+    switch (message.type) {
+      case 'settings_changed':
+        useSettingsStore.getState().applySettingsChanges(message.changes, message.redacted ?? [])
+        if ('llm_provider' in message.changes) {
+          void queryClient.invalidateQueries({ queryKey: llmProviderKeys.current() })
+        }
+        break
+      case 'mcp_server_state':
+        applyMCPServerStateChanges(message.servers)
+        break
+      default:
+        handleServerMessage(message)
+    }
+  }, [handleServerMessage])
 
   const {
     isConnected: wsConnected,
     sendMessage: sendWebSocketMessage,
     serverPort: wsServerPort
   } = useMCPWebSocket({
-    onMessage: handleServerMessage,
+    onMessage: handleMessage,
     onApprovalRequest: handleRawApprovalRequest
   })
 
@@ -34,6 +56,15 @@ export function useWebSocketConnection() {
     }
   }, [wsConnected, wsServerPort, sendWebSocketMessage, markConnected, markDisconnected, status])
 
+  // Observe the open conversation, so runs started from other windows stream here too
+  useEffect(() => {
+    if (!wsConnected || !conversationId) return
+    sendWebSocketMessage({ type: 'subscribe_conversation', conversation_id: conversationId })
+    return () => {
+      sendWebSocketMessage({ type: 'unsubscribe_conversation', conversation_id: conversationId })
+    }
+  }, [wsConnected, conversationId, sendWebSocketMessage])
+
   // Update server port when it changes
   useEffect(() => {
     setServerPort(wsServerPort)
@@ -609,7 +609,7 @@ const SettingsWindow: React.FC = () => {
                     </div>
                   )}
                   <div className="form-description">
-                    Configure MCP servers in JSON format. Each server should have a name, command, and optional args/env.
+                    Configure MCP servers in JSON format. Each server should have a name and either a command (with optional args/env) or the url of a running streamable-HTTP/SSE server (with optional headers).
                     <br />
                     Example:
                     <pre style={{ fontSize: '12px', marginTop: '8px', color: '#666' }}>
@@ -624,6 +624,12 @@ const SettingsWindow: React.FC = () => {
     "env": {
       "API_KEY": "your-key"
     }
+  },
+  "sidecar": {
+    "url": "http://localhost:8000/mcp",
+    "headers": {
+      "Authorization": "Bearer your-token"
+    }
   }
 }`}
                     </pre>
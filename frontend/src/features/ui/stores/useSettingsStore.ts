@@ -28,6 +28,8 @@ interface SettingsActions {
   saveSettings: (settings: Partial<Settings>) => Promise<void>
   validateMcpServers: (mcpServers: Record<string, any>) => Promise<boolean>
   updateSettings: (settings: Partial<Settings>) => void
+  // Apply a settings_changed push; redacted keys are reloaded over REST
+  applySettingsChanges: (changes: Record<string, any>, redacted: string[]) => void
   resetSettings: () => void
   clearError: () => void
 }
@@ -169,6 +171,25 @@ export const useSettingsStore = create<SettingsStore>()(
         }
       },
 
+      applySettingsChanges: (changes: Record<string, any>, redacted: string[]) => {
+        const { settings, isDirty } = get()
+        // Nothing loaded yet, or unsaved edits that the next save writes over the pushed values
+        if (!settings || isDirty) return
+        if (redacted.length > 0) {
+          void get().loadSettings()
+          return
+        }
+        const updatedSettings: Record<string, any> = { ...settings }
+        for (const [key, value] of Object.entries(changes)) {
+          if (value === null) {
+            delete updatedSettings[key]
+          } else {
+            updatedSettings[key] = value
+          }
+        }
+        set({ settings: updatedSettings as Settings }, false, 'applySettingsChanges')
+      },
+
       resetSettings: () => {
         set({ 
           isDirty: false,
@@ -36,6 +36,16 @@ export interface ToolSessionStartEvent {
   type: 'tool_session_start'
 }
 
+// Tool call arguments while the model generates them: JSON text to append,
+// or (for models that stream dict arguments) all arguments so far, replacing earlier ones
+export interface ToolArgsDeltaEvent {
+  type: 'tool_args_delta'
+  tool_id: string
+  tool_name: string
+  args_delta?: string
+  args?: Record<string, any>
+}
+
 export interface ToolStartEvent {
   type: 'tool_start'
   tool_name: string
@@ -72,6 +82,18 @@ export interface ApprovalRequestEvent {
   tool_id: string
   tool_name: string
   args: Record<string, any>
+  // Conversation whose run raised the request; observers answer with it
+  conversation_id?: string | null
+  // Set when the request arrived as part of an approval_batch_request
+  batch_id?: string
+}
+
+// Concurrent tool calls of one turn, answered together or one by one
+export interface ApprovalBatchRequestEvent {
+  type: 'approval_batch_request'
+  batch_id: string
+  conversation_id?: string | null
+  items: Array<Omit<ApprovalRequestEvent, 'type' | 'batch_id' | 'conversation_id'>>
 }
 
 export interface ErrorEvent {
@@ -84,6 +106,51 @@ export interface SettingsUpdatedEvent {
   settings: Record<string, any>
 }
 
+// Sent when subscribing to a conversation; a run in progress is replayed after it
+export interface ConversationStateEvent {
+  type: 'conversation_state'
+  conversation_id: string
+  running: boolean
+}
+
+// Sent once a run's messages are persisted
+export interface ConversationSavedEvent {
+  type: 'conversation_saved'
+  conversation_id: string
+}
+
+// Pushed to all clients when settings change; null marks a removed key.
+// Keys listed in redacted had credentials stripped and must be reloaded over REST.
+export interface SettingsChangedEvent {
+  type: 'settings_changed'
+  changes: Record<string, any>
+  redacted: string[]
+}
+
+// Pushed to all clients on MCP server transitions; null marks a removed server
+export interface MCPServerStateEvent {
+  type: 'mcp_server_state'
+  servers: Record<string, {
+    configured: boolean
+    enabled: boolean
+    running: boolean
+    state?: 'starting' | 'running' | 'idle' | 'failed' | 'stopped'
+    error?: string | null
+    restarts?: number
+  } | null>
+}
+
+// Heartbeat frames; either side answers a ping with a pong echoing its ts
+export interface PingEvent {
+  type: 'ping'
+  ts?: number
+}
+
+export interface PongEvent {
+  type: 'pong'
+  ts?: number
+}
+
 export type ServerToClientMessage =
   | SystemReadyEvent
   | AssistantStartEvent
@@ -93,14 +160,22 @@ export type ServerToClientMessage =
   | ThinkingDeltaEvent
   | ThinkingCompleteEvent
   | ToolSessionStartEvent
+  | ToolArgsDeltaEvent
   | ToolStartEvent
   | ToolCompleteEvent
   | ToolBlockedEvent
   | ToolErrorEvent
   | ToolSessionCompleteEvent
   | ApprovalRequestEvent
+  | ApprovalBatchRequestEvent
   | ErrorEvent
   | SettingsUpdatedEvent
+  | ConversationStateEvent
+  | ConversationSavedEvent
+  | SettingsChangedEvent
+  | MCPServerStateEvent
+  | PingEvent
+  | PongEvent
 
 // Messages from Client → Server
 export interface ChatMessage {
@@ -113,12 +188,30 @@ export interface ChatMessage {
     media_type: string
     name: string
   }>
+  // IDs returned by POST /api/attachments (preferred over inline base64 images)
+  attachment_ids?: string[]
 }
 
+export type ApprovalRememberScope = 'session' | 'conversation' | 'always'
+
 export interface ApprovalResponseMessage {
   type: 'approval_response'
   approval_id: string
   approved: boolean
+  // Required to answer a request of a conversation observed from another connection
+  conversation_id?: string
+  // Stop asking for this tool for the given scope (approvals only)
+  remember?: ApprovalRememberScope
+}
+
+// Bulk decision for a batch; per-call decisions (by approval_id) override it
+export interface BatchApprovalResponseMessage {
+  type: 'approval_response'
+  batch_id: string
+  approved?: boolean
+  decisions?: Record<string, boolean>
+  conversation_id?: string
+  remember?: ApprovalRememberScope
 }
 
 export interface UpdateSettingsMessage {
@@ -126,6 +219,12 @@ export interface UpdateSettingsMessage {
   settings: Record<string, any>
 }
 
+// Applies only the given top-level settings, leaving the others unchanged
+export interface PatchSettingsMessage {
+  type: 'patch_settings'
+  settings: Record<string, any>
+}
+
 export interface StopStreamMessage {
   type: 'stop_stream'
   conversation_id: string
@@ -138,9 +237,25 @@ export interface EditUserMessageMessage {
   new_content: string
 }
 
+export interface SubscribeConversationMessage {
+  type: 'subscribe_conversation'
+  conversation_id: string
+}
+
+export interface UnsubscribeConversationMessage {
+  type: 'unsubscribe_conversation'
+  conversation_id: string
+}
+
 export type ClientToServerMessage =
   | ChatMessage
   | ApprovalResponseMessage
+  | BatchApprovalResponseMessage
   | UpdateSettingsMessage
+  | PatchSettingsMessage
   | StopStreamMessage
   | EditUserMessageMessage
+  | SubscribeConversationMessage
+  | UnsubscribeConversationMessage
+  | PingEvent
+  | PongEvent
@@ -1,10 +1,14 @@
 import { useQuery, useMutation, useQueryClient } from '@tanstack/react-query'
 import { getApiBase } from '../../utils/api'
+import { queryClient } from '../queryClient'
 
 interface MCPServerState {
   configured: boolean
   enabled: boolean
   running: boolean
+  state?: 'starting' | 'running' | 'idle' | 'failed' | 'stopped'
+  error?: string | null
+  restarts?: number
 }
 
 interface MCPServersResponse {
@@ -47,6 +51,26 @@ const fetchMCPServerStates = async (): Promise<Record<string, MCPServerState>> =
   return data.servers
 }
 
+// Apply an mcp_server_state push to the cached states (null marks a removed server)
+export const applyMCPServerStateChanges = (changes: Record<string, MCPServerState | null>) => {
+  queryClient.setQueryData<Record<string, MCPServerState>>(
+    mcpServerKeys.states(),
+    (old) => {
+      // Not fetched yet; the first fetch returns the current states
+      if (!old) return old
+      const updated = { ...old }
+      for (const [name, state] of Object.entries(changes)) {
+        if (state === null) {
+          delete updated[name]
+        } else {
+          updated[name] = state
+        }
+      }
+      return updated
+    }
+  )
+}
+
 // Toggle MCP server
 const toggleMCPServer = async ({ server_name, enabled }: ToggleServerRequest): Promise<void> => {
   const base = getApiBase()
@@ -74,10 +98,9 @@ export const useMCPServersQuery = () => {
   return useQuery({
     queryKey: mcpServerKeys.states(),
     queryFn: fetchMCPServerStates,
-    staleTime: 30 * 1000, // 30 seconds (servers change frequently)
+    staleTime: Infinity, // Kept current by mcp_server_state pushes (refetched after reconnects)
     gcTime: 5 * 60 * 1000, // 5 minutes
-    refetchInterval: 5 * 1000, // Refetch every 5 seconds when active
-    refetchIntervalInBackground: false,
+    refetchInterval: false,
   })
 }
 
@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+"""
+Attachments API Router - Streamed upload endpoint for chat attachments
+"""
+
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.responses import FileResponse
+import logging
+
+from services.attachment_service import attachment_store
+from core.exceptions import AttachmentError
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/attachments", tags=["attachments"])
+
+@router.post("")
+async def upload_attachment(request: Request, name: str = ""):
+    """
+    Upload an attachment as the raw request body.
+    Returns an attachment ID to reference from `chat_message.attachment_ids`.
+    """
+    # Reject oversized uploads early when the client declares a length
+    content_length = request.headers.get("content-length")
+    if content_length and content_length.isdigit() and int(content_length) > attachment_store.max_size:
+        raise HTTPException(status_code=413, detail=f"Attachment exceeds maximum size of {attachment_store.max_size} bytes")
+
+    declared_type = request.headers.get("content-type")
+    try:
+        attachment = await attachment_store.save_stream(request.stream(), name, declared_type)
+    except AttachmentError as e:
+        logger.warning(f"Rejected attachment upload '{name}': {e}")
+        raise HTTPException(status_code=e.status_code, detail=str(e))
+
+    return {
+        "status": "success",
+        "attachment": {
+            "id": attachment.id,
+            "name": attachment.name,
+            "media_type": attachment.media_type,
+            "size": attachment.size
+        }
+    }
+
+@router.get("/{attachment_id}")
+async def get_attachment(attachment_id: str):
+    """Serve a previously uploaded attachment"""
+    attachment = attachment_store.get(attachment_id)
+    if not attachment:
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    return FileResponse(
+        path=str(attachment.path),
+        media_type=attachment.media_type,
+        headers={"Cache-Control": "public, max-age=31536000, immutable"},
+    )
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Chat API Router - HTTP streaming (Server-Sent Events) chat endpoint for headless clients
+"""
+
+from fastapi import APIRouter, Header, HTTPException
+from fastapi.responses import StreamingResponse
+from pydantic import BaseModel, Field
+from typing import Dict, List, Literal, Optional
+from uuid import uuid4
+import asyncio
+import logging
+
+from core.messaging import QueueMessenger
+from services.chat_service import ChatSession
+from services.tool_approval import resolve_approval, resolve_approval_batch
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(tags=["chat"])
+
+class ChatStreamRequest(BaseModel):
+    """Request model for a streamed chat turn"""
+    content: str = Field("", description="User message text")
+    conversation_id: Optional[str] = Field(None, description="Conversation to continue (a new one is created if omitted)")
+    attachment_ids: List[str] = Field(default_factory=list, description="IDs returned by POST /api/attachments")
+    auto_approve: Optional[bool] = Field(None, description="Approve all tool calls for this request (defaults to the auto_approve_tools setting)")
+
+class ApprovalDecision(BaseModel):
+    """Request model for resolving a pending tool approval"""
+    approved: bool
+    remember: Optional[Literal["session", "conversation", "always"]] = Field(None, description="Stop asking for this tool for the given scope")
+
+class BatchApprovalDecision(BaseModel):
+    """Request model for resolving the approvals of a batch"""
+    approved: Optional[bool] = Field(None, description="Decision for every call without an individual decision")
+    decisions: Dict[str, bool] = Field(default_factory=dict, description="Individual decisions by approval ID")
+    remember: Optional[Literal["session", "conversation", "always"]] = Field(None, description="Stop asking for the approved tools for the given scope")
+
+def format_sse(message_type: str, frame: str) -> str:
+    """Format an encoded messenger frame as a Server-Sent Event"""
+    return f"event: {message_type}\ndata: {frame}\n\n"
+
+@router.post("/api/chat/stream")
+async def chat_stream(request: ChatStreamRequest):
+    """Run one chat turn and stream the same events as the WebSocket protocol"""
+    if not request.content.strip() and not request.attachment_ids:
+        raise HTTPException(status_code=400, detail="Message content or attachments required")
+    
+    conversation_id = request.conversation_id or str(uuid4())
+    messenger = QueueMessenger()
+    chat_session = ChatSession(messenger=messenger, auto_approve=request.auto_approve)
+    
+    async def event_stream():
+        task = asyncio.create_task(
+            chat_session.handle_chat_message(request.content.strip(), conversation_id, None, request.attachment_ids)
+        )
+        chat_session.tasks.append(task)
+        task.add_done_callback(lambda _: messenger.close())
+        try:
+            async for message_type, frame in messenger:
+                yield format_sse(message_type, frame)
+        finally:
+            # Client disconnected or stream finished - stop the run and release the session
+            await chat_session.cleanup()
+            logger.info(f"Closed chat stream for conversation {conversation_id}")
+    
+    logger.info(f"Starting chat stream for conversation {conversation_id}")
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={
+            "Cache-Control": "no-cache",
+            "X-Conversation-Id": conversation_id,
+            # Required to answer this stream's approval requests
+            "X-Approval-Token": chat_session.approval_manager.token,
+        },
+    )
+
+@router.post("/api/approvals/batch/{batch_id}")
+async def submit_batch_approval(batch_id: str, decision: BatchApprovalDecision,
+                                x_approval_token: str = Header(..., description="X-Approval-Token of the stream that raised the batch")):
+    """Resolve several approvals of an approval_batch_request at once"""
+    if decision.approved is None and not decision.decisions:
+        raise HTTPException(status_code=400, detail="A bulk decision or individual decisions are required")
+    if not await resolve_approval_batch(batch_id, decision.approved, decision.decisions, decision.remember,
+                                        token=x_approval_token):
+        raise HTTPException(status_code=404, detail=f"Approval batch {batch_id} not found")
+    return {
+        "status": "success",
+        "batch_id": batch_id
+    }
+
+@router.post("/api/approvals/{approval_id}")
+async def submit_approval(approval_id: str, decision: ApprovalDecision,
+                          x_approval_token: str = Header(..., description="X-Approval-Token of the stream that raised the approval")):
+    """Resolve a pending tool approval raised by a chat stream"""
+    if not await resolve_approval(approval_id, decision.approved, decision.remember, token=x_approval_token):
+        raise HTTPException(status_code=404, detail=f"Approval {approval_id} not found")
+    return {
+        "status": "success",
+        "approval_id": approval_id,
+        "approved": decision.approved
+    }
@@ -12,6 +12,8 @@ from pathlib import Path
 
 from core.database import get_conversation_history, get_conversation_by_id, delete_conversation, save_conversation
 from adapters.conversation_adapter import ConversationAdapter
+from services.approval_policy import approval_policy
+from services.event_pipeline import load_checkpoint
 
 logger = logging.getLogger(__name__)
 
@@ -63,12 +65,26 @@ async def get_conversation(conversation_id: str):
         }
     }
 
+@router.get("/{conversation_id}/checkpoint")
+async def get_conversation_checkpoint(conversation_id: str):
+    """Get the partial response of a run that ended before the conversation was saved"""
+    if not await get_conversation_by_id(conversation_id):
+        raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    checkpoint = load_checkpoint(conversation_id)
+    if checkpoint is None:
+        raise HTTPException(status_code=404, detail=f"No checkpoint for conversation {conversation_id}")
+    return {
+        "status": "success",
+        "checkpoint": checkpoint
+    }
+
 @router.delete("/{conversation_id}")
 async def delete_conversation_by_id(conversation_id: str):
     """Delete a specific conversation by ID"""
     success = await delete_conversation(conversation_id)
     if not success:
         raise HTTPException(status_code=404, detail=f"Conversation {conversation_id} not found")
+    approval_policy.forget_conversation(conversation_id)
     return {
         "status": "success",
         "message": f"Conversation {conversation_id} deleted"
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+"""
+Health API Router - Liveness, readiness and runtime statistics
+"""
+
+from fastapi import APIRouter
+import logging
+
+from core.metrics import metrics
+from core.serialization import JSONResponse
+from services.conversation_hub import conversation_hub
+from services.mcp_service import GlobalMCPManager
+from services.tool_cache import tool_result_cache
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/api/health", tags=["health"])
+
+@router.get("")
+async def get_health():
+    """Get server liveness and runtime counters"""
+    return {
+        "status": "success",
+        "connections": len(conversation_hub.connections),
+        "active_conversations": len(conversation_hub.channels),
+        "metrics": metrics.snapshot(),
+        "tool_cache": tool_result_cache.stats()
+    }
+
+@router.get("/ready")
+async def get_readiness():
+    """
+    Get per-server MCP readiness.
+    Responds 503 until every configured server is running or has failed to start.
+    """
+    mcp_manager = GlobalMCPManager.get_existing()
+    ready = mcp_manager is not None and mcp_manager.is_ready()
+    servers = mcp_manager.get_server_states() if mcp_manager is not None else {}
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "success" if ready else "starting",
+            "ready": ready,
+            "servers": servers
+        }
+    )
@@ -6,7 +6,9 @@ MCP Servers API Router - REST endpoints for MCP server management
 from fastapi import APIRouter, HTTPException
 import logging
 
+from core.exceptions import MCPServerError
 from services.mcp_service import get_mcp_manager
+from services.tool_cache import tool_result_cache
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +28,70 @@ async def get_mcp_server_states():
         logger.error(f"Error getting MCP server states: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("")
+async def list_mcp_servers():
+    """Get details (state, config, uptime and tool call stats) of all MCP servers"""
+    mcp_manager = await get_mcp_manager()
+    return {
+        "status": "success",
+        "servers": {handle.name: handle.describe() for handle in mcp_manager.registry}
+    }
+
+@router.get("/{server_name}")
+async def get_mcp_server(server_name: str):
+    """Get details of a single MCP server"""
+    mcp_manager = await get_mcp_manager()
+    handle = mcp_manager.get_server(server_name)
+    if handle is None:
+        raise HTTPException(status_code=404, detail=f"MCP server '{server_name}' not found")
+    return {
+        "status": "success",
+        "server": handle.describe()
+    }
+
+@router.get("/{server_name}/catalog")
+async def get_mcp_server_catalog(server_name: str):
+    """Get the tools, prompts and resources a server offers (served from the catalog cache)"""
+    mcp_manager = await get_mcp_manager()
+    handle = mcp_manager.get_server(server_name)
+    if handle is None or handle.server is None:
+        raise HTTPException(status_code=404, detail=f"MCP server '{server_name}' not found")
+    try:
+        tools = await handle.get_catalog("tools")
+        prompts = await handle.get_catalog("prompts")
+        resources = await handle.get_catalog("resources")
+    except Exception as e:
+        logger.error(f"Error listing catalog of MCP server '{server_name}': {e}")
+        raise HTTPException(status_code=503, detail=str(e))
+    return {
+        "status": "success",
+        "tools": [
+            {"name": tool.name, "description": tool.description, "parameters": tool.parameters_json_schema}
+            for tool in tools
+        ],
+        "prompts": [prompt.model_dump(mode="json", exclude_none=True) for prompt in prompts],
+        "resources": [resource.model_dump(mode="json", exclude_none=True) for resource in resources]
+    }
+
+@router.delete("/{server_name}/cache")
+async def clear_mcp_server_cache(server_name: str):
+    """Drop the cached tool results of a server"""
+    cleared = tool_result_cache.clear(server_name)
+    return {"status": "success", "cleared": cleared}
+
+@router.post("/{server_name}/refresh")
+async def refresh_mcp_server_package(server_name: str):
+    """Update the npm package of an npx-launched server and restart it"""
+    mcp_manager = await get_mcp_manager()
+    if mcp_manager.get_server(server_name) is None:
+        raise HTTPException(status_code=404, detail=f"MCP server '{server_name}' not found")
+    try:
+        refreshed = await mcp_manager.refresh_server_package(server_name)
+    except MCPServerError as e:
+        logger.error(f"Error refreshing MCP server '{server_name}': {e}")
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"status": "success", **refreshed}
+
 @router.post("/toggle")
 async def toggle_mcp_server(request: dict):
     """Toggle an individual MCP server on/off"""
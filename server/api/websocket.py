@@ -7,8 +7,15 @@ from fastapi import WebSocket, WebSocketDisconnect
 import asyncio
 import json
 import logging
+import time
 
+from core.config import config_manager
+from core.metrics import metrics
+from core.serialization import dumps_str, loads
 from services.chat_service import ChatSession
+from services.conversation_hub import conversation_hub
+from services.tool_approval import resolve_approval, resolve_approval_batch
+from services.settings_service import settings_service
 
 logger = logging.getLogger(__name__)
 
@@ -17,8 +24,43 @@ async def websocket_endpoint(websocket: WebSocket):
     await websocket.accept()
     logger.info("New WebSocket connection established")
     
+    metrics.incr("websocket.connections_opened")
+    
     # Create a new chat session instance
     chat_session = ChatSession(websocket)
+    # Receive settings and MCP server state pushes
+    conversation_hub.connect(chat_session.messenger)
+    
+    # Heartbeat state - any frame from the client counts as a sign of life
+    loop = asyncio.get_running_loop()
+    last_seen = loop.time()
+    reclaimed = False
+    receive_task = asyncio.current_task()
+    ping_interval = await config_manager.get_value("ws_ping_interval", 20.0)
+    idle_timeout = await config_manager.get_value("ws_idle_timeout", 60.0)
+    
+    async def _heartbeat():
+        """Ping the client and reclaim the session once it stops responding"""
+        nonlocal reclaimed
+        while True:
+            await asyncio.sleep(ping_interval)
+            idle = loop.time() - last_seen
+            if idle > idle_timeout:
+                logger.warning(f"WebSocket idle for {idle:.0f}s, reclaiming session")
+                metrics.incr("websocket.idle_timeouts")
+                break
+            try:
+                # A send that cannot complete means the connection is half-open
+                frame = dumps_str({"type": "ping", "ts": time.time()})
+                await asyncio.wait_for(chat_session.messenger.send_raw("ping", frame), timeout=ping_interval)
+            except Exception as e:
+                logger.warning(f"WebSocket heartbeat failed, reclaiming session: {e!r}")
+                metrics.incr("websocket.heartbeat_failures")
+                break
+        reclaimed = True
+        receive_task.cancel()
+    
+    heartbeat_task = asyncio.create_task(_heartbeat())
 
     # Callback to log exceptions from background tasks
     def _log_task_result(task: asyncio.Task):
@@ -37,34 +79,69 @@ async def websocket_endpoint(websocket: WebSocket):
         while True:
             try:
                 # Receive message from client
-                data = await websocket.receive_json()
+                data = loads(await websocket.receive_text())
+                last_seen = loop.time()
+                
+                if data["type"] == "pong":
+                    # Heartbeat reply - receiving it already refreshed last_seen
+                    continue
                 
-                if data["type"] == "chat_message":
+                elif data["type"] == "ping":
+                    # Client-initiated heartbeat; reply directly, never through a broadcast channel
+                    await chat_session.messenger.send_raw("pong", dumps_str({"type": "pong", "ts": data.get("ts")}))
+                
+                elif data["type"] == "chat_message":
                     # Handle chat message
                     user_input = data["content"].strip()
                     images = data.get("images", [])
+                    # Attachments uploaded out-of-band via POST /api/attachments
+                    attachment_ids = data.get("attachment_ids", [])
                     # Require conversation_id (provided by frontend)
                     conversation_id = data.get("conversation_id")
                     if not conversation_id:
                         logger.error("Missing conversation_id from client message")
-                        await websocket.send_json({"type": "error", "message": "Missing conversation_id"})
+                        await chat_session.messenger.send_error("Missing conversation_id")
                         continue
                     
-                    if user_input or images:
-                        logger.info(f"Received chat message: {user_input} with {len(images)} images for conversation: {conversation_id}")
+                    if user_input or images or attachment_ids:
+                        logger.info(f"Received chat message: {user_input} with {len(images) + len(attachment_ids)} images for conversation: {conversation_id}")
                         # Prune any completed tasks to avoid memory growth
                         chat_session.tasks = [t for t in chat_session.tasks if not t.done()]
                         # Schedule handling chat message in background to allow processing approval responses
-                        task = asyncio.create_task(chat_session.handle_chat_message(user_input, conversation_id, images))
+                        task = asyncio.create_task(chat_session.handle_chat_message(user_input, conversation_id, images, attachment_ids))
                         task.add_done_callback(_log_task_result)
                         chat_session.tasks.append(task)
                 
                 elif data["type"] == "approval_response":
-                    # Handle tool approval response
-                    approval_id = data["approval_id"]
-                    approved = data["approved"]
-                    logger.info(f"Received approval response: {approval_id} = {approved}")
-                    await chat_session.handle_approval_response(approval_id, approved)
+                    # This connection's own requests, or those of a conversation it observes
+                    scope = {"token": chat_session.approval_manager.token}
+                    observed = conversation_hub.channels.get(data.get("conversation_id"))
+                    if observed is not None and chat_session.messenger in observed.subscribers:
+                        scope["conversation_id"] = observed.conversation_id
+                    if data.get("batch_id"):
+                        # Bulk and/or per-call decisions for an approval_batch_request
+                        batch_id = data["batch_id"]
+                        logger.info(f"Received batch approval response: {batch_id}")
+                        await resolve_approval_batch(batch_id, data.get("approved"), data.get("decisions"), data.get("remember"), **scope)
+                    else:
+                        # Handle tool approval response
+                        approval_id = data["approval_id"]
+                        approved = data["approved"]
+                        logger.info(f"Received approval response: {approval_id} = {approved}")
+                        await resolve_approval(approval_id, approved, data.get("remember"), **scope)
+                
+                elif data["type"] == "subscribe_conversation":
+                    # Observe a conversation's live events (replays a run in progress)
+                    conversation_id = data.get("conversation_id")
+                    if not conversation_id:
+                        await chat_session.messenger.send_error("Missing conversation_id")
+                        continue
+                    await conversation_hub.subscribe(conversation_id, chat_session.messenger)
+                
+                elif data["type"] == "unsubscribe_conversation":
+                    conversation_id = data.get("conversation_id")
+                    if conversation_id:
+                        conversation_hub.unsubscribe(conversation_id, chat_session.messenger)
                 
                 elif data["type"] == "edit_user_message":
                     # Handle user message editing
@@ -74,17 +151,17 @@ async def websocket_endpoint(websocket: WebSocket):
                     
                     if not conversation_id:
                         logger.error("Missing conversation_id from edit message")
-                        await websocket.send_json({"type": "error", "message": "Missing conversation_id"})
+                        await chat_session.messenger.send_error("Missing conversation_id")
                         continue
                     
                     if user_message_index is None:
                         logger.error("Missing user_message_index from edit message")
-                        await websocket.send_json({"type": "error", "message": "Missing user_message_index"})
+                        await chat_session.messenger.send_error("Missing user_message_index")
                         continue
                     
                     if not new_content:
                         logger.error("Missing new_content from edit message")
-                        await websocket.send_json({"type": "error", "message": "Missing new_content"})
+                        await chat_session.messenger.send_error("Missing new_content")
                         continue
                     
                     logger.info(f"Received edit request: conversation {conversation_id}, user message {user_message_index}")
@@ -99,38 +176,60 @@ async def websocket_endpoint(websocket: WebSocket):
                     # Handle dynamic settings update mid-session
                     logger.info("Received update_settings via WebSocket - next message will use updated settings automatically")
                     await chat_session.send_system_ready("Settings updated successfully")
+                elif data["type"] == "patch_settings":
+                    # Apply only the given top-level settings; every client is notified through settings_changed
+                    changes = data.get("settings")
+                    if not isinstance(changes, dict) or not changes:
+                        await chat_session.messenger.send_error("Missing settings")
+                        continue
+                    current_settings = await settings_service.get_settings()
+                    result = await settings_service.update_settings({**current_settings, **changes})
+                    if not result.success:
+                        await chat_session.messenger.send_error(f"{result.message}: {', '.join(result.errors or [])}")
+                        continue
+                    await chat_session.send_system_ready("Settings updated successfully")
                 elif data["type"] == "stop_stream":
                     # User requested to stop the current stream
                     logger.info(f"Received stop_stream for conversation: {data.get('conversation_id')}")
                     for task in chat_session.tasks:
                         if not task.done():
                             task.cancel()
+                    # Runs of this connection that are published to the conversation's observers
+                    channel = conversation_hub.channels.get(data.get("conversation_id"))
+                    if channel is not None:
+                        channel.cancel_run(chat_session.messenger)
                     # Notify client that assistant has stopped
-                    await websocket.send_json({"type": "assistant_complete"})
+                    await chat_session.messenger.send_assistant_complete()
                     continue
                 else:
                     logger.warning(f"Unknown message type: {data['type']}")
                     
             except json.JSONDecodeError:
                 logger.error("Invalid JSON received from client")
-                await websocket.send_json({
-                    "type": "error",
-                    "message": "Invalid JSON format"
-                })
+                await chat_session.messenger.send_error("Invalid JSON format")
                 
     except WebSocketDisconnect:
         logger.info("WebSocket connection closed")
+    except asyncio.CancelledError:
+        if not reclaimed:
+            raise
+        # Cancelled by our own heartbeat - the client is gone, reclaim its session
+        receive_task.uncancel()
+        metrics.incr("websocket.sessions_reclaimed")
+        try:
+            await asyncio.wait_for(websocket.close(code=1001), timeout=1.0)
+        except Exception:
+            pass  # Connection is already dead
     except Exception as e:
         logger.error(f"WebSocket error: {e}")
         try:
-            await websocket.send_json({
-                "type": "error", 
-                "message": f"Server error: {str(e)}"
-            })
+            await chat_session.messenger.send_error(f"Server error: {str(e)}")
         except:
             pass  # Connection might be closed
     finally:
         logger.info("Cleaning up WebSocket connection")
+        heartbeat_task.cancel()
+        metrics.incr("websocket.connections_closed")
         # Cancel any pending chat handling tasks
         for t in getattr(chat_session, 'tasks', []):
             if not t.done():
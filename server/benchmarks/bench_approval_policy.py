@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+"""
+Approval Policy Benchmark - Per-call cost of evaluating compiled approval rules
+
+Usage: python benchmarks/bench_approval_policy.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+# Add the server directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from services.approval_policy import ApprovalPolicy
+
+RULES = [
+    {"action": "deny", "tool": "*", "args": {"command": r"\brm\s+-rf\b"}},
+    {"action": "allow", "server": "desktop-commander", "tool": "read_*", "path_under": "/home/me/project"},
+    {"action": "allow", "server": "context7", "tool": "*"},
+    {"action": "ask", "tool": "write_*"},
+] + [{"action": "allow", "server": f"server-{i}", "tool": f"tool_{i}_*"} for i in range(20)]
+
+CALLS = {
+    "first rule": ("desktop-commander", "start_process", {"command": "rm -rf /tmp/x"}),
+    "path rule": ("desktop-commander", "read_file", {"path": "/home/me/project/src/main.py"}),
+    "no match": ("desktop-commander", "edit_block", {"file_path": "/tmp/a", "old_string": "x" * 200}),
+}
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    policy = ApprovalPolicy()
+    compile_us = timeit.timeit(lambda: (setattr(policy, "_source", None), policy.load(RULES)), number=100) / 100 * 1e6
+    print(f"{len(RULES)} rules, compile: {compile_us:.1f} us, iterations: {iterations}")
+    for name, (server, tool, args) in CALLS.items():
+        per_call = timeit.timeit(lambda: policy.evaluate(server, tool, args), number=iterations) / iterations * 1e6
+        print(f"{name:<12}{policy.evaluate(server, tool, args):>7}{per_call:>9.2f} us")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+JSON Codec Benchmark - Per-frame encode cost of stdlib json vs the shared codec
+
+Usage: python benchmarks/bench_json_codec.py [iterations]
+"""
+
+import json
+import os
+import sys
+import timeit
+from dataclasses import asdict
+from datetime import datetime
+
+# Add the server directory to the Python path
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from adapters.conversation_adapter import UIMessage, UIToolInstance
+from core import serialization
+
+def build_frames():
+    """Representative frames sent over the WebSocket and REST routes"""
+    now = datetime.now().isoformat()
+    tool_output = "\n".join(f"line {i}: " + "x" * 80 for i in range(400))
+    history = [
+        asdict(UIMessage(id=str(i), type="assistant", timestamp=now, content="Some assistant reply " * 40))
+        for i in range(50)
+    ]
+    return {
+        "text_delta": {"type": "text_delta", "content": "Hello, "},
+        "approval_request": {
+            "type": "approval_request",
+            "approval_id": "3f1c2b7e-0000-4000-8000-000000000000",
+            "tool_name": "write_file",
+            "args": {"path": "/tmp/example.py", "content": "print('hi')\n" * 200},
+        },
+        "tool_complete": {"type": "tool_complete", "tool_id": "call_1", "tool_name": "read_file", "content": tool_output},
+        "conversation": {"status": "success", "conversation": {"conversation_id": "conv-1", "messages": history}},
+        "ui_message_dataclass": {
+            "type": "tool_session",
+            "tools": [UIToolInstance(id="call_1", name="read_file", status="completed", timestamp=now)],
+        },
+    }
+
+def stdlib_encode(obj):
+    # Mirrors Starlette's send_json / JSONResponse rendering
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"), default=serialization._default).encode("utf-8")
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    print(f"codec backend: {serialization.BACKEND}, iterations: {iterations}")
+    print(f"{'frame':<22}{'bytes':>9}{'stdlib us':>12}{'codec us':>11}{'speedup':>9}")
+    for name, frame in build_frames().items():
+        n = max(iterations // 100, 100) if len(stdlib_encode(frame)) > 10_000 else iterations
+        before = timeit.timeit(lambda: stdlib_encode(frame), number=n) / n * 1e6
+        after = timeit.timeit(lambda: serialization.dumps(frame), number=n) / n * 1e6
+        size = len(serialization.dumps(frame))
+        print(f"{name:<22}{size:>9}{before:>12.2f}{after:>11.2f}{before / after:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
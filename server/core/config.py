@@ -3,20 +3,36 @@
 Unified Configuration Manager - Single source of truth for all configuration
 """
 
+import copy
 import json
 import logging
 import asyncio
+import os
+import re
+import stat
+import tempfile
 from pathlib import Path
-from typing import Dict, Any, List, Optional, Callable, Set
+from types import MappingProxyType
+from typing import Deque, Dict, Any, List, Mapping, Optional, Callable, Set, Tuple
+from collections import deque
 from dataclasses import dataclass, field
 from datetime import datetime
 
+try:
+    from watchfiles import awatch
+except ImportError:  # pragma: no cover - polling fallback when watchfiles is not installed
+    awatch = None
+
 from core.exceptions import ConfigurationError, ValidationError
 
 logger = logging.getLogger(__name__)
 
 # Configuration file path
 CONFIG_FILE = "settings.json"
+# Seconds between checks for external edits when watchfiles is not installed
+CONFIG_POLL_INTERVAL = 1.0
+# Seconds a save waits so rapid successive updates are written to disk once
+CONFIG_WRITE_DELAY = 0.1
 
 # Default configuration values
 DEFAULT_CONFIG = {
@@ -28,9 +44,19 @@ DEFAULT_CONFIG = {
         "model_settings": {}  # Model-specific settings (e.g., thinking configurations)
     },
     "approval_timeout": 60.0,
+    "tool_timeout": 300.0,  # Seconds a tool call may run (servers can override per tool)
+    "tool_cache_max_entries": 256,  # Results kept by the cache of tools opted in with cache_tools
+    "tool_cache_persist": False,  # Also keep cached tool results on disk across restarts
+    "ws_ping_interval": 20.0,  # Seconds between WebSocket heartbeat pings
+    "ws_idle_timeout": 60.0,  # Seconds without client traffic before a session is reclaimed
     "auto_approve_tools": False,
+    "early_tool_approval": False,  # Ask for approval as soon as a tool call has streamed
+    # Ordered allow/deny/ask rules, e.g. {"action": "allow", "tool": "read_*", "path_under": "~/projects"}
+    "approval_rules": [],
     "debug_mode": False,
     "enable_thinking": True,
+    # Installed versions of npm packages MCP servers are launched from with npx
+    "mcp_package_pins": {},
     "mcp_servers": {
         "desktop-commander": {
             "command": "npx",
@@ -51,49 +77,92 @@ class ConfigChangeEvent:
     new_values: Dict[str, Any]
     timestamp: datetime = field(default_factory=datetime.now)
 
+def freeze(value: Any) -> Any:
+    """Recursively convert dicts and lists into read-only mappings and tuples"""
+    if isinstance(value, dict):
+        return MappingProxyType({k: freeze(v) for k, v in value.items()})
+    if isinstance(value, list):
+        return tuple(freeze(v) for v in value)
+    return value
+
+def thaw(value: Any) -> Any:
+    """Recursively convert a frozen value back into plain dicts and lists"""
+    if isinstance(value, MappingProxyType):
+        return {k: thaw(v) for k, v in value.items()}
+    if isinstance(value, tuple):
+        return [thaw(v) for v in value]
+    return value
+
+@dataclass(frozen=True)
+class ConfigSnapshot:
+    """Immutable, versioned view of the configuration"""
+    version: int
+    values: Mapping[str, Any]
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Get a (frozen) value"""
+        return self.values.get(key, default)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Get a mutable deep copy of the configuration"""
+        return thaw(self.values)
+
 class ConfigManager:
     """
     Unified configuration manager that handles file-based configuration.
-    Provides change detection and observer pattern for configuration changes.
+    Readers get an immutable snapshot without locking; writes and file changes
+    picked up by the watcher swap in a new snapshot and notify observers.
     """
     
     def __init__(self, config_file: str = CONFIG_FILE):
         self.config_file = Path(config_file)
-        self._config: Optional[Dict[str, Any]] = None
+        self._snapshot: Optional[ConfigSnapshot] = None
+        # Version of the snapshot dropped by invalidate(), so the reloaded one comes after it
+        self._last_version = 0
+        # Serializes writers and snapshot swaps; never taken by readers
         self._lock = asyncio.Lock()
         self._observers: List[Callable[[ConfigChangeEvent], None]] = []
-        self._last_modified: Optional[float] = None
-        
+        self._watch_task: Optional[asyncio.Task] = None
+        # Identity (mtime, size) of the file contents last read or written by us
+        self._known_stamp: Optional[Tuple[float, int]] = None
+        # Values last read from or written to the file, restored if a later write fails
+        self._stored_values: Optional[Mapping[str, Any]] = None
+        # Write scheduled for the current debounce window, resolved once it is on disk
+        self._pending_write: Optional[asyncio.Future] = None
+        # Serializes the writes of successive windows
+        self._write_lock = asyncio.Lock()
+        # Change events awaiting delivery, in snapshot order, and the task delivering them
+        self._notifications: Deque[Tuple[ConfigChangeEvent, asyncio.Future]] = deque()
+        self._notify_task: Optional[asyncio.Task] = None
+    
+    @property
+    def snapshot(self) -> ConfigSnapshot:
+        """Current configuration snapshot (loaded on first access)"""
+        snapshot = self._snapshot
+        if snapshot is None:
+            snapshot, self._known_stamp = self._read_snapshot(version=self._last_version + 1)
+            self._snapshot = snapshot
+            self._stored_values = snapshot.values
+        return snapshot
+    
     async def load_config(self) -> Dict[str, Any]:
-        """Load configuration from file"""
-        async with self._lock:
-            # Check if we need to reload from file
-            should_reload = self._should_reload_from_file()
-            
-            if self._config is None or should_reload:
-                await self._load_from_file()
-                
-            return self._config.copy()
+        """Get a mutable copy of the current configuration"""
+        return self.snapshot.to_dict()
     
-    def _should_reload_from_file(self) -> bool:
-        """Check if configuration file has been modified"""
-        if not self.config_file.exists():
-            return self._config is None
-            
+    def _file_stamp(self) -> Optional[Tuple[float, int]]:
+        """Modification time and size of the configuration file"""
         try:
-            current_mtime = self.config_file.stat().st_mtime
-            if self._last_modified is None or current_mtime > self._last_modified:
-                return True
+            stat = self.config_file.stat()
+            return (stat.st_mtime, stat.st_size)
         except OSError:
-            logger.warning(f"Could not check modification time of {self.config_file}")
-            
-        return False
+            return None
     
-    async def _load_from_file(self):
-        """Internal method to load configuration from file"""
-        config = DEFAULT_CONFIG.copy()
+    def _read_snapshot(self, version: int) -> Tuple[ConfigSnapshot, Optional[Tuple[float, int]]]:
+        """Read and validate the configuration file into a new snapshot and its file stamp"""
+        config = copy.deepcopy(DEFAULT_CONFIG)
         
         if self.config_file.exists():
+            stamp = self._file_stamp()
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     file_config = json.load(f)
@@ -108,9 +177,6 @@ class ConfigManager:
                 
                 # Use file config (overriding defaults)
                 config.update(file_config)
-                
-                # Update last modified time
-                self._last_modified = self.config_file.stat().st_mtime
                 logger.info(f"Loaded configuration from {self.config_file}")
                 
             except (json.JSONDecodeError, OSError) as e:
@@ -118,17 +184,25 @@ class ConfigManager:
         else:
             logger.info(f"Configuration file {self.config_file} not found, using defaults")
             # Create file with defaults
-            await self._save_to_file(config)
+            stamp = self._write_file(config)
         
         # Final validation
         validation_errors = self._validate_config(config)
         if validation_errors:
             raise ValidationError("Invalid configuration", validation_errors)
         
-        self._config = config
+        return ConfigSnapshot(version=version, values=freeze(config)), stamp
     
     async def save_config(self, new_config: Dict[str, Any]) -> None:
-        """Save configuration to file with validation and change detection"""
+        """
+        Save configuration with validation and change detection.
+        The new snapshot is served right away and observers are notified in
+        order, outside the lock, so a slow observer does not hold up other
+        saves; the file is written once per debounce window, and the call
+        returns when observers have seen the change and the write covering it
+        is on disk. If that write fails, the configuration on disk is swapped
+        back in (observers are notified of it in turn) before the error is raised.
+        """
         async with self._lock:
             # Validate new configuration
             validation_errors = self._validate_config(new_config)
@@ -136,26 +210,164 @@ class ConfigManager:
                 raise ValidationError("Configuration validation failed", validation_errors)
             
             # Detect changes
-            old_config = self._config.copy() if self._config else {}
+            current = self.snapshot
+            old_config = current.to_dict()
             changed_keys = self._detect_changes(old_config, new_config)
             
             if not changed_keys:
                 logger.info("No configuration changes detected")
                 return
             
-            # Create backup and save
-            await self._save_to_file(new_config)
-            
-            # Update internal state
-            old_values = {key: old_config.get(key) for key in changed_keys}
-            new_values = {key: new_config.get(key) for key in changed_keys}
-            self._config = new_config.copy()
-            
-            # Notify observers
-            change_event = ConfigChangeEvent(changed_keys, old_values, new_values)
-            await self._notify_observers(change_event)
+            # Swap in the new snapshot
+            self._snapshot = ConfigSnapshot(
+                version=current.version + 1,
+                values=freeze(copy.deepcopy(new_config))
+            )
+            written = self._schedule_write()
+            delivered = self._publish_changes(old_config, new_config, changed_keys)
+        
+        await self._wait_delivered(delivered)
+        await asyncio.shield(written)
+    
+    def _schedule_write(self) -> asyncio.Future:
+        """Join the open debounce window or start a new one"""
+        if self._pending_write is None:
+            self._pending_write = asyncio.get_running_loop().create_future()
+            asyncio.create_task(self._write_pending(self._pending_write))
+        return self._pending_write
+    
+    async def _write_pending(self, written: asyncio.Future) -> None:
+        """Write the latest snapshot once the debounce window closes"""
+        await asyncio.sleep(CONFIG_WRITE_DELAY)
+        async with self._write_lock:
+            # Saves from here on open a new window
+            self._pending_write = None
+            snapshot = self._snapshot
+            try:
+                self._known_stamp = await asyncio.to_thread(self._write_file, snapshot.to_dict())
+            except ConfigurationError as e:
+                logger.error(f"Failed to write configuration version {snapshot.version}: {e}")
+                await self._restore_stored(snapshot)
+                written.set_exception(e)
+                # Waiters get the error; avoid an unretrieved-exception warning otherwise
+                written.exception()
+                return
+            self._stored_values = snapshot.values
+            written.set_result(snapshot.version)
+    
+    async def _restore_stored(self, failed: ConfigSnapshot) -> None:
+        """Swap the configuration on disk back in after the write of a snapshot failed"""
+        async with self._lock:
+            # A newer save is pending; its own write lands or restores in turn
+            if self._snapshot is not failed or self._stored_values is None:
+                return
+            old_config = failed.to_dict()
+            new_config = thaw(self._stored_values)
+            changed_keys = self._detect_changes(old_config, new_config)
+            self._snapshot = ConfigSnapshot(version=failed.version + 1, values=self._stored_values)
+            if changed_keys:
+                logger.warning("Restored the configuration on disk after a failed write")
+                self._publish_changes(old_config, new_config, changed_keys)
+    
+    async def flush(self) -> None:
+        """Wait until every saved change is written to disk"""
+        while self._pending_write is not None or self._write_lock.locked():
+            pending = self._pending_write
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            else:
+                # A write is in progress; wait for it to release the lock
+                async with self._write_lock:
+                    pass
+    
+    def _publish_changes(self, old_config: Dict[str, Any], new_config: Dict[str, Any], changed_keys: Set[str]) -> asyncio.Future:
+        """Queue the change event of a swapped snapshot for observers (call with the lock held so
+        events keep snapshot order). Returns a future resolved once observers have seen it."""
+        old_values = {key: copy.deepcopy(old_config.get(key)) for key in changed_keys}
+        new_values = {key: copy.deepcopy(new_config.get(key)) for key in changed_keys}
+        change_event = ConfigChangeEvent(changed_keys, old_values, new_values)
+        delivered = asyncio.get_running_loop().create_future()
+        self._notifications.append((change_event, delivered))
+        if self._notify_task is None or self._notify_task.done():
+            self._notify_task = asyncio.create_task(self._deliver_notifications())
+        
+        logger.info(f"Configuration updated (version {self.snapshot.version}). Changed keys: {', '.join(changed_keys)}")
+        return delivered
+    
+    async def _deliver_notifications(self) -> None:
+        """Notify observers of queued change events, one event at a time"""
+        while self._notifications:
+            change_event, delivered = self._notifications.popleft()
+            try:
+                await self._notify_observers(change_event)
+            finally:
+                if not delivered.done():
+                    delivered.set_result(None)
+    
+    async def _wait_delivered(self, delivered: asyncio.Future) -> None:
+        """Wait until observers have seen a change, unless called by one of them (it would wait on itself)"""
+        if asyncio.current_task() is not self._notify_task:
+            await asyncio.shield(delivered)
+    
+    def start_watching(self) -> None:
+        """Start picking up external edits of the configuration file"""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch_file())
+    
+    async def stop_watching(self) -> None:
+        """Stop the file watcher and write out pending changes"""
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            await asyncio.gather(self._watch_task, return_exceptions=True)
+            self._watch_task = None
+        await self.flush()
+    
+    async def _watch_file(self) -> None:
+        """Reload the snapshot when the file changes (inotify via watchfiles, else polling)"""
+        if awatch is not None:
+            logger.info(f"Watching {self.config_file} for changes")
+            # Watch the directory so atomic replaces of the file are seen
+            async for changes in awatch(self.config_file.resolve().parent, recursive=False):
+                if any(Path(path).name == self.config_file.name for _, path in changes):
+                    await self.reload_if_changed()
+        else:
+            logger.info(f"Polling {self.config_file} for changes every {CONFIG_POLL_INTERVAL}s")
+            while True:
+                await asyncio.sleep(CONFIG_POLL_INTERVAL)
+                await self.reload_if_changed()
+    
+    async def reload_if_changed(self) -> bool:
+        """Swap in a new snapshot if the file differs from the current one.
+        Returns True if the configuration was reloaded."""
+        async with self._lock:
+            current = self.snapshot
+            # The file is behind the snapshot until our own pending write lands
+            if self._pending_write is not None or self._write_lock.locked():
+                return False
+            stamp = self._file_stamp()
+            if stamp is None or stamp == self._known_stamp:
+                return False
+            try:
+                snapshot, stamp = await asyncio.to_thread(self._read_snapshot, current.version + 1)
+            except (ConfigurationError, ValidationError) as e:
+                # Keep serving the last good configuration until the file is fixed
+                logger.error(f"Ignoring invalid edit of {self.config_file}: {e}")
+                self._known_stamp = stamp
+                return False
+            self._known_stamp = stamp
+            self._stored_values = snapshot.values
             
-            logger.info(f"Configuration updated. Changed keys: {', '.join(changed_keys)}")
+            old_config = current.to_dict()
+            new_config = snapshot.to_dict()
+            changed_keys = self._detect_changes(old_config, new_config)
+            self._snapshot = snapshot
+            if not changed_keys:
+                return False
+            logger.info(f"Detected external edit of {self.config_file}")
+            delivered = self._publish_changes(old_config, new_config, changed_keys)
+        
+        await self._wait_delivered(delivered)
+        return True
     
     def _detect_changes(self, old_config: Dict[str, Any], new_config: Dict[str, Any]) -> Set[str]:
         """Detect which configuration keys have changed"""
@@ -173,32 +385,43 @@ class ConfigManager:
         
         return changed_keys
     
-    async def _save_to_file(self, config: Dict[str, Any]):
-        """Save configuration to file with backup"""
+    def _write_file(self, config: Dict[str, Any]) -> Optional[Tuple[float, int]]:
+        """
+        Atomically replace the configuration file and return its new stamp.
+        The contents go to a synced temporary file in the same directory that is
+        renamed over the live file, so a crash leaves either the old or the new
+        configuration and never a missing or partial one. Blocking; run it off-loop.
+        """
+        directory = self.config_file.resolve().parent
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{self.config_file.name}.", suffix=".tmp")
         try:
-            # Create backup if file exists
-            if self.config_file.exists():
-                backup_path = Path(f"{self.config_file}.backup")
-                self.config_file.rename(backup_path)
-            
-            # Write new configuration
-            with open(self.config_file, 'w', encoding='utf-8') as f:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
                 json.dump(config, f, indent=2, ensure_ascii=False)
-            
-            # Remove backup on success
-            backup_path = Path(f"{self.config_file}.backup")
-            if backup_path.exists():
-                backup_path.unlink()
-                
-            # Update last modified time
-            self._last_modified = self.config_file.stat().st_mtime
-            
-        except OSError as e:
-            # Restore backup if save failed
-            backup_path = Path(f"{self.config_file}.backup")
-            if backup_path.exists():
-                backup_path.rename(self.config_file)
+                f.flush()
+                os.fsync(f.fileno())
+            # Keep the permissions of the file being replaced
+            try:
+                os.chmod(temp_path, stat.S_IMODE(self.config_file.stat().st_mode))
+            except FileNotFoundError:
+                pass
+            os.replace(temp_path, self.config_file)
+        except (OSError, TypeError, ValueError) as e:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
             raise ConfigurationError(f"Error saving configuration: {e}")
+        
+        # Persist the rename itself (not supported on every platform)
+        try:
+            dir_fd = os.open(directory, os.O_RDONLY)
+            try:
+                os.fsync(dir_fd)
+            finally:
+                os.close(dir_fd)
+        except OSError:
+            pass
+        return self._file_stamp()
     
     def _validate_config(self, config: Dict[str, Any]) -> List[str]:
         """Validate configuration structure and values"""
@@ -229,10 +452,41 @@ class ConfigManager:
             elif timeout <= 0:
                 errors.append("approval_timeout must be positive")
         
+        for key in ("tool_timeout", "ws_ping_interval", "ws_idle_timeout"):
+            if key in config:
+                value = config[key]
+                if not isinstance(value, (int, float)) or isinstance(value, bool):
+                    errors.append(f"{key} must be a number")
+                elif value <= 0:
+                    errors.append(f"{key} must be positive")
+        
+        if "tool_cache_max_entries" in config:
+            value = config["tool_cache_max_entries"]
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                errors.append("tool_cache_max_entries must be a positive integer")
+        
+        if "tool_cache_persist" in config:
+            if not isinstance(config["tool_cache_persist"], bool):
+                errors.append("tool_cache_persist must be a boolean")
+        
         if "auto_approve_tools" in config:
             if not isinstance(config["auto_approve_tools"], bool):
                 errors.append("auto_approve_tools must be a boolean")
         
+        if "early_tool_approval" in config:
+            if not isinstance(config["early_tool_approval"], bool):
+                errors.append("early_tool_approval must be a boolean")
+        
+        if "approval_rules" in config:
+            errors.extend(self._validate_approval_rules(config["approval_rules"]))
+        
+        if "mcp_package_pins" in config:
+            pins = config["mcp_package_pins"]
+            if not isinstance(pins, dict) or not all(
+                isinstance(k, str) and isinstance(v, str) and v for k, v in pins.items()
+            ):
+                errors.append("mcp_package_pins must map package names to version strings")
+        
         # Validate MCP servers
         if "mcp_servers" in config:
             mcp_errors = self._validate_mcp_servers(config["mcp_servers"])
@@ -280,6 +534,35 @@ class ConfigManager:
         
         return errors
     
+    def _validate_approval_rules(self, rules: Any) -> List[str]:
+        """Validate tool approval rules"""
+        errors = []
+        
+        if not isinstance(rules, list):
+            errors.append("approval_rules must be an array")
+            return errors
+        
+        for i, rule in enumerate(rules):
+            if not isinstance(rule, dict):
+                errors.append(f"approval_rules[{i}] must be an object")
+                continue
+            if rule.get("action") not in ("allow", "deny", "ask"):
+                errors.append(f"approval_rules[{i}].action must be one of allow, deny, ask")
+            for key in ("server", "tool", "path_under", "path_arg"):
+                if key in rule and not isinstance(rule[key], str):
+                    errors.append(f"approval_rules[{i}].{key} must be a string")
+            if "args" in rule:
+                if not isinstance(rule["args"], dict) or not all(isinstance(v, str) for v in rule["args"].values()):
+                    errors.append(f"approval_rules[{i}].args must map argument names to regular expressions")
+                else:
+                    for name, pattern in rule["args"].items():
+                        try:
+                            re.compile(pattern)
+                        except re.error as e:
+                            errors.append(f"approval_rules[{i}].args.{name} is not a valid regular expression: {e}")
+        
+        return errors
+    
     def _validate_mcp_servers(self, mcp_servers: Any) -> List[str]:
         """Validate MCP servers configuration"""
         errors = []
@@ -297,11 +580,35 @@ class ConfigManager:
                 errors.append(f"Server '{server_name}' config must be an object")
                 continue
                 
-            # Validate required fields
-            if 'command' not in config:
-                errors.append(f"Server '{server_name}' missing required 'command' field")
+            # Validate required fields: a command to spawn, or the url of a running server
+            if 'command' in config and 'url' in config:
+                errors.append(f"Server '{server_name}' must set either 'command' or 'url', not both")
+            elif 'url' in config:
+                url = config['url']
+                if not isinstance(url, str) or not url.startswith(('http://', 'https://')):
+                    errors.append(f"Server '{server_name}' url must be an http(s) URL")
+            elif 'command' not in config:
+                errors.append(f"Server '{server_name}' missing required 'command' (or 'url') field")
             elif not isinstance(config['command'], str) or not config['command'].strip():
                 errors.append(f"Server '{server_name}' command must be a non-empty string")
+            
+            if 'preinstall' in config and not isinstance(config['preinstall'], bool):
+                errors.append(f"Server '{server_name}' preinstall must be a boolean")
+            
+            if 'transport' in config and config['transport'] not in ('streamable-http', 'sse'):
+                errors.append(f"Server '{server_name}' transport must be 'streamable-http' or 'sse'")
+            
+            if 'headers' in config:
+                if not isinstance(config['headers'], dict) or not all(
+                    isinstance(k, str) and isinstance(v, str) for k, v in config['headers'].items()
+                ):
+                    errors.append(f"Server '{server_name}' headers must be an object with string keys and values")
+            
+            for key in ('timeout', 'read_timeout'):
+                if key in config:
+                    value = config[key]
+                    if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                        errors.append(f"Server '{server_name}' {key} must be a positive number")
                 
             # Validate optional fields
             if 'args' in config:
@@ -316,13 +623,69 @@ class ConfigManager:
                 elif not all(isinstance(k, str) and isinstance(v, str) 
                            for k, v in config['env'].items()):
                     errors.append(f"Server '{server_name}' env must be an object with string keys and values")
+            
+            if 'max_concurrency' in config:
+                value = config['max_concurrency']
+                if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                    errors.append(f"Server '{server_name}' max_concurrency must be a positive integer")
+            
+            if 'lazy' in config and not isinstance(config['lazy'], bool):
+                errors.append(f"Server '{server_name}' lazy must be a boolean")
+            
+            if 'idle_timeout' in config:
+                value = config['idle_timeout']
+                if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                    errors.append(f"Server '{server_name}' idle_timeout must be a positive number")
+            
+            if 'stateless' in config and not isinstance(config['stateless'], bool):
+                errors.append(f"Server '{server_name}' stateless must be a boolean")
+            
+            if 'pool' in config:
+                pool = config['pool']
+                positive_int = lambda v: isinstance(v, int) and not isinstance(v, bool) and v >= 1
+                if not isinstance(pool, dict):
+                    errors.append(f"Server '{server_name}' pool must be an object")
+                elif not config.get('stateless'):
+                    errors.append(f"Server '{server_name}' pool requires the server to be declared stateless")
+                elif not all(positive_int(pool.get(key, 1)) for key in ('min_instances', 'max_instances')):
+                    errors.append(f"Server '{server_name}' pool min_instances and max_instances must be positive integers")
+                elif pool.get('max_instances', pool.get('min_instances', 1)) < pool.get('min_instances', 1):
+                    errors.append(f"Server '{server_name}' pool max_instances must not be below min_instances")
+                elif 'idle_timeout' in pool and (
+                    not isinstance(pool['idle_timeout'], (int, float)) or isinstance(pool['idle_timeout'], bool)
+                    or pool['idle_timeout'] <= 0
+                ):
+                    errors.append(f"Server '{server_name}' pool idle_timeout must be a positive number")
+            
+            if 'startup_timeout' in config:
+                value = config['startup_timeout']
+                if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                    errors.append(f"Server '{server_name}' startup_timeout must be a positive number")
+            
+            if 'tool_timeout' in config:
+                value = config['tool_timeout']
+                if not isinstance(value, (int, float)) or isinstance(value, bool) or value <= 0:
+                    errors.append(f"Server '{server_name}' tool_timeout must be a positive number")
+            
+            if 'tool_timeouts' in config:
+                timeouts = config['tool_timeouts']
+                if not isinstance(timeouts, dict) or not all(
+                    isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0 for v in timeouts.values()
+                ):
+                    errors.append(f"Server '{server_name}' tool_timeouts must map tool names to positive numbers")
+            
+            if 'cache_tools' in config:
+                ttls = config['cache_tools']
+                if not isinstance(ttls, dict) or not all(
+                    isinstance(v, (int, float)) and not isinstance(v, bool) and v > 0 for v in ttls.values()
+                ):
+                    errors.append(f"Server '{server_name}' cache_tools must map tool names to positive TTL seconds")
         
         return errors
     
     async def get_value(self, key: str, default: Any = None) -> Any:
-        """Get a specific configuration value"""
-        config = await self.load_config()
-        return config.get(key, default)
+        """Get a specific configuration value (a mutable copy for objects and arrays)"""
+        return thaw(self.snapshot.get(key, default))
     
     async def update_value(self, key: str, value: Any) -> None:
         """Update a specific configuration value"""
@@ -352,9 +715,10 @@ class ConfigManager:
                 logger.error(f"Error notifying configuration observer: {e}", exc_info=True)
     
     def invalidate(self) -> None:
-        """Force reload of configuration on next access"""
-        self._config = None
-        self._last_modified = None
+        """Force reload of configuration on next access (with a version after the current one)"""
+        if self._snapshot is not None:
+            self._last_version = self._snapshot.version
+        self._snapshot = None
 
 # Global configuration manager instance
 config_manager = ConfigManager()
@@ -24,3 +24,9 @@ class ValidationError(MCPChatException):
 class SettingsError(MCPChatException):
     """Raised when settings operations fail"""
     pass
+
+class AttachmentError(MCPChatException):
+    """Raised when an uploaded attachment is rejected"""
+    def __init__(self, message: str, status_code: int = 400):
+        super().__init__(message)
+        self.status_code = status_code
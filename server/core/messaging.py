@@ -3,9 +3,16 @@
 WebSocket Messenger - Handles all WebSocket communication for the chat application
 """
 
+import asyncio
 import logging
+from typing import Optional, Tuple, TYPE_CHECKING
 from fastapi import WebSocket
 
+from core.serialization import dumps_str
+
+if TYPE_CHECKING:
+    from services.conversation_hub import ConversationChannel
+
 logger = logging.getLogger(__name__)
 
 class WebSocketMessenger:
@@ -13,17 +20,34 @@ class WebSocketMessenger:
     
     def __init__(self, websocket: WebSocket):
         self.websocket = websocket
+        # When set, messages are published to every observer of the conversation
+        self.channel: Optional["ConversationChannel"] = None
+        # Serializes writes so replayed and live frames cannot interleave
+        self.send_lock = asyncio.Lock()
     
     async def send_message(self, message_type: str, **data):
         """Send a message to the WebSocket client"""
         try:
-            await self.websocket.send_json({
+            frame = dumps_str({
                 "type": message_type,
                 **data
             })
+            if self.channel is not None:
+                await self.channel.publish(message_type, frame, data)
+            else:
+                await self.send_raw(message_type, frame)
         except Exception as e:
             logger.error(f"Failed to send WebSocket message: {e}")
     
+    async def send_raw(self, message_type: str, frame: str):
+        """Send an already-encoded frame to the WebSocket client"""
+        async with self.send_lock:
+            await self.write_frame(message_type, frame)
+    
+    async def write_frame(self, message_type: str, frame: str):
+        """Write an encoded frame to the transport (caller holds send_lock)"""
+        await self.websocket.send_text(frame)
+    
     async def send_system_ready(self, message: str):
         """Send system ready notification"""
         await self.send_message("system_ready", message=message)
@@ -77,3 +101,29 @@ class WebSocketMessenger:
     async def send_error(self, message: str):
         """Send error message"""
         await self.send_message("error", message=message)
+
+
+class QueueMessenger(WebSocketMessenger):
+    """Messenger that queues outgoing frames instead of writing to a socket.
+    Used by HTTP streaming endpoints, which drain the queue into their response."""
+    
+    def __init__(self):
+        super().__init__(None)
+        self.queue: asyncio.Queue[Optional[Tuple[str, str]]] = asyncio.Queue()
+    
+    async def write_frame(self, message_type: str, frame: str):
+        """Queue an encoded frame for the streaming response"""
+        await self.queue.put((message_type, frame))
+    
+    def close(self):
+        """Signal that no more messages will be sent"""
+        self.queue.put_nowait(None)
+    
+    def __aiter__(self):
+        return self
+    
+    async def __anext__(self) -> Tuple[str, str]:
+        item = await self.queue.get()
+        if item is None:
+            raise StopAsyncIteration
+        return item
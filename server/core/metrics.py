@@ -0,0 +1,32 @@
+#!/usr/bin/env python3
+"""
+Metrics - In-process counters for runtime statistics
+"""
+
+from collections import defaultdict
+from typing import Dict
+
+class Metrics:
+    """Named monotonic counters, exposed through the health API"""
+
+    def __init__(self):
+        self._counters: Dict[str, int] = defaultdict(int)
+
+    def incr(self, name: str, value: int = 1) -> None:
+        """Increment a counter"""
+        self._counters[name] += value
+
+    def get(self, name: str) -> int:
+        """Get the current value of a counter"""
+        return self._counters.get(name, 0)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Get a copy of all counters"""
+        return dict(sorted(self._counters.items()))
+
+    def reset(self) -> None:
+        """Reset all counters"""
+        self._counters.clear()
+
+# Global metrics instance
+metrics = Metrics()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+JSON Serialization - Shared codec for REST responses and WebSocket frames
+"""
+
+import dataclasses
+import json
+from datetime import date, datetime, time
+from pathlib import Path
+from typing import Any, Union
+
+from starlette.responses import JSONResponse as StarletteJSONResponse
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised when orjson is not installed
+    orjson = None
+
+def _default(obj: Any) -> Any:
+    """Encode types that neither encoder handles natively"""
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, Path):
+        return str(obj)
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+
+    def dumps_str(obj: Any) -> str:
+        """Serialize an object to a JSON string"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS).decode("utf-8")
+
+    def loads(data: Union[str, bytes, bytearray]) -> Any:
+        """Deserialize JSON text or bytes"""
+        return orjson.loads(data)
+else:
+    _encoder = json.JSONEncoder(default=_default, ensure_ascii=False, separators=(",", ":"))
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize an object to JSON bytes"""
+        return _encoder.encode(obj).encode("utf-8")
+
+    def dumps_str(obj: Any) -> str:
+        """Serialize an object to a JSON string"""
+        return _encoder.encode(obj)
+
+    def loads(data: Union[str, bytes, bytearray]) -> Any:
+        """Deserialize JSON text or bytes"""
+        return json.loads(data)
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+class JSONResponse(StarletteJSONResponse):
+    """FastAPI response class rendering through the shared codec"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
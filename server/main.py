@@ -12,10 +12,18 @@ from api.conversations import router as conversations_router
 from api.settings import router as settings_router
 from api.mcp_servers import router as mcp_servers_router
 from api.llm_providers import router as llm_providers_router
+from api.attachments import router as attachments_router
+from api.chat import router as chat_router
+from api.health import router as health_router
 from api.websocket import websocket_endpoint
 from core.database import init_db
 from core.config import config_manager
-from services.mcp_service import get_mcp_manager
+from core.serialization import JSONResponse
+from services.mcp_service import get_mcp_manager, GlobalMCPManager
+from services.live_updates import live_updates
+from services.tool_cache import tool_result_cache
+from services.mcp_launcher import launch_cache
+from services.attachment_service import attachment_store
 
 # Configure logging
 logging.basicConfig(
@@ -25,7 +33,7 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Create FastAPI app
-app = FastAPI(title="MCP Chat Web Client", version="1.0.0")
+app = FastAPI(title="MCP Chat Web Client", version="1.0.0", default_response_class=JSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -41,6 +49,9 @@ app.include_router(conversations_router)
 app.include_router(settings_router)
 app.include_router(mcp_servers_router)
 app.include_router(llm_providers_router)
+app.include_router(attachments_router)
+app.include_router(chat_router)
+app.include_router(health_router)
 
 # WebSocket endpoint
 @app.websocket("/ws")
@@ -55,13 +66,34 @@ async def startup_event():
     await init_db()
     logger.info("Database initialized")
     
+    # Drop uploads left unreferenced by earlier runs
+    await attachment_store.sweep_unused()
+    
+    # Push settings and MCP server changes to connected clients
+    live_updates.start()
+    
     logger.info("Loading configuration...")
     await config_manager.load_config()
+    # Pick up edits of settings.json made outside the app
+    config_manager.start_watching()
     logger.info("Configuration loaded")
     
+    # MCP servers start in the background; readiness is reported by /api/health/ready
     logger.info("Initializing Global MCP Manager...")
     await get_mcp_manager()
-    logger.info("Global MCP Manager initialized")
+    logger.info("Global MCP Manager initialized, MCP servers starting")
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Release resources on shutdown"""
+    # Pins saved in the background go out with the final configuration write
+    await launch_cache.flush()
+    await config_manager.stop_watching()
+    live_updates.stop()
+    await tool_result_cache.flush()
+    mcp_manager = GlobalMCPManager.get_existing()
+    if mcp_manager is not None:
+        await mcp_manager.shutdown()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Approval Policy - Rule-based tool approval decisions and remembered grants
+"""
+
+import fnmatch
+import logging
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Mapping, Optional, Pattern, Sequence, Set, Tuple
+
+from core.config import config_manager
+
+logger = logging.getLogger(__name__)
+
+# Rule actions
+ALLOW = "allow"
+DENY = "deny"
+ASK = "ask"
+RULE_ACTIONS = (ALLOW, DENY, ASK)
+
+# How long an approval decision is remembered
+REMEMBER_SCOPES = ("session", "conversation", "always")
+
+def _compile_glob(pattern: Optional[str]) -> Optional[Pattern]:
+    """Compile a shell-style glob into a regex (None matches anything)"""
+    if pattern is None:
+        return None
+    return re.compile(fnmatch.translate(pattern))
+
+def _is_under(value: Any, directory: str) -> bool:
+    """Whether an absolute path argument (or every path in a list) resolves inside a directory.
+    Relative paths depend on the server's working directory and never match; symlinks are
+    resolved, so a link inside the directory cannot point the call elsewhere."""
+    values = value if isinstance(value, list) else [value]
+    if not values:
+        return False
+    for item in values:
+        if not isinstance(item, str):
+            return False
+        item = os.path.expanduser(item)
+        if not os.path.isabs(item):
+            return False
+        if os.path.commonpath([os.path.realpath(item), directory]) != directory:
+            return False
+    return True
+
+@dataclass
+class CompiledRule:
+    """An approval rule with its patterns compiled once"""
+    action: str
+    server: Optional[Pattern] = None
+    tool: Optional[Pattern] = None
+    args: List[Tuple[str, Pattern]] = field(default_factory=list)
+    path_under: Optional[str] = None
+    path_arg: str = "path"
+
+    @classmethod
+    def from_config(cls, rule: Mapping[str, Any]) -> "CompiledRule":
+        path_under = rule.get("path_under")
+        return cls(
+            action=rule["action"],
+            server=_compile_glob(rule.get("server")),
+            tool=_compile_glob(rule.get("tool")),
+            args=[(name, re.compile(pattern)) for name, pattern in rule.get("args", {}).items()],
+            path_under=os.path.realpath(os.path.expanduser(path_under)) if path_under else None,
+            path_arg=rule.get("path_arg", "path"),
+        )
+
+    def matches_call(self, tool_name: str, args: Dict[str, Any]) -> bool:
+        """Match everything except the server"""
+        if self.tool is not None and not self.tool.match(tool_name):
+            return False
+        for name, pattern in self.args:
+            if name not in args or not pattern.search(str(args[name])):
+                return False
+        if self.path_under is not None:
+            if self.path_arg not in args or not _is_under(args[self.path_arg], self.path_under):
+                return False
+        return True
+
+class ApprovalPolicy:
+    """
+    Evaluates the `approval_rules` setting against tool calls.
+    Rules are compiled once per configuration change and checked in order;
+    the first match decides. Calls no rule matches are sent to the user.
+    """
+
+    def __init__(self):
+        self._source: Optional[Sequence[Mapping[str, Any]]] = None
+        self._rules: List[CompiledRule] = []
+        # Grants remembered for conversations: conversation_id -> {(server, tool)}
+        self.conversation_grants: Dict[str, Set[Tuple[Optional[str], str]]] = {}
+
+    def load(self, rules: Sequence[Mapping[str, Any]]) -> None:
+        """Compile rules unless they are the (immutable) rules of the last call"""
+        if rules is self._source:
+            return
+        self._rules = [CompiledRule.from_config(rule) for rule in rules]
+        self._source = rules
+        logger.info(f"Compiled {len(self._rules)} tool approval rules")
+
+    def evaluate(self, server_name: Optional[str], tool_name: str, args: Dict[str, Any]) -> Optional[str]:
+        """
+        Decide a call: ALLOW, DENY or ASK.
+        Returns None when the server is unknown (None) and a server-scoped rule
+        could decide the call, so the caller must wait until the server is known.
+        """
+        for rule in self._rules:
+            if not rule.matches_call(tool_name, args):
+                continue
+            if rule.server is not None:
+                if server_name is None:
+                    return None
+                if not rule.server.match(server_name):
+                    continue
+            return rule.action
+        return ASK
+
+    def grant_conversation(self, conversation_id: str, server_name: Optional[str], tool_name: str) -> None:
+        """Allow a tool for the rest of a conversation"""
+        self.conversation_grants.setdefault(conversation_id, set()).add((server_name, tool_name))
+
+    def forget_conversation(self, conversation_id: str) -> None:
+        """Drop the grants of a conversation"""
+        self.conversation_grants.pop(conversation_id, None)
+
+    async def grant_always(self, server_name: Optional[str], tool_name: str) -> None:
+        """Persist an allow rule for a tool in the approval_rules setting"""
+        rule: Dict[str, Any] = {"action": ALLOW, "tool": tool_name}
+        if server_name:
+            rule["server"] = server_name
+        config = await config_manager.load_config()
+        rules = list(config.get("approval_rules", []))
+        if rule in rules:
+            return
+        # Place it after every deny rule so it wins over broader ask rules but never over a deny
+        position = max((i + 1 for i, existing in enumerate(rules) if existing.get("action") == DENY), default=0)
+        config["approval_rules"] = rules[:position] + [rule] + rules[position:]
+        await config_manager.save_config(config)
+        logger.info(f"Persisted approval rule: {rule}")
+
+def find_grant(grants: Set[Tuple[Optional[str], str]], server_name: Optional[str], tool_name: str) -> Optional[bool]:
+    """
+    Look up a remembered grant; grants made without a known server cover every server.
+    Returns None when the server is unknown and only a server-specific grant
+    exists for the tool, so the caller must wait until the server is known.
+    """
+    if (None, tool_name) in grants:
+        return True
+    if server_name is not None:
+        return (server_name, tool_name) in grants
+    if any(tool == tool_name for _, tool in grants):
+        return None
+    return False
+
+# Global approval policy instance
+approval_policy = ApprovalPolicy()
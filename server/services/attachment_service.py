@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+Attachment Service - Out-of-band storage for chat attachments uploaded over HTTP
+"""
+
+import asyncio
+import hashlib
+import logging
+import os
+import tempfile
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import AsyncIterator, Dict, Optional
+
+from core.exceptions import AttachmentError
+
+logger = logging.getLogger(__name__)
+
+# Directory attachments are stored in (relative to the working directory, like the database)
+ATTACHMENTS_DIR = "attachments"
+# Upload limits
+MAX_ATTACHMENT_SIZE = 20 * 1024 * 1024
+# Seconds an upload may wait to be referenced by a chat message before it is deleted
+UNUSED_ATTACHMENT_TTL = 3600.0
+# Minimum seconds between sweeps for unused uploads
+SWEEP_INTERVAL = 300.0
+# Bytes buffered in memory before handing a write to the worker thread
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+# Magic-byte signatures for supported media types
+MEDIA_TYPE_EXTENSIONS = {
+    "image/png": "png",
+    "image/jpeg": "jpg",
+    "image/gif": "gif",
+    "image/webp": "webp",
+}
+
+def sniff_media_type(header: bytes) -> Optional[str]:
+    """Detect the media type of an upload from its leading bytes"""
+    if header.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if header.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if header.startswith((b"GIF87a", b"GIF89a")):
+        return "image/gif"
+    if header[:4] == b"RIFF" and header[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+@dataclass
+class StoredAttachment:
+    """Metadata for an attachment stored on disk"""
+    id: str
+    name: str
+    media_type: str
+    size: int
+    path: Path
+
+class AttachmentStore:
+    """
+    Content-addressed attachment store.
+    Attachments are identified by the SHA-256 of their content, so repeated
+    uploads of the same file are deduplicated and IDs survive restarts.
+    Uploads wait in a pending directory until a chat message claims them;
+    those never claimed are deleted after UNUSED_ATTACHMENT_TTL.
+    """
+
+    def __init__(self, base_dir: Optional[Path] = None, max_size: int = MAX_ATTACHMENT_SIZE):
+        self.base_dir = base_dir or Path(ATTACHMENTS_DIR)
+        self.max_size = max_size
+        self._index: Dict[str, StoredAttachment] = {}
+        self._last_sweep = 0.0
+
+    @property
+    def pending_dir(self) -> Path:
+        return self.base_dir / "pending"
+
+    async def save_stream(self, chunks: AsyncIterator[bytes], name: str = "", declared_type: Optional[str] = None) -> StoredAttachment:
+        """Stream an upload to disk, enforcing size limits and sniffing its content type"""
+        if time.time() - self._last_sweep >= SWEEP_INTERVAL:
+            await self.sweep_unused()
+        await asyncio.to_thread(self.pending_dir.mkdir, parents=True, exist_ok=True)
+        fd, temp_name = await asyncio.to_thread(tempfile.mkstemp, dir=self.pending_dir, suffix=".part")
+        temp_path = Path(temp_name)
+        hasher = hashlib.sha256()
+        size = 0
+        header = b""
+        buffer = bytearray()
+
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in chunks:
+                    if not chunk:
+                        continue
+                    size += len(chunk)
+                    if size > self.max_size:
+                        raise AttachmentError(
+                            f"Attachment exceeds maximum size of {self.max_size} bytes",
+                            status_code=413
+                        )
+                    if len(header) < 16:
+                        header += chunk[:16 - len(header)]
+                    buffer.extend(chunk)
+                    if len(buffer) >= WRITE_BUFFER_SIZE:
+                        await asyncio.to_thread(self._write_block, f, hasher, bytes(buffer))
+                        buffer.clear()
+                if buffer:
+                    await asyncio.to_thread(self._write_block, f, hasher, bytes(buffer))
+
+            if size == 0:
+                raise AttachmentError("Attachment is empty")
+
+            media_type = sniff_media_type(header)
+            if media_type is None:
+                raise AttachmentError(
+                    f"Unsupported attachment type: {declared_type or 'unknown'}",
+                    status_code=415
+                )
+            if declared_type and declared_type != media_type:
+                logger.warning(f"Declared type {declared_type} does not match sniffed type {media_type} for {name}")
+
+            attachment_id = hasher.hexdigest()
+            filename = f"{attachment_id}.{MEDIA_TYPE_EXTENSIONS[media_type]}"
+            final_path = self.base_dir / filename
+            if await asyncio.to_thread(final_path.exists):
+                # Already claimed by an earlier message
+                await asyncio.to_thread(temp_path.unlink)
+            else:
+                final_path = self.pending_dir / filename
+                await asyncio.to_thread(os.replace, temp_path, final_path)
+        except BaseException:
+            await asyncio.to_thread(temp_path.unlink, missing_ok=True)
+            raise
+
+        attachment = StoredAttachment(
+            id=attachment_id,
+            name=name or final_path.name,
+            media_type=media_type,
+            size=size,
+            path=final_path
+        )
+        self._index[attachment_id] = attachment
+        logger.info(f"Stored attachment {attachment_id} ({media_type}, {size} bytes)")
+        return attachment
+
+    @staticmethod
+    def _write_block(f, hasher, block: bytes) -> None:
+        """Hash and write a block of upload data (runs in a worker thread)"""
+        hasher.update(block)
+        f.write(block)
+
+    def get(self, attachment_id: str) -> Optional[StoredAttachment]:
+        """Look up an attachment by ID, falling back to the files on disk"""
+        attachment = self._index.get(attachment_id)
+        if attachment:
+            return attachment
+
+        # IDs are hex digests; reject anything else before touching the filesystem
+        if len(attachment_id) != 64 or not all(c in "0123456789abcdef" for c in attachment_id):
+            return None
+
+        for media_type, extension in MEDIA_TYPE_EXTENSIONS.items():
+            path = self.base_dir / f"{attachment_id}.{extension}"
+            if not path.exists():
+                path = self.pending_dir / path.name
+            if path.exists():
+                attachment = StoredAttachment(
+                    id=attachment_id,
+                    name=path.name,
+                    media_type=media_type,
+                    size=path.stat().st_size,
+                    path=path
+                )
+                self._index[attachment_id] = attachment
+                return attachment
+        return None
+
+    async def read_bytes(self, attachment: StoredAttachment) -> bytes:
+        """Read attachment content without blocking the event loop"""
+        return await asyncio.to_thread(attachment.path.read_bytes)
+
+    async def claim(self, attachment: StoredAttachment) -> None:
+        """Keep an attachment a chat message referenced, exempting it from the unused sweep"""
+        if attachment.path.parent != self.pending_dir:
+            return
+        claimed_path = self.base_dir / attachment.path.name
+        try:
+            await asyncio.to_thread(os.replace, attachment.path, claimed_path)
+        except FileNotFoundError:
+            # Claimed concurrently by another message
+            pass
+        attachment.path = claimed_path
+
+    async def sweep_unused(self, max_age: float = UNUSED_ATTACHMENT_TTL) -> int:
+        """Delete uploads (and partial uploads) no message claimed within max_age seconds"""
+        self._last_sweep = time.time()
+        removed = await asyncio.to_thread(self._remove_stale, self._last_sweep - max_age)
+        if removed:
+            self._index = {key: value for key, value in self._index.items() if value.path.exists()}
+            logger.info(f"Deleted {removed} unused attachment uploads")
+        return removed
+
+    def _remove_stale(self, cutoff: float) -> int:
+        """Remove pending files last modified before cutoff (runs in a worker thread)"""
+        if not self.pending_dir.is_dir():
+            return 0
+        removed = 0
+        for path in self.pending_dir.iterdir():
+            try:
+                if path.stat().st_mtime < cutoff:
+                    path.unlink()
+                    removed += 1
+            except FileNotFoundError:
+                pass
+        return removed
+
+# Global attachment store instance
+attachment_store = AttachmentStore()
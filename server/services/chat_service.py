@@ -6,109 +6,153 @@ Chat Session - Main orchestrator for chat conversations with AI agents
 import asyncio
 import logging
 import base64
+from typing import Optional
 from fastapi import WebSocket
 
 from core.messaging import WebSocketMessenger
+from core.metrics import metrics
+from services.event_pipeline import CheckpointSink, EventPipeline, MessengerSink, MetricsSink
 from services.tool_approval import ToolApprovalManager
 from services.mcp_agent import MCPAgentManager
 from services.message_processor import MessageStreamProcessor
+from services.attachment_service import attachment_store
+from services.conversation_hub import conversation_hub, ConversationChannel
 from core.database import get_conversation_by_id, save_conversation, update_conversation
 from pydantic_ai.messages import ModelRequest, UserPromptPart, BinaryContent
 from pydantic_ai.usage import RunUsage
 
 logger = logging.getLogger(__name__)
 
+# Seconds the end of a run waits for its last events to reach the conversation's observers
+RUN_FLUSH_TIMEOUT = 5.0
+
 class ChatSession:
     """Orchestrates a chat session with AI agent and MCP tools"""
     
-    def __init__(self, websocket: WebSocket):
-        """Initialize the chat session with all required components"""
+    def __init__(self, websocket: Optional[WebSocket] = None, messenger: Optional[WebSocketMessenger] = None,
+                 auto_approve: Optional[bool] = None):
+        """Initialize the chat session with all required components.
+        HTTP streaming clients pass their own messenger instead of a websocket."""
         self.websocket = websocket
         
         # Initialize components
-        self.messenger = WebSocketMessenger(websocket)
-        self.approval_manager = ToolApprovalManager(self.messenger)
+        self.messenger = messenger or WebSocketMessenger(websocket)
+        # Run events fan out to the client and to side sinks, each behind its own buffer
+        self.events = EventPipeline()
+        self.events.add_sink(MessengerSink(self.messenger))
+        self.events.add_sink(CheckpointSink())
+        self.events.add_sink(MetricsSink(), lossy=True)
+        self.approval_manager = ToolApprovalManager(self.events, auto_approve=auto_approve)
         self.agent_manager = MCPAgentManager(self.approval_manager)
-        self.message_processor = MessageStreamProcessor(self.messenger, self.approval_manager)
+        self.message_processor = MessageStreamProcessor(self.events, self.approval_manager)
         
         # Track active background chat tasks
         self.tasks = []
         # Ensure messages are processed sequentially per session
         self._message_lock = asyncio.Lock()
     
-    async def handle_chat_message(self, user_input: str, conversation_id: str, images=None):
+    async def handle_chat_message(self, user_input: str, conversation_id: str, images=None, attachment_ids=None):
         """Handle a chat message from the user with streaming response"""
         async with self._message_lock:
+            channel = await self._begin_broadcast(conversation_id)
+            if channel is None:
+                return
             try:
-                # Fetch previous messages if the conversation exists
-                conversation = await get_conversation_by_id(conversation_id)
-                if conversation:
-                    existing_messages = conversation['messages']
-                    logger.info(f"Continuing conversation {conversation_id} with {len(existing_messages)} messages")
-                else:
-                    existing_messages = []
-                    logger.info(f"Starting new conversation {conversation_id}")
+                await self._process_chat_message(user_input, conversation_id, images, attachment_ids)
+            finally:
+                await self._end_broadcast(channel)
+    
+    async def _process_chat_message(self, user_input: str, conversation_id: str, images=None, attachment_ids=None):
+        """Run the agent for a chat message and stream its response"""
+        try:
+            # Fetch previous messages if the conversation exists
+            conversation = await get_conversation_by_id(conversation_id)
+            if conversation:
+                existing_messages = conversation['messages']
+                logger.info(f"Continuing conversation {conversation_id} with {len(existing_messages)} messages")
+            else:
+                existing_messages = []
+                logger.info(f"Starting new conversation {conversation_id}")
+            
+            # Prepare content for agent iteration
+            user_content = await self._build_user_content(user_input, images, attachment_ids)
+            if user_content is None:
+                return
+            
+            # Prepare message history for agent iteration
+            message_history = existing_messages if existing_messages else None
+
+            # Get the agent for the current configuration and enabled servers
+            agent = await self.agent_manager.create_agent()
+            
+            # Begin streaming iteration with the AI agent
+            async with agent.iter(user_content, message_history=message_history, deps=self.agent_manager) as run:
+                await self.message_processor.process_agent_stream(run)
                 
-                # Prepare content for agent iteration
-                if images and len(images) > 0:
-                    # Process images into pydantic-ai format
-                    content_parts = []
-                    
-                    if user_input.strip():
-                        content_parts.append(user_input)
-                    
-                    # Convert images to BinaryContent
-                    for img_data in images:
-                        try:
-                            image_bytes = base64.b64decode(img_data['data'])
-                            binary_content = BinaryContent(
-                                data=image_bytes,
-                                media_type=img_data['media_type']
-                            )
-                            content_parts.append(binary_content)
-                            logger.info(f"Added image: {img_data['name']} ({img_data['media_type']}, {len(image_bytes)} bytes)")
-                        except Exception as e:
-                            logger.error(f"Error processing image {img_data.get('name', 'unknown')}: {e}")
-                            await self.messenger.send_error(f"Error processing image: {str(e)}")
-                            return
-                    
-                    # Use content_parts directly for agent.iter()
-                    user_content = content_parts
-                else:
-                    # Text-only message
-                    user_content = user_input
+                # After stream completes, save or update the conversation
+                await self._save_conversation(run.result, conversation_id)
                 
-                # Prepare message history for agent iteration
-                message_history = existing_messages if existing_messages else None
+        except RuntimeError as e:
+            # Handle model capability errors (e.g., images not supported)
+            if "support" in str(e).lower():
+                logger.warning(f"Model capability error: {e}")
+                await self.events.emit("error", message=f"This model doesn't support images: {str(e)}")
+            else:
+                logger.error(f"Runtime error handling chat message: {e}", exc_info=True)
+                await self.events.emit("error", message=f"Error processing message: {str(e)}")
+        except NotImplementedError as e:
+            logger.warning(f"Feature not implemented: {e}")
+            await self.events.emit("error", message=f"Image type not supported: {str(e)}")
+        except asyncio.CancelledError:
+            # Task was cancelled by user stop request - swallow without error
+            logger.info(f"Chat message handling cancelled for conversation {conversation_id}")
+            self.agent_manager.cancel_tool_calls()
+            return
+        except Exception as e:
+            logger.error(f"Error handling chat message: {e}", exc_info=True)
+            await self.events.emit("error", message=f"Error processing message: {str(e)}")
 
-                # Create a fresh agent for this message with current enabled servers
-                agent = await self.agent_manager.create_agent()
-                
-                # Begin streaming iteration with the AI agent
-                async with agent.iter(user_content, message_history=message_history) as run:
-                    await self.message_processor.process_agent_stream(run)
-                    
-                    # After stream completes, save or update the conversation
-                    await self._save_conversation(run.result, conversation_id)
-                    
-            except RuntimeError as e:
-                # Handle model capability errors (e.g., images not supported)
-                if "support" in str(e).lower():
-                    logger.warning(f"Model capability error: {e}")
-                    await self.messenger.send_error(f"This model doesn't support images: {str(e)}")
-                else:
-                    logger.error(f"Runtime error handling chat message: {e}", exc_info=True)
-                    await self.messenger.send_error(f"Error processing message: {str(e)}")
-            except NotImplementedError as e:
-                logger.warning(f"Feature not implemented: {e}")
-                await self.messenger.send_error(f"Image type not supported: {str(e)}")
-            except asyncio.CancelledError:
-                # Task was cancelled by user stop request - swallow without error
-                logger.info(f"Chat message handling cancelled for conversation {conversation_id}")
-                return
+    async def _build_user_content(self, user_input: str, images=None, attachment_ids=None):
+        """Build the agent prompt from text, inline images and uploaded attachments.
+        Returns None (after notifying the client) if an image cannot be loaded."""
+        if not images and not attachment_ids:
+            # Text-only message
+            return user_input
+        
+        # Process images into pydantic-ai format
+        content_parts = []
+        
+        if user_input.strip():
+            content_parts.append(user_input)
+        
+        # Resolve attachments uploaded out-of-band
+        for attachment_id in attachment_ids or []:
+            attachment = attachment_store.get(attachment_id)
+            if not attachment:
+                logger.error(f"Unknown attachment ID: {attachment_id}")
+                await self.events.emit("error", message=f"Attachment not found: {attachment_id}")
+                return None
+            image_bytes = await attachment_store.read_bytes(attachment)
+            await attachment_store.claim(attachment)
+            content_parts.append(BinaryContent(data=image_bytes, media_type=attachment.media_type))
+            logger.info(f"Added attachment: {attachment.id} ({attachment.media_type}, {attachment.size} bytes)")
+        
+        # Convert legacy inline base64 images to BinaryContent
+        for img_data in images or []:
+            try:
+                image_bytes = await asyncio.to_thread(base64.b64decode, img_data['data'])
+                binary_content = BinaryContent(
+                    data=image_bytes,
+                    media_type=img_data['media_type']
+                )
+                content_parts.append(binary_content)
+                logger.info(f"Added image: {img_data['name']} ({img_data['media_type']}, {len(image_bytes)} bytes)")
             except Exception as e:
-                logger.error(f"Error handling chat message: {e}", exc_info=True)
-                await self.messenger.send_error(f"Error processing message: {str(e)}")
+                logger.error(f"Error processing image {img_data.get('name', 'unknown')}: {e}")
+                await self.events.emit("error", message=f"Error processing image: {str(e)}")
+                return None
+        
+        return content_parts
     
     async def _save_conversation(self, result, conversation_id: str):
         """Save or update the conversation to database based on conversation_id"""
@@ -137,6 +181,8 @@ class ChatSession:
                 logger.info(f"Saved new conversation {conversation_id} - "
                             f"Messages: {len(all_messages)}, "
                             f"Usage: {token_count} tokens")
+            # The run is persisted; sinks can drop what they kept to recover it
+            await self.events.emit("conversation_saved", conversation_id=conversation_id)
             return conversation_id
         except Exception as e:
             logger.error(f"Error saving conversation: {e}", exc_info=True)
@@ -145,61 +191,98 @@ class ChatSession:
     async def handle_edit_user_message(self, conversation_id: str, user_message_index: int, new_content: str):
         """Handle editing a user message and re-running the conversation from that point"""
         async with self._message_lock:
+            channel = await self._begin_broadcast(conversation_id)
+            if channel is None:
+                return
             try:
-                # Load the existing conversation
-                conversation = await get_conversation_by_id(conversation_id)
-                if not conversation:
-                    logger.error(f"Conversation {conversation_id} not found for editing")
-                    await self.messenger.send_error("Conversation not found")
-                    return
-                
-                messages = conversation['messages']
-                logger.info(f"Editing conversation {conversation_id} with {len(messages)} messages")
-                
-                # Find the user message at the specified index
-                user_count = 0
-                edit_position = None
-                
-                for i, message in enumerate(messages):
-                    if message.kind == 'request':  # User message in pydantic-ai
-                        # Check if this ModelRequest contains a UserPromptPart
-                        if any(part.part_kind == 'user-prompt' for part in message.parts):
-                            if user_count == user_message_index:
-                                edit_position = i
-                                break
-                            user_count += 1
-                
-                if edit_position is None:
-                    logger.error(f"User message at index {user_message_index} not found")
-                    await self.messenger.send_error(f"User message at index {user_message_index} not found")
-                    return
-                
-                # Truncate conversation history up to (but not including) the edit position
-                messages_up_to_edit = messages[:edit_position]
-                logger.info(f"Truncating conversation to {len(messages_up_to_edit)} messages before edit point")
+                await self._process_edit_user_message(conversation_id, user_message_index, new_content)
+            finally:
+                await self._end_broadcast(channel)
+    
+    async def _process_edit_user_message(self, conversation_id: str, user_message_index: int, new_content: str):
+        """Truncate the conversation at the edited message and re-run the agent"""
+        try:
+            # Load the existing conversation
+            conversation = await get_conversation_by_id(conversation_id)
+            if not conversation:
+                logger.error(f"Conversation {conversation_id} not found for editing")
+                await self.events.emit("error", message="Conversation not found")
+                return
+            
+            messages = conversation['messages']
+            logger.info(f"Editing conversation {conversation_id} with {len(messages)} messages")
+            
+            # Find the user message at the specified index
+            user_count = 0
+            edit_position = None
+            
+            for i, message in enumerate(messages):
+                if message.kind == 'request':  # User message in pydantic-ai
+                    # Check if this ModelRequest contains a UserPromptPart
+                    if any(part.part_kind == 'user-prompt' for part in message.parts):
+                        if user_count == user_message_index:
+                            edit_position = i
+                            break
+                        user_count += 1
+            
+            if edit_position is None:
+                logger.error(f"User message at index {user_message_index} not found")
+                await self.events.emit("error", message=f"User message at index {user_message_index} not found")
+                return
+            
+            # Truncate conversation history up to (but not including) the edit position
+            messages_up_to_edit = messages[:edit_position]
+            logger.info(f"Truncating conversation to {len(messages_up_to_edit)} messages before edit point")
+            
+            # Prepare message history for agent iteration (None if empty)
+            message_history = messages_up_to_edit if messages_up_to_edit else None
+            
+            # Get the agent for the current configuration and enabled servers
+            agent = await self.agent_manager.create_agent()
+            
+            # Begin streaming iteration with the AI agent using the new content
+            async with agent.iter(new_content, message_history=message_history, deps=self.agent_manager) as run:
+                await self.message_processor.process_agent_stream(run)
                 
-                # Prepare message history for agent iteration (None if empty)
-                message_history = messages_up_to_edit if messages_up_to_edit else None
+                # After stream completes, save the updated conversation
+                await self._save_conversation(run.result, conversation_id)
                 
-                # Create a fresh agent for this edited message
-                agent = await self.agent_manager.create_agent()
+            logger.info(f"Successfully processed edit for conversation {conversation_id}")
                 
-                # Begin streaming iteration with the AI agent using the new content
-                async with agent.iter(new_content, message_history=message_history) as run:
-                    await self.message_processor.process_agent_stream(run)
-                    
-                    # After stream completes, save the updated conversation
-                    await self._save_conversation(run.result, conversation_id)
-                    
-                logger.info(f"Successfully processed edit for conversation {conversation_id}")
-                    
-            except asyncio.CancelledError:
-                # Task was cancelled by user stop request - swallow without error
-                logger.info(f"Edit message handling cancelled for conversation {conversation_id}")
-                return
-            except Exception as e:
-                logger.error(f"Error handling edit message: {e}", exc_info=True)
-                await self.messenger.send_error(f"Error processing edit: {str(e)}")
+        except asyncio.CancelledError:
+            # Task was cancelled by user stop request - swallow without error
+            logger.info(f"Edit message handling cancelled for conversation {conversation_id}")
+            self.agent_manager.cancel_tool_calls()
+            return
+        except Exception as e:
+            logger.error(f"Error handling edit message: {e}", exc_info=True)
+            await self.events.emit("error", message=f"Error processing edit: {str(e)}")
+
+    async def _begin_broadcast(self, conversation_id: str) -> Optional[ConversationChannel]:
+        """Subscribe to the conversation and claim it for this session's run.
+        Returns None (after notifying the client) if another client is already running it."""
+        channel = await conversation_hub.subscribe(conversation_id, self.messenger, announce=False)
+        if not channel.begin_run(self.messenger, asyncio.current_task()):
+            logger.warning(f"Rejected duplicate run for conversation {conversation_id}")
+            await self.events.emit("error", message="This conversation is already generating a response in another window")
+            return None
+        # Publish this run's events to every observer of the conversation
+        self.messenger.channel = channel
+        self.events.begin_run(conversation_id)
+        # Conversation-scoped approval grants apply to this run
+        self.approval_manager.conversation_id = conversation_id
+        return channel
+    
+    async def _end_broadcast(self, channel: ConversationChannel):
+        """Stop publishing to the conversation and release it for other clients"""
+        await self.events.end_run()
+        # Events still buffered in the pipeline (the save notice, late errors) go to the channel too
+        try:
+            await asyncio.wait_for(self.events.flush(), timeout=RUN_FLUSH_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"Detaching conversation {channel.conversation_id} with undelivered run events")
+        self.messenger.channel = None
+        conversation_hub.release(channel, self.messenger)
     
     async def handle_approval_response(self, approval_id: str, approved: bool):
         """Handle approval response from the client"""
@@ -211,13 +294,31 @@ class ChatSession:
     
     async def cleanup(self):
         """Cleanup chat session resources"""
+        # Fail approvals nobody is left to answer
+        failed_approvals = self.approval_manager.cancel_pending()
+        self.approval_manager.forget_grants()
+        
         # Cancel any pending tasks
+        cancelled_runs = 0
         for task in self.tasks:
             if not task.done():
                 task.cancel()
+                cancelled_runs += 1
         
         # Wait for tasks to finish cancelling
         if self.tasks:
             await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        # Stop tool calls that outlived their run
+        self.agent_manager.cancel_tool_calls()
+        
+        # Stop the event sink workers; nobody is left to receive undelivered events
+        await self.events.close(drain=False)
+        
+        # Stop receiving broadcasts and events for observed conversations
+        conversation_hub.disconnect(self.messenger)
         
-        logger.info("Chat session cleanup completed")
+        metrics.incr("sessions.cleaned_up")
+        metrics.incr("sessions.runs_cancelled", cancelled_runs)
+        metrics.incr("sessions.approvals_failed", failed_approvals)
+        logger.info(f"Chat session cleanup completed (cancelled {cancelled_runs} runs, failed {failed_approvals} approvals)")
@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Conversation Hub - Fans out live conversation events to every observing client
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Set, Tuple
+
+from core.messaging import WebSocketMessenger
+from core.metrics import metrics
+from core.serialization import dumps_str
+
+logger = logging.getLogger(__name__)
+
+# Frames an observer may fall behind a run by before it is dropped from the conversation
+SUBSCRIBER_QUEUE_SIZE = 512
+# Seconds a client may take to accept an application-wide broadcast before it is dropped
+BROADCAST_SEND_TIMEOUT = 5.0
+# Characters of a tool result replayed to late joiners; the full result is in the saved conversation
+REPLAY_TOOL_RESULT_CHARS = 2000
+# Streamed frames whose field is appended to the previous frame of the same kind (and tool)
+ACCUMULATED_FIELDS = {"text_delta": "content", "thinking_delta": "content", "tool_args_delta": "args_delta"}
+
+class PartialRun:
+    """
+    Compact state of the run in progress, replayed to late joiners.
+    Consecutive text, thinking and tool argument deltas are merged into one
+    frame and tool results are cut down to a summary, so the state grows
+    with the response text rather than with the frames streamed.
+    """
+
+    def __init__(self):
+        # Messages in order, each with the parts of its accumulated field (None if it has none)
+        self.entries: List[Tuple[Dict[str, Any], Optional[List[str]]]] = []
+
+    def apply(self, message_type: str, data: Dict[str, Any]) -> None:
+        """Fold a published message into the state"""
+        field = ACCUMULATED_FIELDS.get(message_type)
+        last, parts = self.entries[-1] if self.entries else (None, None)
+        same_kind = last is not None and last["type"] == message_type and last.get("tool_id") == data.get("tool_id")
+        if field is not None and isinstance(data.get(field), str):
+            if same_kind and parts is not None:
+                parts.append(data[field])
+                return
+            self.entries.append(({"type": message_type, **data}, [data[field]]))
+            return
+        message = {"type": message_type, **data}
+        if message_type == "tool_args_delta" and same_kind and "args" in last:
+            # Streamed as dicts: each carries all arguments so far
+            self.entries[-1] = (message, None)
+            return
+        content = data.get("content")
+        if message_type == "tool_complete" and isinstance(content, str) and len(content) > REPLAY_TOOL_RESULT_CHARS:
+            omitted = len(content) - REPLAY_TOOL_RESULT_CHARS
+            message["content"] = f"{content[:REPLAY_TOOL_RESULT_CHARS]}\n... ({omitted} more characters)"
+        self.entries.append((message, None))
+
+    def frames(self) -> List[Tuple[str, str]]:
+        """Encoded frames that rebuild the partial response"""
+        frames = []
+        for message, parts in self.entries:
+            if parts is not None:
+                message = {**message, ACCUMULATED_FIELDS[message["type"]]: "".join(parts)}
+            frames.append((message["type"], dumps_str(message)))
+        return frames
+
+class ConversationChannel:
+    """
+    Broadcast channel for a single conversation.
+    Frames are encoded once by the publishing messenger and written to the
+    run's owner directly and to every other subscriber through its own bounded
+    queue, so a slow observer cannot stall the run; observers that fall too far
+    behind are dropped. A compact state of the run in progress is kept so late
+    joiners can catch up on the partial response.
+    """
+
+    def __init__(self, conversation_id: str):
+        self.conversation_id = conversation_id
+        self.subscribers: Set[WebSocketMessenger] = set()
+        self.owner: Optional[WebSocketMessenger] = None
+        self._run_task: Optional[asyncio.Task] = None
+        self._partial = PartialRun()
+        self._queues: Dict[WebSocketMessenger, asyncio.Queue] = {}
+        self._writers: Dict[WebSocketMessenger, asyncio.Task] = {}
+
+    @property
+    def is_running(self) -> bool:
+        """Whether an agent run is currently streaming into this channel"""
+        return self.owner is not None
+
+    def begin_run(self, owner: WebSocketMessenger, task: Optional[asyncio.Task] = None) -> bool:
+        """Claim the channel for an agent run. Returns False if another client's run is active."""
+        if self.owner is not None and self.owner is not owner:
+            return False
+        self.owner = owner
+        self._run_task = task
+        self._partial = PartialRun()
+        return True
+
+    def end_run(self, owner: WebSocketMessenger) -> None:
+        """Release the channel after an agent run finishes"""
+        if self.owner is owner:
+            self.owner = None
+            self._run_task = None
+            self._partial = PartialRun()
+
+    def cancel_run(self, owner: WebSocketMessenger) -> bool:
+        """Cancel the active run if it belongs to the given client"""
+        if self.owner is not owner:
+            return False
+        if self._run_task is not None and not self._run_task.done():
+            self._run_task.cancel()
+            return True
+        return False
+
+    async def publish(self, message_type: str, frame: str, data: Dict[str, Any]) -> None:
+        """Send an encoded frame to the run's owner and queue it for every other subscriber"""
+        owner = self.owner
+        if owner is not None:
+            self._partial.apply(message_type, data)
+        for subscriber, queue in list(self._queues.items()):
+            if subscriber is owner:
+                continue
+            try:
+                queue.put_nowait((message_type, frame))
+            except asyncio.QueueFull:
+                logger.warning(f"Dropping subscriber of conversation {self.conversation_id}: "
+                               f"more than {SUBSCRIBER_QUEUE_SIZE} frames behind")
+                metrics.incr("conversation_hub.subscribers_dropped")
+                self.remove(subscriber)
+        if owner is not None:
+            await owner.send_raw(message_type, frame)
+
+    def remove(self, messenger: WebSocketMessenger) -> None:
+        """Stop sending frames to a subscriber, discarding those still queued for it"""
+        self.subscribers.discard(messenger)
+        self._queues.pop(messenger, None)
+        writer = self._writers.pop(messenger, None)
+        if writer is not None:
+            writer.cancel()
+
+    async def _write_queued(self, messenger: WebSocketMessenger, queue: asyncio.Queue) -> None:
+        """Deliver a subscriber's queued frames in order"""
+        while True:
+            message_type, frame = await queue.get()
+            try:
+                await messenger.send_raw(message_type, frame)
+            except Exception as e:
+                logger.warning(f"Dropping subscriber of conversation {self.conversation_id}: {e}")
+                self.remove(messenger)
+                return
+
+    async def subscribe(self, messenger: WebSocketMessenger, announce: bool = True) -> None:
+        """Add a subscriber and replay the partial state of the run in progress.
+        With announce=False the state frame is only sent when a run is active."""
+        if messenger in self.subscribers:
+            return
+        # Hold the subscriber's send lock so live frames queue behind the replay
+        async with messenger.send_lock:
+            replay = self._partial.frames()
+            self.subscribers.add(messenger)
+            queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+            self._queues[messenger] = queue
+            self._writers[messenger] = asyncio.create_task(self._write_queued(messenger, queue))
+            if not announce and not self.is_running:
+                return
+            state = dumps_str({
+                "type": "conversation_state",
+                "conversation_id": self.conversation_id,
+                "running": self.is_running
+            })
+            await messenger.write_frame("conversation_state", state)
+            for message_type, frame in replay:
+                await messenger.write_frame(message_type, frame)
+        if replay:
+            logger.info(f"Replayed {len(replay)} frames of conversation {self.conversation_id} to late joiner")
+
+class ConversationHub:
+    """Registry of connected clients and the conversation channels they observe"""
+
+    def __init__(self):
+        self.channels: Dict[str, ConversationChannel] = {}
+        self.connections: Set[WebSocketMessenger] = set()
+
+    def connect(self, messenger: WebSocketMessenger) -> None:
+        """Register a client for application-wide broadcasts"""
+        self.connections.add(messenger)
+
+    def disconnect(self, messenger: WebSocketMessenger) -> None:
+        """Forget a client and remove it from every channel"""
+        self.connections.discard(messenger)
+        self.unsubscribe_all(messenger)
+
+    async def broadcast(self, message_type: str, **data) -> None:
+        """Send a message to every connected client, encoding it once.
+        Clients that fail or stall for BROADCAST_SEND_TIMEOUT are dropped, so they
+        cannot hold up later updates."""
+        if not self.connections:
+            return
+        frame = dumps_str({"type": message_type, **data})
+        connections = list(self.connections)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(messenger.send_raw(message_type, frame), timeout=BROADCAST_SEND_TIMEOUT)
+              for messenger in connections),
+            return_exceptions=True
+        )
+        for messenger, result in zip(connections, results):
+            if isinstance(result, asyncio.TimeoutError):
+                logger.warning(f"Dropping client from broadcasts: no progress for {BROADCAST_SEND_TIMEOUT}s")
+                metrics.incr("conversation_hub.broadcast_timeouts")
+                self.disconnect(messenger)
+            elif isinstance(result, Exception):
+                logger.warning(f"Dropping unreachable client from broadcasts: {result}")
+                self.disconnect(messenger)
+
+    def channel(self, conversation_id: str) -> ConversationChannel:
+        """Get or create the channel for a conversation"""
+        channel = self.channels.get(conversation_id)
+        if channel is None:
+            channel = ConversationChannel(conversation_id)
+            self.channels[conversation_id] = channel
+        return channel
+
+    async def subscribe(self, conversation_id: str, messenger: WebSocketMessenger, announce: bool = True) -> ConversationChannel:
+        """Subscribe a client to a conversation's live events"""
+        channel = self.channel(conversation_id)
+        await channel.subscribe(messenger, announce)
+        return channel
+
+    def unsubscribe(self, conversation_id: str, messenger: WebSocketMessenger) -> None:
+        """Stop sending a conversation's events to a client"""
+        channel = self.channels.get(conversation_id)
+        if channel is None:
+            return
+        channel.remove(messenger)
+        self._prune(channel)
+
+    def unsubscribe_all(self, messenger: WebSocketMessenger) -> None:
+        """Remove a disconnected client from every channel"""
+        for channel in list(self.channels.values()):
+            channel.remove(messenger)
+            self._prune(channel)
+
+    def release(self, channel: ConversationChannel, owner: WebSocketMessenger) -> None:
+        """End a run and drop the channel if nobody is watching it"""
+        channel.end_run(owner)
+        self._prune(channel)
+
+    def _prune(self, channel: ConversationChannel) -> None:
+        if not channel.subscribers and not channel.is_running:
+            self.channels.pop(channel.conversation_id, None)
+
+# Global conversation hub instance
+conversation_hub = ConversationHub()
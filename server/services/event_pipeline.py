@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+"""
+Event Pipeline - Dispatches normalized chat stream events to pluggable sinks
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional
+
+from core.messaging import WebSocketMessenger
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Events buffered per sink before the stream waits (lossless sinks) or drops (lossy sinks)
+DEFAULT_SINK_BUFFER = 1000
+# Directory partial responses of runs in progress are checkpointed to, one file per conversation
+CHECKPOINTS_DIR = "checkpoints"
+# Seconds between checkpoint writes while a response streams
+CHECKPOINT_INTERVAL = 1.0
+# Events that only drive sinks and are never sent to clients
+INTERNAL_EVENTS = frozenset({"run_ended"})
+
+@dataclass(frozen=True)
+class StreamEvent:
+    """A single normalized event of an agent run, in protocol terms"""
+    type: str
+    data: Dict[str, Any] = field(default_factory=dict)
+    seq: int = 0
+    ts: float = 0.0
+    # Conversation and run the event was emitted during, if any
+    conversation_id: Optional[str] = None
+    run_id: int = 0
+
+class EventSink(ABC):
+    """Base class for consumers of the event stream"""
+
+    name = "sink"
+
+    @abstractmethod
+    async def handle(self, event: StreamEvent) -> None:
+        """Consume one event"""
+
+    async def close(self) -> None:
+        """Release sink resources"""
+        pass
+
+class MessengerSink(EventSink):
+    """Forwards events to the client (and conversation observers) through the messenger"""
+
+    name = "messenger"
+
+    def __init__(self, messenger: WebSocketMessenger):
+        self.messenger = messenger
+
+    async def handle(self, event: StreamEvent) -> None:
+        if event.type in INTERNAL_EVENTS:
+            return
+        await self.messenger.send_message(event.type, **event.data)
+
+class MetricsSink(EventSink):
+    """Counts events by type"""
+
+    name = "metrics"
+
+    async def handle(self, event: StreamEvent) -> None:
+        metrics.incr(f"events.{event.type}")
+
+class RecorderSink(EventSink):
+    """Keeps the most recent events in memory for inspection and debugging"""
+
+    name = "recorder"
+
+    def __init__(self, max_events: int = DEFAULT_SINK_BUFFER):
+        self.events: Deque[StreamEvent] = deque(maxlen=max_events)
+
+    async def handle(self, event: StreamEvent) -> None:
+        self.events.append(event)
+
+def checkpoint_path(conversation_id: str, directory: str = CHECKPOINTS_DIR) -> Path:
+    """File of a conversation's checkpoint, named by a hash of its (client-supplied) ID.
+    Raises ValueError if the file resolves outside the directory (e.g. a planted symlink)."""
+    root = Path(directory).resolve()
+    path = root / f"{hashlib.sha256(conversation_id.encode('utf-8')).hexdigest()}.json"
+    if path.resolve().parent != root:
+        raise ValueError(f"Checkpoint of conversation {conversation_id!r} resolves outside {root}")
+    return path
+
+def load_checkpoint(conversation_id: str, directory: str = CHECKPOINTS_DIR) -> Optional[Dict[str, Any]]:
+    """The last checkpoint of a conversation's unsaved run, or None"""
+    try:
+        with open(checkpoint_path(conversation_id, directory), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+class CheckpointSink(EventSink):
+    """
+    Writes the partial response of the run in progress to disk.
+    Text, thinking and tool progress are accumulated per run and written at
+    most every CHECKPOINT_INTERVAL seconds (and when a response or tool phase
+    completes), so a run interrupted by a crash can be recovered. The
+    checkpoint is removed once the conversation is saved, and when a run ends
+    without being saved (cancelled or failed).
+    """
+
+    name = "checkpoint"
+
+    def __init__(self, directory: str = CHECKPOINTS_DIR, interval: float = CHECKPOINT_INTERVAL):
+        self.directory = directory
+        self.interval = interval
+        self._run: Optional[tuple] = None
+        self._state: Dict[str, Any] = {}
+        self._dirty = False
+        self._last_write = 0.0
+
+    async def handle(self, event: StreamEvent) -> None:
+        if event.conversation_id is None:
+            return
+        if event.type in ("conversation_saved", "run_ended"):
+            self._run = None
+            self._dirty = False
+            try:
+                await asyncio.to_thread(self._remove, event.conversation_id)
+            except (OSError, ValueError) as e:
+                logger.error(f"Error removing checkpoint of conversation {event.conversation_id}: {e}")
+            return
+        if self._run != (event.conversation_id, event.run_id):
+            self._run = (event.conversation_id, event.run_id)
+            self._state = {"conversation_id": event.conversation_id, "text": "", "thinking": "", "tools": {}}
+        self._apply(event)
+        flush = event.type in ("assistant_complete", "tool_session_complete", "error")
+        if self._dirty and (flush or event.ts - self._last_write >= self.interval):
+            self._state["updated_at"] = event.ts
+            self._dirty = False
+            self._last_write = event.ts
+            try:
+                await asyncio.to_thread(self._write, event.conversation_id, json.dumps(self._state, default=str))
+            except (OSError, ValueError) as e:
+                logger.error(f"Error writing checkpoint of conversation {event.conversation_id}: {e}")
+
+    def _apply(self, event: StreamEvent) -> None:
+        """Fold an event into the run's partial response"""
+        data = event.data
+        if event.type == "text_delta":
+            self._state["text"] += data.get("content", "")
+        elif event.type == "thinking_delta":
+            self._state["thinking"] += data.get("content", "")
+        elif event.type == "tool_start":
+            self._state["tools"][data["tool_id"]] = {"tool_name": data.get("tool_name"), "status": "executing"}
+        elif event.type in ("tool_complete", "tool_blocked"):
+            tool = self._state["tools"].setdefault(data["tool_id"], {"tool_name": data.get("tool_name")})
+            tool["status"] = "completed" if event.type == "tool_complete" else "blocked"
+            if "content" in data:
+                tool["content"] = data["content"]
+        elif event.type == "error":
+            self._state["error"] = data.get("message")
+        else:
+            return
+        self._dirty = True
+
+    def _write(self, conversation_id: str, payload: str) -> None:
+        """Atomically replace a checkpoint file. Blocking; run it off-loop."""
+        path = checkpoint_path(conversation_id, self.directory)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=path.parent, prefix=f".{path.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                f.write(payload)
+            os.replace(temp_path, path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def _remove(self, conversation_id: str) -> None:
+        """Delete a checkpoint file. Blocking; run it off-loop."""
+        try:
+            checkpoint_path(conversation_id, self.directory).unlink()
+        except FileNotFoundError:
+            pass
+
+class BufferedSink:
+    """
+    Runs a sink behind its own queue and worker task.
+    A slow sink only fills its own buffer; lossless sinks apply backpressure
+    once the buffer is full, lossy sinks drop events instead.
+    """
+
+    def __init__(self, sink: EventSink, max_buffer: int = DEFAULT_SINK_BUFFER, lossy: bool = False):
+        self.sink = sink
+        self.lossy = lossy
+        self.queue: asyncio.Queue[StreamEvent] = asyncio.Queue(maxsize=max_buffer)
+        self._worker: Optional[asyncio.Task] = None
+
+    async def put(self, event: StreamEvent) -> None:
+        """Queue an event for the sink"""
+        self._ensure_worker()
+        if not self.lossy:
+            await self.queue.put(event)
+            return
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            metrics.incr(f"events.dropped.{self.sink.name}")
+
+    async def flush(self) -> None:
+        """Wait until every queued event has been handled"""
+        if self._worker is not None:
+            await self.queue.join()
+
+    async def close(self, drain: bool = True) -> None:
+        """Stop the worker and close the sink, draining the buffer first unless drain=False"""
+        if drain:
+            await self.flush()
+        if self._worker is not None:
+            self._worker.cancel()
+            await asyncio.gather(self._worker, return_exceptions=True)
+            self._worker = None
+        # Discard undelivered events so a later flush cannot wait on them
+        while not self.queue.empty():
+            self.queue.get_nowait()
+            self.queue.task_done()
+        await self.sink.close()
+
+    def _ensure_worker(self) -> None:
+        if self._worker is None or self._worker.done():
+            self._worker = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            event = await self.queue.get()
+            try:
+                await self.sink.handle(event)
+            except Exception as e:
+                logger.error(f"Event sink '{self.sink.name}' failed on {event.type}: {e}", exc_info=True)
+            finally:
+                self.queue.task_done()
+
+class EventPipeline:
+    """
+    Ordered fan-out of stream events to sinks.
+    Each sink receives events in emission order through its own buffer,
+    so producers (the stream processor, the approval manager) never wait on
+    a slow consumer unless its buffer is full.
+    """
+
+    def __init__(self):
+        self.sinks: List[BufferedSink] = []
+        self._seq = 0
+        # Run in progress, stamped on every event
+        self.conversation_id: Optional[str] = None
+        self._run_id = 0
+
+    def add_sink(self, sink: EventSink, max_buffer: int = DEFAULT_SINK_BUFFER, lossy: bool = False) -> EventSink:
+        """Register a sink at the end of the pipeline"""
+        self.sinks.append(BufferedSink(sink, max_buffer=max_buffer, lossy=lossy))
+        return sink
+
+    def begin_run(self, conversation_id: str) -> None:
+        """Attribute the following events to a new run of a conversation"""
+        self.conversation_id = conversation_id
+        self._run_id += 1
+
+    async def end_run(self) -> None:
+        """Signal sinks that the run is over and stop attributing events to it"""
+        if self.conversation_id is not None:
+            await self.emit("run_ended")
+        self.conversation_id = None
+
+    async def emit(self, event_type: str, **data) -> StreamEvent:
+        """Dispatch an event to every sink"""
+        self._seq += 1
+        event = StreamEvent(type=event_type, data=data, seq=self._seq, ts=time.time(),
+                            conversation_id=self.conversation_id, run_id=self._run_id)
+        for buffered in self.sinks:
+            await buffered.put(event)
+        return event
+
+    async def send_message(self, message_type: str, **data) -> None:
+        """Messenger-compatible alias of emit, so approval requests stay ordered with stream events"""
+        await self.emit(message_type, **data)
+
+    async def flush(self) -> None:
+        """Wait until every sink has handled all emitted events"""
+        for buffered in self.sinks:
+            await buffered.flush()
+
+    async def close(self, drain: bool = True) -> None:
+        """Stop every sink; pending events are discarded when drain=False"""
+        for buffered in self.sinks:
+            await buffered.close(drain)
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Live Updates - Pushes settings and MCP server state changes to connected clients
+"""
+
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+from core.config import config_manager, ConfigChangeEvent
+from services.conversation_hub import conversation_hub
+from services.llm_provider_service import llm_provider_service
+from services.mcp_service import GlobalMCPManager
+
+logger = logging.getLogger(__name__)
+
+# MCP server config entries whose values can hold credentials (tokens in env vars or auth headers)
+MCP_SECRET_ENTRIES = ("env", "headers")
+
+def redact_setting(key: str, value: Any) -> Tuple[Any, bool]:
+    """A setting without the credentials it holds, and whether any were removed"""
+    if key == "llm_provider" and isinstance(value, dict) and isinstance(value.get("config"), dict):
+        provider_info = llm_provider_service.get_available_providers().get(value.get("provider"))
+        if provider_info is None:
+            # Unknown provider: no way to tell its secrets apart, so push none of its config
+            public = {}
+        else:
+            secret_fields = {field["name"] for field in provider_info.auth_fields if field.get("type") == "password"}
+            public = {name: item for name, item in value["config"].items() if name not in secret_fields}
+        return {**value, "config": public}, len(public) != len(value["config"])
+    if key == "mcp_servers" and isinstance(value, dict):
+        servers, redacted = {}, False
+        for name, server in value.items():
+            if isinstance(server, dict) and any(server.get(entry) for entry in MCP_SECRET_ENTRIES):
+                server = {entry: item for entry, item in server.items() if entry not in MCP_SECRET_ENTRIES}
+                redacted = True
+            servers[name] = server
+        return servers, redacted
+    return value, False
+
+class LiveUpdatePublisher:
+    """
+    Bridges configuration and MCP lifecycle observers to WebSocket clients.
+    Only changed entries are sent, so clients can patch their cached state
+    instead of polling the REST endpoints. Credentials are never pushed:
+    settings that held any are listed as redacted, and clients reload them
+    over REST. Observers only queue the update;
+    a sender task broadcasts it, so slow clients never hold up a config save
+    or an MCP lifecycle call.
+    """
+
+    def __init__(self):
+        self._started = False
+        self._outgoing: asyncio.Queue[Tuple[str, Dict[str, Any]]] = asyncio.Queue()
+        self._sender: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        """Register with the configuration manager and the MCP manager"""
+        if self._started:
+            return
+        config_manager.add_observer(self._on_config_change)
+        GlobalMCPManager.add_state_observer(self._on_mcp_state_change)
+        self._sender = asyncio.create_task(self._send_updates())
+        self._started = True
+        logger.info("Live update publisher started")
+
+    def stop(self) -> None:
+        """Unregister all observers and drop updates not yet sent"""
+        if not self._started:
+            return
+        config_manager.remove_observer(self._on_config_change)
+        GlobalMCPManager.remove_state_observer(self._on_mcp_state_change)
+        if self._sender is not None:
+            self._sender.cancel()
+            self._sender = None
+        self._outgoing = asyncio.Queue()
+        self._started = False
+
+    async def flush(self) -> None:
+        """Wait until every queued update has been broadcast"""
+        await self._outgoing.join()
+
+    async def _on_config_change(self, event: ConfigChangeEvent) -> None:
+        """Push changed top-level settings (None marks a removed key), without credentials"""
+        changes: Dict[str, Any] = {}
+        redacted: List[str] = []
+        for key in sorted(event.changed_keys):
+            changes[key], was_redacted = redact_setting(key, event.new_values.get(key))
+            if was_redacted:
+                redacted.append(key)
+        self._outgoing.put_nowait(("settings_changed", {"changes": changes, "redacted": redacted}))
+
+    async def _on_mcp_state_change(self, changes: Dict[str, Optional[Dict[str, Any]]]) -> None:
+        """Push MCP server state transitions (None marks a removed server)"""
+        self._outgoing.put_nowait(("mcp_server_state", {"servers": changes}))
+
+    async def _send_updates(self) -> None:
+        """Broadcast queued updates in order"""
+        while True:
+            message_type, data = await self._outgoing.get()
+            try:
+                await conversation_hub.broadcast(message_type, **data)
+            except Exception as e:
+                logger.error(f"Error broadcasting {message_type}: {e}", exc_info=True)
+            finally:
+                self._outgoing.task_done()
+
+# Global live update publisher instance
+live_updates = LiveUpdatePublisher()
@@ -3,125 +3,269 @@
 MCP Agent Manager - Handles AI agent configuration with global MCP servers
 """
 
+import asyncio
+import hashlib
+import json
 import logging
 import os
-from typing import Any
+from functools import partial
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Set
 
-from pydantic_ai import Agent
+from pydantic_ai import Agent, RunContext
 from pydantic_ai.mcp import CallToolFunc
 from services.tool_approval import ToolApprovalManager
 from services.llm_provider_service import llm_provider_service, ProviderConfig
-from core.config import config_manager
+from core.config import config_manager, ConfigChangeEvent, thaw
 from services.mcp_service import get_mcp_manager
+from services.mcp_registry import ServerHandle
+from services.tool_cache import tool_result_cache
 from core.exceptions import MCPServerError
 
 logger = logging.getLogger(__name__)
 
+# Configuration keys an agent is built from
+AGENT_CONFIG_KEYS = ("llm_provider", "system_prompt", "enable_thinking")
+# Agents kept for server sets that are no longer current (e.g. toggled servers)
+MAX_CACHED_AGENTS = 8
+
+def _config_hash(value: Any) -> str:
+    """Stable hash of a JSON-compatible value"""
+    encoded = json.dumps(value, sort_keys=True, default=str).encode("utf-8")
+    return hashlib.sha256(encoded).hexdigest()
+
+async def process_tool_call(
+    server_name: Optional[str], ctx: RunContext, call_tool: CallToolFunc, tool_name: str, args: dict[str, Any]
+) -> Any:
+    """Route a tool call of a shared server to the agent manager of the session running it"""
+    return await ctx.deps._process_tool_call(server_name, ctx, call_tool, tool_name, args)
+
+class AgentCache:
+    """
+    Agents shared across chat sessions.
+    Agents are keyed by a hash of the effective configuration and the enabled
+    MCP servers; models, and with them their provider's HTTP client, are kept
+    per provider configuration so steady-state turns reuse warm connections.
+    Per-session state (tool approval) is passed to runs as deps, never bound
+    into the agent.
+    """
+
+    def __init__(self):
+        self.agents: "OrderedDict[str, Agent]" = OrderedDict()
+        self.models: Dict[str, Any] = {}
+        self._lock = asyncio.Lock()
+        self._observing = False
+
+    async def get_agent(self) -> Agent:
+        """Get the agent for the current configuration and enabled MCP servers"""
+        if not self._observing:
+            config_manager.add_observer(self._on_config_change)
+            self._observing = True
+
+        snapshot = config_manager.snapshot
+        config = {key: thaw(snapshot.get(key)) for key in AGENT_CONFIG_KEYS}
+        mcp_manager = await get_mcp_manager()
+        handles = mcp_manager.get_enabled_handles()
+        key = _config_hash({
+            "config": config,
+            "servers": [[handle.name, id(handle.server)] for handle in handles],
+        })
+
+        agent = self.agents.get(key)
+        if agent is not None:
+            self.agents.move_to_end(key)
+            return agent
+        async with self._lock:
+            agent = self.agents.get(key)
+            if agent is None:
+                agent = self._build_agent(config, handles)
+                self.agents[key] = agent
+                # Drop the least recently used agents first
+                while len(self.agents) > MAX_CACHED_AGENTS:
+                    self.agents.popitem(last=False)
+            else:
+                self.agents.move_to_end(key)
+        return agent
+
+    def _build_agent(self, config: Dict[str, Any], handles: List[ServerHandle]) -> Agent:
+        """Create an agent with the configured model, settings and servers"""
+        llm_config = config["llm_provider"]
+        provider_config = ProviderConfig(
+            provider=llm_config["provider"],
+            model=llm_config["model"],
+            config=llm_config["config"],
+            model_settings=llm_config.get("model_settings", {})
+        )
+
+        # Get smart model settings based on provider and model
+        enable_thinking = config.get("enable_thinking", False)
+        smart_model_settings = llm_provider_service.get_smart_model_settings(provider_config, enable_thinking)
+
+        # Route tool calls of each server to the calling session, bound to its name for limits and timeouts
+        for handle in handles:
+            handle.server.process_tool_call = partial(process_tool_call, handle.name)
+
+        # Create agent with configured model, smart model settings, and enabled servers
+        agent_kwargs = {
+            "model": self._get_model(provider_config),
+            "toolsets": [handle.toolset for handle in handles],
+            "system_prompt": config["system_prompt"]
+        }
+
+        # Add model settings if any are configured
+        if smart_model_settings:
+            agent_kwargs["model_settings"] = smart_model_settings
+            logger.info(f"Applied model settings: {smart_model_settings}")
+
+        agent = Agent(**agent_kwargs)
+
+        logger.info(f"Created MCP Agent with provider '{provider_config.provider}', model '{provider_config.model}', and {len(handles)} enabled servers")
+        return agent
+
+    def _get_model(self, provider_config: ProviderConfig) -> Any:
+        """Get the model for a provider configuration, creating its provider once"""
+        key = _config_hash([provider_config.provider, provider_config.model, provider_config.config])
+        model = self.models.get(key)
+        if model is not None:
+            return model
+
+        # Inject JSON-based API keys into environment for pydantic-ai default providers
+        provider_info = llm_provider_service.get_available_providers().get(provider_config.provider)
+        if provider_info:
+            for field in provider_info.auth_fields:
+                env_var = field.get("env_var")
+                name = field["name"]
+                if env_var and name in provider_config.config and provider_config.config[name]:
+                    os.environ[env_var] = provider_config.config[name]
+
+        # Create provider instance using pydantic-ai
+        provider_instance = llm_provider_service.create_provider_instance(provider_config)
+
+        # Determine model: special-case Bedrock and Google GLA to pass provider instances
+        if provider_config.provider == 'bedrock':
+            # Use BedrockConverseModel with the created BedrockProvider instance
+            from pydantic_ai.models.bedrock import BedrockConverseModel
+            model = BedrockConverseModel(
+                provider_config.model,
+                provider=provider_instance
+            )
+        elif provider_config.provider == 'google-gla':
+            # Use GoogleModel with a GoogleProvider built from the API key in config
+            from pydantic_ai.providers.google import GoogleProvider
+            from pydantic_ai.models.google import GoogleModel
+            api_key = provider_config.config.get('api_key')
+            google_provider = GoogleProvider(api_key=api_key)
+            model = GoogleModel(
+                provider_config.model,
+                provider=google_provider
+            )
+        else:
+            # Use model spec string for other providers (their default providers share a cached HTTP client)
+            from pydantic_ai.models import infer_model
+            model = infer_model(f"{provider_config.provider}:{provider_config.model}")
+
+        self.models[key] = model
+        return model
+
+    def invalidate(self, models: bool = True) -> None:
+        """Forget cached agents, and their models unless models=False"""
+        self.agents.clear()
+        if models:
+            self.models.clear()
+
+    def _on_config_change(self, event: ConfigChangeEvent) -> None:
+        """Drop agents built from settings that changed"""
+        if event.changed_keys & {*AGENT_CONFIG_KEYS, "mcp_servers"}:
+            self.invalidate(models="llm_provider" in event.changed_keys)
+            logger.info(f"Invalidated cached agents after changes to {', '.join(event.changed_keys)}")
+
+# Global agent cache instance
+agent_cache = AgentCache()
+
 class MCPAgentManager:
     """Manages AI agent creation with human approval for tool execution using enabled MCP servers"""
     
     def __init__(self, approval_manager: ToolApprovalManager):
         self.approval_manager = approval_manager
+        # Tool calls in flight; pydantic-ai runs them as tasks that outlive a cancelled run
+        self.tool_tasks: Set[asyncio.Task] = set()
     
     async def create_agent(self) -> Agent:
-        """Create a fresh agent with current configuration and enabled MCP servers"""
+        """Get a (shared) agent for the current configuration and enabled MCP servers.
+        Run it with deps=self so tool calls reach this session's approval manager."""
         try:
-            # Get current configuration
-            config = await config_manager.load_config()
-
-            # Inject JSON-based API keys into environment for pydantic-ai default providers
-            llm_config = config["llm_provider"]
-            provider_info = llm_provider_service.get_available_providers().get(llm_config["provider"])
-            if provider_info:
-                for field in provider_info.auth_fields:
-                    env_var = field.get("env_var")
-                    key = field["name"]
-                    if env_var and key in llm_config["config"] and llm_config["config"][key]:
-                        os.environ[env_var] = llm_config["config"][key]
-
-            # Get LLM provider configuration
-            llm_config = config["llm_provider"]
-            provider_config = ProviderConfig(
-                provider=llm_config["provider"],
-                model=llm_config["model"],
-                config=llm_config["config"],
-                model_settings=llm_config.get("model_settings", {})
-            )
-            
-            # Create provider instance using pydantic-ai
-            provider_instance = llm_provider_service.create_provider_instance(provider_config)
-            
-            # Get smart model settings based on provider and model
-            enable_thinking = config.get("enable_thinking", False)
-            smart_model_settings = llm_provider_service.get_smart_model_settings(provider_config, enable_thinking)
-            
-            # Get only enabled MCP servers
-            mcp_manager = await get_mcp_manager()
-            servers = mcp_manager.get_enabled_servers()
-            
-            # Set up process_tool_call for each server
-            for server in servers:
-                server.process_tool_call = self._process_tool_call
-            
-            # Determine model argument: special-case Bedrock and Google GLA to pass provider instances
-            if provider_config.provider == 'bedrock':
-                # Use BedrockConverseModel with the created BedrockProvider instance
-                from pydantic_ai.models.bedrock import BedrockConverseModel
-                model_arg = BedrockConverseModel(
-                    provider_config.model,
-                    provider=provider_instance
-                )
-            elif provider_config.provider == 'google-gla':
-                # Use GoogleModel with a GoogleProvider built from the API key in config
-                from pydantic_ai.providers.google import GoogleProvider
-                from pydantic_ai.models.google import GoogleModel
-                api_key = provider_config.config.get('api_key')
-                google_provider = GoogleProvider(api_key=api_key)
-                model_arg = GoogleModel(
-                    provider_config.model,
-                    provider=google_provider
-                )
-            else:
-                # Use model spec string for other providers
-                model_arg = f"{provider_config.provider}:{provider_config.model}"
-
-            # Create agent with configured model, smart model settings, and enabled servers
-            agent_kwargs = {
-                "model": model_arg,
-                "mcp_servers": servers,
-                "system_prompt": config["system_prompt"]
-            }
-            
-            # Add model settings if any are configured
-            if smart_model_settings:
-                agent_kwargs["model_settings"] = smart_model_settings
-                logger.info(f"Applied model settings: {smart_model_settings}")
-            
-            agent = Agent(**agent_kwargs)
-            
-            logger.info(f"Created MCP Agent with provider '{provider_config.provider}', model '{provider_config.model}', and {len(servers)} enabled servers")
-            return agent
-            
+            return await agent_cache.get_agent()
         except Exception as e:
             logger.error(f"Failed to create MCP Agent: {e}", exc_info=True)
             raise MCPServerError(f"Agent creation failed: {e}")
     
-
+    def cancel_tool_calls(self) -> int:
+        """Cancel tool calls still running after their agent run was stopped.
+        Returns the number of calls cancelled."""
+        cancelled = 0
+        for task in self.tool_tasks:
+            if not task.done():
+                task.cancel()
+                cancelled += 1
+        if cancelled:
+            logger.info(f"Cancelled {cancelled} in-flight tool calls")
+        return cancelled
+    
     async def _process_tool_call(
-        self, ctx: Any, call_tool: CallToolFunc, tool_name: str, args: dict[str, Any]
+        self, server_name: Optional[str], ctx: Any, call_tool: CallToolFunc, tool_name: str, args: dict[str, Any]
     ) -> Any:
-        """Interceptor for tool calls to enforce human approval"""
-        # Ask user for approval
-        approved = await self.approval_manager.request_approval(tool_name, args)
-        if not approved:
-            return "Tool execution denied by user"
-        
-        # Execute the actual tool
+        """Interceptor for tool calls to enforce human approval, result caching, per-server concurrency and timeouts"""
+        task = asyncio.current_task()
+        self.tool_tasks.add(task)
         try:
-            result = await call_tool(tool_name, args)
+            # Ask user for approval (or reuse the decision raised early from the model stream)
+            approved = await self.approval_manager.request_approval(
+                tool_name, args, getattr(ctx, "tool_call_id", None), server_name
+            )
+            if not approved:
+                return "Tool execution denied by user"
+            
+            # Reuse a cached result of an idempotent tool without touching its server
+            mcp_manager = await get_mcp_manager()
+            cache_ttl = mcp_manager.get_cache_ttl(server_name, tool_name)
+            if cache_ttl is not None:
+                hit, result = await tool_result_cache.get(server_name, tool_name, args)
+                if hit:
+                    logger.info(f"Served {tool_name} on {server_name} from the tool result cache")
+                    return result
+            
+            # Execute the actual tool, waiting for a free slot on its server (or a pool instance of it);
+            # the timeout covers the wait as well as the call
+            timeout = await mcp_manager.get_tool_timeout(server_name, tool_name)
+            loop = asyncio.get_running_loop()
+            started = None
+            try:
+                # A lazy server is only started here, once the call is approved; its startup is not timed
+                async with mcp_manager.use_server(server_name), asyncio.timeout(timeout):
+                    async with mcp_manager.acquire_server(server_name, call_tool) as acquired_call_tool:
+                        started = loop.time()
+                        try:
+                            result = await acquired_call_tool(tool_name, args)
+                        except Exception as e:
+                            mcp_manager.record_tool_call(server_name, loop.time() - started, "error")
+                            # Log the error but format it as a normal response for the agent
+                            logger.error(f"Error executing tool {tool_name}: {e}", exc_info=True)
+                            # Return error information in a format similar to successful responses
+                            return f"Error occurred: {str(e)}"
+                        mcp_manager.record_tool_call(server_name, loop.time() - started)
+            except TimeoutError:
+                if started is None:
+                    logger.error(f"Tool {tool_name} on {server_name} found no free server slot within {timeout}s")
+                else:
+                    mcp_manager.record_tool_call(server_name, loop.time() - started, "timeout")
+                    logger.error(f"Tool {tool_name} on {server_name} timed out after {timeout}s")
+                return f"Error occurred: tool timed out after {timeout} seconds"
+            except MCPServerError as e:
+                # The server stopped while the call was queued for it, or a lazy one failed to start
+                logger.error(f"Tool {tool_name} on {server_name} was not run: {e}")
+                return f"Error occurred: {str(e)}"
+            if cache_ttl is not None:
+                tool_result_cache.put(server_name, tool_name, args, result, cache_ttl)
             return result
-        except Exception as e:
-            # Log the error but format it as a normal response for the agent
-            logger.error(f"Error executing tool {tool_name}: {e}", exc_info=True)
-            # Return error information in a format similar to successful responses
-            return f"Error occurred: {str(e)}"
+        finally:
+            self.tool_tasks.discard(task)
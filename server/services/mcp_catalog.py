@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+MCP Tool Catalog Store - Persists the tool lists of lazy servers so they can be served without starting them
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from dataclasses import asdict
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from pydantic_ai.tools import ToolDefinition
+
+logger = logging.getLogger(__name__)
+
+# File the tool catalogs of lazy servers are persisted to, next to settings.json
+MCP_CATALOG_FILE = "mcp_catalog.json"
+
+def config_hash(config: Dict[str, Any]) -> str:
+    """Hash of a server config; a stored catalog is only served to the config it was listed with"""
+    canonical = json.dumps(config, sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+class ToolCatalogStore:
+    """
+    Tool definitions of lazy servers, by server name, persisted to disk.
+    Each entry records the hash of the config it was listed with, so a
+    changed command, args or env makes the stored tools stale instead of
+    being served. Only the latest catalog of a server is kept.
+    """
+
+    def __init__(self, catalog_file: str = MCP_CATALOG_FILE):
+        self.catalog_file = Path(catalog_file)
+        # Server name -> {"config": hash, "tools": [ToolDefinition fields]}
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        self._loaded = False
+        self._write_lock = asyncio.Lock()
+
+    async def get(self, name: str, config: Dict[str, Any]) -> Optional[List[ToolDefinition]]:
+        """Stored tools of a server, or None if there are none for its current config"""
+        if not self._loaded:
+            await self.load()
+        entry = self.entries.get(name)
+        if entry is None or entry.get("config") != config_hash(config):
+            return None
+        try:
+            return [ToolDefinition(**tool) for tool in entry["tools"]]
+        except (KeyError, TypeError) as e:
+            logger.warning(f"Ignoring unreadable stored tool catalog of MCP server '{name}': {e}")
+            return None
+
+    async def put(self, name: str, config: Dict[str, Any], tool_defs: List[ToolDefinition]) -> None:
+        """Store the tools a server listed and write the catalog file"""
+        if not self._loaded:
+            await self.load()
+        self.entries[name] = {"config": config_hash(config), "tools": [asdict(tool_def) for tool_def in tool_defs]}
+        # One write at a time, each taking the entries as they are once it runs, so an older one never lands last
+        async with self._write_lock:
+            try:
+                await asyncio.to_thread(self._write_file, dict(self.entries))
+            except (OSError, TypeError, ValueError) as e:
+                logger.error(f"Error saving MCP tool catalog to {self.catalog_file}: {e}")
+
+    async def load(self) -> None:
+        """Read the catalog file into memory"""
+        self._loaded = True
+        try:
+            data = await asyncio.to_thread(self._read_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable MCP tool catalog file {self.catalog_file}: {e}")
+            return
+        if isinstance(data, dict):
+            for name, entry in data.items():
+                self.entries.setdefault(name, entry)
+
+    def _read_file(self) -> Any:
+        """Read persisted catalogs. Blocking; run it off-loop."""
+        if not self.catalog_file.exists():
+            return {}
+        with open(self.catalog_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_file(self, data: Dict[str, Any]) -> None:
+        """Atomically replace the catalog file. Blocking; run it off-loop."""
+        directory = self.catalog_file.resolve().parent
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{self.catalog_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.catalog_file)
+        except BaseException:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+# Global tool catalog store instance
+tool_catalog_store = ToolCatalogStore()
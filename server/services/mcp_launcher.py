@@ -0,0 +1,238 @@
+#!/usr/bin/env python3
+"""
+MCP Launch Cache - Installs npx-launched MCP server packages once and spawns their entry points directly
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import shutil
+import tempfile
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from core.config import config_manager
+from core.exceptions import MCPServerError
+
+logger = logging.getLogger(__name__)
+
+# Directory the npm packages of MCP servers are installed into, one subdirectory per package
+MCP_PACKAGES_DIR = "mcp_packages"
+# Seconds an npm install may take
+NPM_INSTALL_TIMEOUT = 300.0
+# npx flags that only skip its install prompt; commands with other npx options are left to npx
+NPX_YES_FLAGS = ("-y", "--yes")
+# Versions that name a single release (anything else is a tag or range resolved at install time)
+EXACT_VERSION = re.compile(r"^\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?$")
+
+@dataclass(frozen=True)
+class NpxLaunch:
+    """An `npx -y <package>[@version] [args...]` command"""
+    package: str
+    version: str
+    args: List[str]
+
+def parse_npx(command: str, args: List[str]) -> Optional[NpxLaunch]:
+    """Recognize an npx command running a registry package, or None"""
+    if os.path.basename(command) not in ("npx", "npx.cmd"):
+        return None
+    rest = list(args)
+    while rest and rest[0] in NPX_YES_FLAGS:
+        rest.pop(0)
+    if not rest or rest[0].startswith("-"):
+        return None
+    spec, package_args = rest[0], rest[1:]
+    # Paths, URLs and git specs are not registry packages
+    if spec.startswith((".", "/", "~")) or ":" in spec:
+        return None
+    at = spec.rfind("@")
+    if at > 0:
+        return NpxLaunch(spec[:at], spec[at + 1:] or "latest", package_args)
+    return NpxLaunch(spec, "latest", package_args)
+
+class LaunchCache:
+    """
+    Local installs of the npm packages MCP servers are launched from.
+    Instead of letting `npx -y` check the registry and unpack the package on
+    every start, a package is installed once into its own directory and the
+    server is spawned from its bin entry point. Packages launched by a tag or
+    range (e.g. latest) have their installed version pinned in the
+    `mcp_package_pins` setting, so restarts and other machines sharing the
+    settings run the same release until the package is refreshed. Commands
+    naming an exact version always get that version.
+    """
+
+    def __init__(self, packages_dir: str = MCP_PACKAGES_DIR):
+        self.packages_dir = Path(packages_dir)
+        self._locks: Dict[str, asyncio.Lock] = {}
+        # Pins in effect but not yet saved to the mcp_package_pins setting
+        self._unsaved_pins: Dict[str, str] = {}
+        self._pin_task: Optional[asyncio.Task] = None
+
+    def install_dir(self, package: str) -> Path:
+        return self.packages_dir / package.replace("/", "__")
+
+    def installed_version(self, package: str) -> Optional[str]:
+        """Version of the local install of a package, or None if it is not installed"""
+        manifest = self._read_manifest(package)
+        return manifest.get("version") if manifest is not None else None
+
+    def wanted_version(self, launch: NpxLaunch) -> str:
+        """The exact version a command asks for, else the package's pin, else the tag or range it asks for"""
+        if EXACT_VERSION.match(launch.version):
+            return launch.version
+        if launch.package in self._unsaved_pins:
+            return self._unsaved_pins[launch.package]
+        return config_manager.snapshot.get("mcp_package_pins", {}).get(launch.package, launch.version)
+
+    def lookup(self, command: str, args: List[str]) -> Optional[Tuple[str, List[str]]]:
+        """Resolve an npx command to the entry point of its local install, if installed in the wanted version"""
+        launch = parse_npx(command, args)
+        if launch is None:
+            return None
+        installed = self.installed_version(launch.package)
+        if installed is None:
+            return None
+        wanted = self.wanted_version(launch)
+        if EXACT_VERSION.match(wanted) and installed != wanted:
+            return None
+        return self._entry_point(launch)
+
+    async def ensure_installed(self, command: str, args: List[str]) -> Optional[Tuple[str, List[str]]]:
+        """Resolve an npx command, installing (and pinning) its package first if needed"""
+        launch = parse_npx(command, args)
+        if launch is None:
+            return None
+        async with self._lock(launch.package):
+            resolved = self.lookup(command, args)
+            if resolved is None:
+                await self._install(launch.package, self.wanted_version(launch))
+                resolved = self.lookup(command, args)
+        return resolved
+
+    async def refresh(self, command: str, args: List[str]) -> Tuple[str, str]:
+        """Reinstall the version an npx command asks for (e.g. latest), ignoring the pin.
+        Returns the package and its newly installed (and, for tags and ranges, pinned) version."""
+        launch = parse_npx(command, args)
+        if launch is None:
+            raise MCPServerError(f"'{command} {' '.join(args)}' does not launch an npm package with npx")
+        async with self._lock(launch.package):
+            version = await self._install(launch.package, launch.version)
+        return launch.package, version
+
+    def _lock(self, package: str) -> asyncio.Lock:
+        return self._locks.setdefault(package, asyncio.Lock())
+
+    async def _install(self, package: str, version: str) -> str:
+        """Install a package into its directory, replacing any previous install, and pin its version"""
+        npm = shutil.which("npm")
+        if npm is None:
+            raise MCPServerError("npm is not installed")
+        self.packages_dir.mkdir(parents=True, exist_ok=True)
+        target = self.install_dir(package)
+        staging = tempfile.mkdtemp(dir=self.packages_dir, prefix=f".{target.name}.")
+        logger.info(f"Installing MCP server package {package}@{version}")
+        try:
+            process = await asyncio.create_subprocess_exec(
+                npm, "install", "--prefix", staging, "--no-save", "--no-audit", "--no-fund",
+                "--omit=dev", "--loglevel=error", f"{package}@{version}",
+                stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+            )
+            try:
+                _, stderr = await asyncio.wait_for(process.communicate(), timeout=NPM_INSTALL_TIMEOUT)
+            except asyncio.TimeoutError:
+                process.kill()
+                await process.wait()
+                raise MCPServerError(f"npm install of {package}@{version} timed out after {NPM_INSTALL_TIMEOUT}s")
+            if process.returncode != 0:
+                raise MCPServerError(f"npm install of {package}@{version} failed: {stderr.decode(errors='replace').strip()[-500:]}")
+            await asyncio.to_thread(self._swap_install, Path(staging), target)
+        finally:
+            await asyncio.to_thread(shutil.rmtree, staging, True)
+
+        installed = self.installed_version(package)
+        if installed is None:
+            raise MCPServerError(f"npm install of {package}@{version} did not install {package}")
+        if not EXACT_VERSION.match(version):
+            self._pin(package, installed)
+        logger.info(f"Installed MCP server package {package}@{installed}")
+        return installed
+
+    def _swap_install(self, staging: Path, target: Path) -> None:
+        """Move a finished install into place. Blocking; run it off-loop."""
+        previous = target.with_name(f".{target.name}.old")
+        shutil.rmtree(previous, ignore_errors=True)
+        if target.exists():
+            os.replace(target, previous)
+        os.replace(staging, target)
+        shutil.rmtree(previous, ignore_errors=True)
+
+    def _pin(self, package: str, version: str) -> None:
+        """Pin the installed version of a package right away and save the pin in the background.
+        Installs run while servers are (re)configured from inside a settings save, so saving
+        the pin inline would wait on that save."""
+        self._unsaved_pins[package] = version
+        if self._pin_task is None or self._pin_task.done():
+            self._pin_task = asyncio.create_task(self._save_pins())
+
+    async def _save_pins(self) -> None:
+        """Write unsaved pins to the mcp_package_pins setting"""
+        while self._unsaved_pins:
+            pins = dict(self._unsaved_pins)
+            config = await config_manager.load_config()
+            saved = config.get("mcp_package_pins", {})
+            if any(saved.get(package) != version for package, version in pins.items()):
+                config["mcp_package_pins"] = {**saved, **pins}
+                try:
+                    await config_manager.save_config(config)
+                except Exception as e:
+                    # The pins stay in effect for this process and are saved with the next one
+                    logger.error(f"Failed to save MCP package pins: {e}")
+                    return
+            for package, version in pins.items():
+                if self._unsaved_pins.get(package) == version:
+                    del self._unsaved_pins[package]
+
+    async def flush(self) -> None:
+        """Wait until every pin is saved"""
+        if self._pin_task is not None:
+            await asyncio.gather(self._pin_task, return_exceptions=True)
+
+    def _read_manifest(self, package: str) -> Optional[dict]:
+        path = self.install_dir(package) / "node_modules" / package / "package.json"
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _entry_point(self, launch: NpxLaunch) -> Optional[Tuple[str, List[str]]]:
+        """Command running a package's bin the way npx would pick it: the only one, or the one named after the package"""
+        manifest = self._read_manifest(launch.package) or {}
+        bin_entry = manifest.get("bin")
+        if isinstance(bin_entry, dict):
+            name = launch.package.rsplit("/", 1)[-1]
+            bin_entry = bin_entry.get(name) if len(bin_entry) != 1 else next(iter(bin_entry.values()))
+        if not isinstance(bin_entry, str):
+            return None
+        path = (self.install_dir(launch.package) / "node_modules" / launch.package / bin_entry).resolve()
+        if not path.is_file():
+            return None
+        if path.suffix in (".js", ".mjs", ".cjs") or self._has_node_shebang(path):
+            return shutil.which("node") or "node", [str(path), *launch.args]
+        return str(path), list(launch.args)
+
+    @staticmethod
+    def _has_node_shebang(path: Path) -> bool:
+        try:
+            with open(path, 'rb') as f:
+                first_line = f.readline(200)
+        except OSError:
+            return False
+        return first_line.startswith(b"#!") and b"node" in first_line
+
+# Global launch cache instance
+launch_cache = LaunchCache()
@@ -0,0 +1,712 @@
+#!/usr/bin/env python3
+"""
+MCP Server Registry - Named handles owning each MCP server's lifecycle, limits and stats
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, asdict
+from typing import Any, AsyncIterator, Awaitable, Callable, Deque, Dict, Iterator, List, Optional
+
+from mcp import types as mcp_types
+from mcp.shared.exceptions import McpError
+from pydantic_ai import RunContext
+from pydantic_ai.mcp import MCPServer
+from pydantic_ai.toolsets import AbstractToolset, ToolsetTool, WrapperToolset
+
+from core.exceptions import MCPServerError
+from core.metrics import metrics
+from services.mcp_catalog import tool_catalog_store
+
+logger = logging.getLogger(__name__)
+
+# Concurrent tool calls per server unless its config sets max_concurrency
+DEFAULT_STDIO_CONCURRENCY = 1
+DEFAULT_HTTP_CONCURRENCY = 8
+# Seconds a server may take to start unless its config sets startup_timeout
+DEFAULT_STARTUP_TIMEOUT = 60.0
+# Seconds a server may take to shut down before its task is cancelled
+SERVER_STOP_TIMEOUT = 10.0
+# Seconds a lazy server may sit unused before it is shut down, unless its config sets idle_timeout
+DEFAULT_IDLE_TIMEOUT = 600.0
+
+# Server lifecycle states
+STARTING = "starting"
+RUNNING = "running"
+FAILED = "failed"
+STOPPED = "stopped"
+# Lazy server whose process is not running; started on first use
+IDLE = "idle"
+
+# Seconds an extra pool instance may sit unused before it is shut down, unless the pool config sets idle_timeout
+DEFAULT_POOL_IDLE_TIMEOUT = 60.0
+
+# Catalog entries and the server notifications that invalidate them
+CATALOG_KINDS = ("tools", "prompts", "resources")
+LIST_CHANGED_NOTIFICATIONS = {
+    mcp_types.ToolListChangedNotification: "tools",
+    mcp_types.PromptListChangedNotification: "prompts",
+    mcp_types.ResourceListChangedNotification: "resources",
+}
+
+def describe_error(error: BaseException) -> str:
+    """Readable message of an error, unwrapping the exception groups HTTP transports raise"""
+    while isinstance(error, BaseExceptionGroup) and error.exceptions:
+        error = error.exceptions[0]
+    return str(error) or type(error).__name__
+
+def max_concurrency(config: Dict[str, Any]) -> int:
+    """Concurrent tool calls allowed on a server; HTTP servers handle more than one stdio process"""
+    default = DEFAULT_HTTP_CONCURRENCY if "url" in config else DEFAULT_STDIO_CONCURRENCY
+    return config.get("max_concurrency", default)
+
+@dataclass
+class ServerStats:
+    """Tool call counters of a server"""
+    tool_calls: int = 0
+    tool_errors: int = 0
+    tool_timeouts: int = 0
+    total_latency: float = 0.0
+    last_call_at: Optional[float] = None
+
+    def record_call(self, latency: float, outcome: str = "ok") -> None:
+        """Record a finished tool call ("ok", "error" or "timeout")"""
+        self.tool_calls += 1
+        self.total_latency += latency
+        self.last_call_at = time.time()
+        if outcome == "error":
+            self.tool_errors += 1
+        elif outcome == "timeout":
+            self.tool_timeouts += 1
+
+    def to_dict(self) -> Dict[str, Any]:
+        data = asdict(self)
+        data["average_latency"] = self.total_latency / self.tool_calls if self.tool_calls else None
+        return data
+
+@dataclass
+class ServerToolset(WrapperToolset):
+    """
+    Agent-facing toolset of a managed server.
+    Runs neither start nor stop the server (its handle owns the process) and
+    tools are served from the handle's cached catalog, so a run step does
+    not cost a list-tools round trip. Lazy servers are started on their
+    first listing (unless a catalog stored by an earlier process matches
+    their config) or on their first approved call.
+    """
+    handle: Optional['ServerHandle'] = None
+
+    async def __aenter__(self) -> 'ServerToolset':
+        return self
+
+    async def __aexit__(self, *args: Any) -> Optional[bool]:
+        return None
+
+    async def get_tools(self, ctx: RunContext[Any]) -> Dict[str, ToolsetTool[Any]]:
+        handle = self.handle
+        tool_defs = handle.catalog.get("tools")
+        if tool_defs is None and handle.lazy and handle.state != RUNNING:
+            tool_defs = await tool_catalog_store.get(handle.name, handle.config)
+            if tool_defs is not None:
+                metrics.incr("mcp.catalog.stored_hits.tools")
+                # Served until the server starts, which lists its tools again
+                handle.catalog["tools"] = tool_defs
+        if tool_defs is None:
+            metrics.incr("mcp.catalog.fetches.tools")
+            async with handle.in_use():
+                tools = await self.wrapped.get_tools(ctx)
+            handle.catalog["tools"] = [tool.tool_def for tool in tools.values()]
+            if handle.lazy:
+                await tool_catalog_store.put(handle.name, handle.config, handle.catalog["tools"])
+            return tools
+        metrics.incr("mcp.catalog.hits.tools")
+        return {tool_def.name: self.wrapped.tool_for_tool_def(tool_def) for tool_def in tool_defs}
+
+    async def call_tool(self, name: str, tool_args: Dict[str, Any], ctx: RunContext[Any], tool: ToolsetTool[Any]) -> Any:
+        if getattr(self.wrapped, "process_tool_call", None) is not None:
+            # The interceptor asks for approval first and keeps the server in use only for an approved call
+            return await self.wrapped.call_tool(name, tool_args, ctx, tool)
+        async with self.handle.in_use():
+            return await self.wrapped.call_tool(name, tool_args, ctx, tool)
+
+class PoolInstance:
+    """An extra process of a pooled server, entered and exited in its own task"""
+
+    def __init__(self, server: MCPServer, startup_timeout: float):
+        self.server = server
+        self.startup_timeout = startup_timeout
+        self.state = STARTING
+        self.in_flight = 0
+        self.last_used: Optional[float] = None
+        # Loop time of the last protocol ping and consecutive pings that failed
+        self.last_probe_at: Optional[float] = None
+        self.probe_failures = 0
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, on_settled: Callable[[], Awaitable[None]]) -> None:
+        self._task = asyncio.create_task(self._run(on_settled))
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._stop.set()
+        if self.state == STARTING:
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=SERVER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        except BaseException as e:
+            if not isinstance(e, asyncio.CancelledError):
+                logger.error(f"Error stopping MCP pool instance: {e}", exc_info=True)
+        self._task = None
+
+    async def probe(self, timeout: float) -> bool:
+        """Ping the instance over the MCP protocol; its task stays open even if the process died"""
+        self.last_probe_at = asyncio.get_running_loop().time()
+        try:
+            async with asyncio.timeout(timeout):
+                await self.server._client.send_ping()
+        except Exception as e:
+            self.probe_failures += 1
+            reason = "timed out" if isinstance(e, TimeoutError) else describe_error(e)
+            logger.warning(f"MCP pool instance failed a probe: {reason}")
+            return False
+        self.probe_failures = 0
+        return True
+
+    async def _run(self, on_settled: Callable[[], Awaitable[None]]) -> None:
+        try:
+            # Same-task timeout: the server's context must be exited by the task that entered it
+            async with asyncio.timeout(self.startup_timeout):
+                await self.server.__aenter__()
+        except Exception as e:
+            self.state = FAILED
+            logger.warning(f"MCP pool instance failed to start: {describe_error(e)}")
+            await on_settled()
+            return
+        self.state = RUNNING
+        self.last_used = asyncio.get_running_loop().time()
+        await on_settled()
+        try:
+            await self._stop.wait()
+        finally:
+            try:
+                await self.server.__aexit__(None, None, None)
+            finally:
+                self.state = STOPPED
+
+class ServerPool:
+    """
+    Extra instances of a stateless server.
+    Tool calls go to the least-loaded running instance (the handle's own
+    server included); when every instance is at its concurrency limit the
+    pool grows up to max_instances, and extra instances idle for longer
+    than idle_timeout are shut down again down to min_instances.
+    """
+
+    def __init__(self, handle: 'ServerHandle', create_server: Callable[[], MCPServer]):
+        self.handle = handle
+        self.create_server = create_server
+        self.instances: List[PoolInstance] = []
+        self._changed = asyncio.Condition()
+        # Set while the handle's server is stopped; queued calls fail instead of growing a detached pool
+        self.closed = False
+
+    @property
+    def config(self) -> Dict[str, Any]:
+        return self.handle.config.get("pool", {})
+
+    @property
+    def min_instances(self) -> int:
+        return self.config.get("min_instances", 1)
+
+    @property
+    def max_instances(self) -> int:
+        return self.config.get("max_instances", self.min_instances)
+
+    @property
+    def idle_timeout(self) -> float:
+        return self.config.get("idle_timeout", DEFAULT_POOL_IDLE_TIMEOUT)
+
+    @property
+    def capacity(self) -> int:
+        """Concurrent calls per instance"""
+        return max_concurrency(self.handle.config)
+
+    def ensure_min(self) -> None:
+        """Start extra instances up to the minimum (the handle's server counts as one)"""
+        self.closed = False
+        while 1 + len(self.instances) < self.min_instances:
+            self._grow()
+
+    def _grow(self) -> None:
+        instance = PoolInstance(self.create_server(), self.handle.startup_timeout)
+        self.instances.append(instance)
+        instance.start(self._notify)
+        metrics.incr("mcp.pool.scale_ups")
+        logger.info(f"Scaling MCP server '{self.handle.name}' to {1 + len(self.instances)} instances")
+
+    async def _notify(self) -> None:
+        async with self._changed:
+            # Forget instances that failed to start
+            self.instances = [instance for instance in self.instances if instance.state != FAILED]
+            self._changed.notify_all()
+
+    @asynccontextmanager
+    async def acquire(self, call_tool: Callable[..., Awaitable[Any]]) -> AsyncIterator[Callable[..., Awaitable[Any]]]:
+        """Reserve a slot on the least-loaded instance and yield its call function"""
+        primary = self.handle
+        async with self._changed:
+            while True:
+                if self.closed:
+                    raise MCPServerError(f"MCP server '{primary.name}' stopped while the call waited for a free instance")
+                slots = [(primary.in_flight, None)] if primary.state == RUNNING else []
+                slots += [(instance.in_flight, instance) for instance in self.instances if instance.state == RUNNING]
+                free = [slot for slot in slots if slot[0] < self.capacity]
+                if free:
+                    chosen = min(free, key=lambda slot: slot[0])[1]
+                    break
+                # Every instance is busy: grow the pool and wait for a free slot
+                starting = any(instance.state == STARTING for instance in self.instances)
+                if not starting and 1 + len(self.instances) < self.max_instances:
+                    self._grow()
+                metrics.incr("mcp.pool.queued_calls")
+                await self._changed.wait()
+            target = chosen if chosen is not None else primary
+            target.in_flight += 1
+        try:
+            yield call_tool if chosen is None else chosen.server.direct_call_tool
+        finally:
+            async with self._changed:
+                target.in_flight -= 1
+                target.last_used = asyncio.get_running_loop().time()
+                self._changed.notify_all()
+
+    async def scale_down(self, now: float) -> None:
+        """Stop extra instances that went unused for longer than the idle timeout"""
+        for instance in list(self.instances):
+            idle = (
+                instance.state == RUNNING and instance.in_flight == 0
+                and now - (instance.last_used or now) >= self.idle_timeout
+            )
+            if idle and 1 + len(self.instances) > self.min_instances:
+                self.instances.remove(instance)
+                await instance.stop()
+                logger.info(f"Scaled MCP server '{self.handle.name}' down to {1 + len(self.instances)} instances")
+
+    async def replace(self, instance: PoolInstance) -> None:
+        """Take a dead instance out of routing, stop it and start instances back up to the minimum"""
+        async with self._changed:
+            if instance not in self.instances:
+                return
+            self.instances.remove(instance)
+            # Queued calls re-check the pool and grow it if it is below its maximum
+            self._changed.notify_all()
+        logger.warning(f"Replacing dead instance of MCP server '{self.handle.name}'")
+        metrics.incr("mcp.pool.replacements")
+        await instance.stop()
+        if not self.closed:
+            self.ensure_min()
+
+    async def stop(self) -> None:
+        """Stop every extra instance and fail the calls still waiting for one"""
+        async with self._changed:
+            self.closed = True
+            instances, self.instances = self.instances, []
+            self._changed.notify_all()
+        await asyncio.gather(*(instance.stop() for instance in instances))
+
+    def describe(self) -> Dict[str, Any]:
+        return {
+            "min_instances": self.min_instances,
+            "max_instances": self.max_instances,
+            "instances": 1 + len(self.instances),
+            "in_flight": [self.handle.in_flight] + [instance.in_flight for instance in self.instances],
+        }
+
+class ServerHandle:
+    """
+    A configured MCP server and everything the manager tracks about it.
+    The server context is entered and exited in a dedicated task, so servers
+    start concurrently and a slow or hung server only delays itself.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        config: Dict[str, Any],
+        server: Optional[MCPServer],
+        on_state_change: Optional[Callable[['ServerHandle'], Awaitable[None]]] = None,
+        error: Optional[str] = None,
+        create_server: Optional[Callable[[], MCPServer]] = None,
+        prepare: Optional[Callable[[MCPServer], Awaitable[None]]] = None
+    ):
+        self.name = name
+        self.config = config
+        self.server = server
+        # Runs before each start, outside the startup timeout (e.g. to install the server's package)
+        self._prepare = prepare
+        # What agents are given
+        self.toolset: Optional[AbstractToolset] = ServerToolset(server, handle=self) if server is not None else None
+        # Lists fetched from the server by kind (tools as ToolDefinitions); kept while a lazy server is idle
+        self.catalog: Dict[str, Any] = {}
+        # Bounds concurrent tool calls on the server
+        self.semaphore = asyncio.Semaphore(max_concurrency(config))
+        self.stats = ServerStats()
+        # Calls executing on the handle's own server
+        self.in_flight = 0
+        # Extra instances of servers declared stateless with a pool config
+        self.pool: Optional[ServerPool] = None
+        if server is not None and create_server is not None and config.get("stateless") and config.get("pool"):
+            self.pool = ServerPool(self, create_server)
+        self.state = STARTING if server is not None else FAILED
+        self.error = error
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        # Supervision: probe results and restart history (carried over by inherit())
+        self.probe_latency: Optional[float] = None
+        self.last_probe_at: Optional[float] = None
+        self.probe_failures = 0
+        self.restarts = 0
+        self.restart_times: Deque[float] = deque()
+        self.last_error: Optional[str] = error
+        # Loop time the server was found dead, None while healthy
+        self.down_since: Optional[float] = None
+        # Set when the supervisor stopped restarting the server
+        self.gave_up = False
+        # Lazy servers: calls in progress and loop time of the last use
+        self.active_uses = 0
+        self.last_used: Optional[float] = None
+        self._start_lock = asyncio.Lock()
+        self._on_state_change = on_state_change
+        self._settled = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        if server is None:
+            self._settled.set()
+
+    @property
+    def startup_timeout(self) -> float:
+        return self.config.get("startup_timeout", DEFAULT_STARTUP_TIMEOUT)
+
+    @property
+    def lazy(self) -> bool:
+        """Whether the server is only started on demand"""
+        return bool(self.config.get("lazy", False))
+
+    @property
+    def idle_timeout(self) -> float:
+        return self.config.get("idle_timeout", DEFAULT_IDLE_TIMEOUT)
+
+    def update_config(self, config: Dict[str, Any]) -> None:
+        """Apply settings that do not need a restart; in-flight calls finish under the old limit"""
+        if max_concurrency(config) != max_concurrency(self.config):
+            self.semaphore = asyncio.Semaphore(max_concurrency(config))
+        self.config = config
+
+    def inherit(self, previous: 'ServerHandle') -> None:
+        """Carry stats and restart history over from the handle this one replaces"""
+        self.stats = previous.stats
+        self.restarts = previous.restarts
+        self.restart_times = previous.restart_times
+        self.last_error = previous.last_error
+        # Still advertised by an idle lazy server; dropped once the new process starts
+        self.catalog = previous.catalog
+
+    @property
+    def is_alive(self) -> bool:
+        """Whether a running server's task is still holding it open"""
+        return self.state == RUNNING and self._task is not None and not self._task.done()
+
+    async def probe(self, timeout: float) -> bool:
+        """Ping the server over the MCP protocol, recording latency or the failure"""
+        loop = asyncio.get_running_loop()
+        started = loop.time()
+        self.last_probe_at = time.time()
+        try:
+            async with asyncio.timeout(timeout):
+                # pydantic-ai has no public ping; use the server's MCP client session
+                await self.server._client.send_ping()
+        except Exception as e:
+            self.probe_failures += 1
+            reason = "timed out" if isinstance(e, TimeoutError) else describe_error(e)
+            self.last_error = f"probe failed: {reason}"
+            return False
+        self.probe_latency = loop.time() - started
+        self.probe_failures = 0
+        return True
+
+    def start(self) -> None:
+        """Start the server in the background (lazy servers wait for their first use)"""
+        if self.server is None:
+            return
+        if self.lazy:
+            self.state = IDLE
+            self._settled.set()
+            return
+        self._launch()
+
+    def _launch(self) -> None:
+        self.state = STARTING
+        self._settled = asyncio.Event()
+        self._stop = asyncio.Event()
+        self._task = asyncio.create_task(self._run(), name=f"mcp-server-{self.name}")
+
+    async def ensure_running(self) -> None:
+        """Start an idle lazy server and wait until it runs"""
+        if self.state != RUNNING:
+            async with self._start_lock:
+                if self.state == IDLE:
+                    logger.info(f"Starting lazy MCP server '{self.name}' on demand")
+                    self._launch()
+                await self.wait_settled()
+        if self.state != RUNNING:
+            raise MCPServerError(f"MCP server '{self.name}' is not available: {self.error or self.state}")
+
+    @asynccontextmanager
+    async def in_use(self) -> AsyncIterator[None]:
+        """Keep the server running (starting it if needed) for the duration of a use"""
+        self.active_uses += 1
+        try:
+            await self.ensure_running()
+            yield
+        finally:
+            self.active_uses -= 1
+            self.last_used = asyncio.get_running_loop().time()
+
+    def is_idle_expired(self, now: float) -> bool:
+        """Whether a running lazy server has gone unused for longer than its idle timeout"""
+        return (
+            self.lazy and self.state == RUNNING and self.active_uses == 0
+            and now - (self.last_used or now) >= self.idle_timeout
+        )
+
+    async def stop_idle(self) -> None:
+        """Shut a lazy server down until its next use"""
+        async with self._start_lock:
+            await self.stop()
+            self.state = IDLE
+            self.error = None
+        logger.info(f"Stopped idle MCP server '{self.name}'")
+        if self._on_state_change is not None:
+            await self._on_state_change(self)
+
+    async def wait_settled(self) -> str:
+        """Wait until the server is running or has failed to start"""
+        await self._settled.wait()
+        return self.state
+
+    @asynccontextmanager
+    async def acquire(self, call_tool: Callable[..., Awaitable[Any]]) -> AsyncIterator[Callable[..., Awaitable[Any]]]:
+        """Reserve a slot for a tool call and yield the function executing it"""
+        if self.pool is not None:
+            async with self.pool.acquire(call_tool) as pooled_call_tool:
+                yield pooled_call_tool
+            return
+        async with self.semaphore:
+            self.in_flight += 1
+            try:
+                yield call_tool
+            finally:
+                self.in_flight -= 1
+
+    async def stop(self) -> None:
+        """Shut the server down, cancelling its task if it does not exit in time"""
+        if self.pool is not None:
+            await self.pool.stop()
+        if self._task is None:
+            return
+        self._stop.set()
+        if self.state == STARTING:
+            # Abort a start that is still in progress
+            self._task.cancel()
+        try:
+            await asyncio.wait_for(asyncio.shield(self._task), timeout=SERVER_STOP_TIMEOUT)
+        except asyncio.TimeoutError:
+            logger.warning(f"MCP server '{self.name}' did not stop within {SERVER_STOP_TIMEOUT}s, cancelling")
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+        except Exception as e:
+            logger.error(f"Error stopping MCP server '{self.name}': {e}", exc_info=True)
+        self._task = None
+
+    def invalidate_catalog(self, kind: Optional[str] = None) -> None:
+        """Forget a cached list (or all of them) so it is fetched again on next use"""
+        if kind is None:
+            self.catalog = {}
+        else:
+            self.catalog.pop(kind, None)
+
+    async def get_catalog(self, kind: str) -> List[Any]:
+        """Get the server's tools, prompts or resources, fetching them on first use"""
+        if kind == "tools":
+            if "tools" not in self.catalog:
+                await self.toolset.get_tools(None)
+            return self.catalog["tools"]
+        entries = self.catalog.get(kind)
+        if entries is not None:
+            metrics.incr(f"mcp.catalog.hits.{kind}")
+            return entries
+        metrics.incr(f"mcp.catalog.fetches.{kind}")
+        async with self.in_use():
+            # pydantic-ai only wraps tool listing; use the server's MCP client session
+            try:
+                if kind == "prompts":
+                    entries = (await self.server._client.list_prompts()).prompts
+                else:
+                    entries = (await self.server._client.list_resources()).resources
+            except McpError:
+                # The server does not support this kind of list
+                entries = []
+        self.catalog[kind] = entries
+        return entries
+
+    def _watch_list_changes(self) -> None:
+        """Invalidate catalog entries when the server announces their list changed"""
+        # pydantic-ai does not surface notifications; wrap the MCP client session's handler
+        client = getattr(self.server, "_client", None)
+        handler = getattr(client, "_message_handler", None)
+        if handler is None:
+            return
+
+        async def on_message(message: Any) -> None:
+            if isinstance(message, mcp_types.ServerNotification):
+                kind = LIST_CHANGED_NOTIFICATIONS.get(type(message.root))
+                if kind is not None:
+                    logger.info(f"MCP server '{self.name}' changed its {kind}")
+                    metrics.incr(f"mcp.catalog.invalidations.{kind}")
+                    self.invalidate_catalog(kind)
+            await handler(message)
+
+        client._message_handler = on_message
+
+    def describe(self) -> Dict[str, Any]:
+        """Details of the server for the API (env values are not exposed)"""
+        config = {key: value for key, value in self.config.items() if key not in ("env", "headers")}
+        if "url" in self.config:
+            config["headers"] = sorted(self.config.get("headers") or {})
+        else:
+            config["env"] = sorted(self.config.get("env") or {})
+        return {
+            "name": self.name,
+            "state": self.state,
+            "error": self.error,
+            "config": config,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "uptime": time.time() - self.started_at if self.state == RUNNING and self.started_at else None,
+            "stats": self.stats.to_dict(),
+            "probe_latency": self.probe_latency,
+            "last_probe_at": self.last_probe_at,
+            "restarts": self.restarts,
+            "last_error": self.last_error,
+            "catalog": {kind: len(self.catalog[kind]) for kind in CATALOG_KINDS if kind in self.catalog},
+            "pool": self.pool.describe() if self.pool is not None else None,
+        }
+
+    async def _run(self) -> None:
+        try:
+            if self._prepare is not None:
+                await self._prepare(self.server)
+            # Same-task timeout: the server's context must be exited by the task that entered it
+            async with asyncio.timeout(self.startup_timeout):
+                await self.server.__aenter__()
+        except asyncio.CancelledError:
+            if not self._stop.is_set():
+                raise
+            await self._set_state(STOPPED)
+            return
+        except TimeoutError:
+            await self._set_state(FAILED, f"did not start within {self.startup_timeout}s")
+            return
+        except Exception as e:
+            await self._set_state(FAILED, describe_error(e))
+            return
+
+        self.started_at = time.time()
+        self.last_used = asyncio.get_running_loop().time()
+        # A new process may offer different tools
+        self.invalidate_catalog()
+        self._watch_list_changes()
+        # Reopen the pool before waiters see the server running
+        if self.pool is not None:
+            self.pool.ensure_min()
+        await self._set_state(RUNNING)
+        try:
+            await self._stop.wait()
+        finally:
+            try:
+                await self.server.__aexit__(None, None, None)
+            finally:
+                self.state = STOPPED
+
+    async def _set_state(self, state: str, error: Optional[str] = None) -> None:
+        self.state = state
+        self.error = error
+        if error is not None:
+            self.last_error = error
+        self._settled.set()
+        if state == FAILED:
+            logger.error(f"Failed to start MCP server '{self.name}': {error}")
+        elif state == RUNNING:
+            logger.info(f"Started MCP server: {self.name}")
+        if self._on_state_change is not None:
+            try:
+                await self._on_state_change(self)
+            except Exception as e:
+                logger.error(f"Error handling state change of MCP server '{self.name}': {e}", exc_info=True)
+
+class ServerRegistry:
+    """Server handles by configured name, also looked up by server instance"""
+
+    def __init__(self):
+        self._handles: Dict[str, ServerHandle] = {}
+        # Handle by id() of its server instance
+        self._by_server: Dict[int, ServerHandle] = {}
+
+    def add(self, handle: ServerHandle) -> None:
+        """Register a handle, replacing any handle of the same name"""
+        self.remove(handle.name)
+        self._handles[handle.name] = handle
+        if handle.server is not None:
+            self._by_server[id(handle.server)] = handle
+
+    def remove(self, name: str) -> Optional[ServerHandle]:
+        """Unregister and return the handle of a server"""
+        handle = self._handles.pop(name, None)
+        if handle is not None and handle.server is not None:
+            self._by_server.pop(id(handle.server), None)
+        return handle
+
+    def clear(self) -> List[ServerHandle]:
+        """Unregister and return every handle"""
+        handles = list(self._handles.values())
+        self._handles = {}
+        self._by_server = {}
+        return handles
+
+    def get(self, name: str) -> Optional[ServerHandle]:
+        return self._handles.get(name)
+
+    def for_server(self, server: Any) -> Optional[ServerHandle]:
+        """Get the handle owning a server instance"""
+        return self._by_server.get(id(server))
+
+    def configs(self) -> Dict[str, Dict[str, Any]]:
+        """Server configurations by name"""
+        return {name: handle.config for name, handle in self._handles.items()}
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._handles
+
+    def __iter__(self) -> Iterator[ServerHandle]:
+        return iter(list(self._handles.values()))
+
+    def __len__(self) -> int:
+        return len(self._handles)
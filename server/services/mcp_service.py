@@ -6,15 +6,84 @@ Global MCP Manager - Centralized MCP server lifecycle management
 import asyncio
 import logging
 import os
-from typing import List, Dict, Any, Optional
-from contextlib import AsyncExitStack
+import time
+from contextlib import asynccontextmanager
+from functools import partial
+from typing import List, Dict, Any, AsyncIterator, Optional, Callable, Awaitable
 
-from pydantic_ai.mcp import MCPServerStdio
+import httpx
+from pydantic_ai.mcp import MCPServer, MCPServerSSE, MCPServerStdio, MCPServerStreamableHTTP
 from core.config import config_manager, ConfigChangeEvent
 from core.exceptions import MCPServerError
+from core.metrics import metrics
+from services.mcp_launcher import launch_cache
+from services.mcp_registry import (
+    ServerHandle, ServerPool, ServerRegistry, DEFAULT_STDIO_CONCURRENCY, STARTING, RUNNING, FAILED, IDLE
+)
 
 logger = logging.getLogger(__name__)
 
+# How often the supervisor checks servers and publishes state transitions
+SUPERVISOR_INTERVAL = 5.0
+# Seconds between protocol pings of a running server, and how long a ping may take
+PROBE_INTERVAL = 15.0
+PROBE_TIMEOUT = 5.0
+# Consecutive failed pings after which a server is considered dead
+PROBE_FAILURE_THRESHOLD = 2
+# Restart delay doubles per recent restart, from the base up to the maximum
+RESTART_BACKOFF_BASE = 1.0
+RESTART_BACKOFF_MAX = 60.0
+# Restarts within the window after which a crash-looping server is given up on
+CRASH_LOOP_LIMIT = 5
+CRASH_LOOP_WINDOW = 300.0
+# Seconds a tool call may run unless the server config or settings override it
+DEFAULT_TOOL_TIMEOUT = 300.0
+# Server config keys that only take effect when the server process is restarted
+PROCESS_CONFIG_KEYS = (
+    "command", "args", "env", "preinstall", "url", "transport", "headers", "timeout", "read_timeout",
+    "lazy", "stateless", "pool"
+)
+# Transports of url-based servers
+HTTP_TRANSPORTS = ("streamable-http", "sse")
+# Seconds an HTTP request to a url-based server may take to connect and respond, and
+# how long an open stream may go without a message, unless the server config overrides them
+DEFAULT_HTTP_TIMEOUT = 5.0
+DEFAULT_HTTP_READ_TIMEOUT = 300.0
+# Connections kept to url-based servers, shared by all of them
+HTTP_MAX_CONNECTIONS = 64
+HTTP_MAX_KEEPALIVE_CONNECTIONS = 16
+HTTP_KEEPALIVE_EXPIRY = 30.0
+
+def http_transport(config: Dict[str, Any]) -> str:
+    """Transport of a url-based server: explicit, or SSE for URLs ending in /sse"""
+    if "transport" in config:
+        return config["transport"]
+    return "sse" if config["url"].rstrip("/").endswith("/sse") else "streamable-http"
+
+class SharedHTTPTransport(httpx.AsyncBaseTransport):
+    """
+    Connection pool shared by the HTTP clients of all url-based servers.
+    The MCP client closes its HTTP client when a server stops; closing this
+    transport is a no-op so the pooled keep-alive connections survive
+    server restarts. The pool itself is closed by close_pool().
+    """
+
+    def __init__(self):
+        self._pool = httpx.AsyncHTTPTransport(limits=httpx.Limits(
+            max_connections=HTTP_MAX_CONNECTIONS,
+            max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=HTTP_KEEPALIVE_EXPIRY,
+        ))
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        return await self._pool.handle_async_request(request)
+
+    async def aclose(self) -> None:
+        pass
+
+    async def close_pool(self) -> None:
+        await self._pool.aclose()
+
 class GlobalMCPManager:
     """
     Global MCP server manager that handles the lifecycle of all MCP servers.
@@ -23,17 +92,25 @@ class GlobalMCPManager:
     
     _instance: Optional['GlobalMCPManager'] = None
     _lock = asyncio.Lock()
+    # Callbacks receiving {server_name: state or None} for servers whose state changed
+    _state_observers: List[Callable[[Dict[str, Optional[Dict[str, Any]]]], Awaitable[None]]] = []
     
     def __init__(self):
-        self.servers: List[MCPServerStdio] = []
-        self.server_configs: Dict[str, Dict[str, Any]] = {}
-        self._exit_stack: Optional[AsyncExitStack] = None
+        # Configured servers by name
+        self.registry = ServerRegistry()
         self._initialized = False
         self._initialization_lock = asyncio.Lock()
         
         # Runtime toggles - servers that are configured but disabled
         self.disabled_servers: set[str] = set()
         
+        # Last published server states, used to detect transitions
+        self._last_states: Dict[str, Dict[str, Any]] = {}
+        self._monitor_task: Optional[asyncio.Task] = None
+        
+        # Keep-alive connections of url-based servers, created with the first one
+        self._http_transport: Optional[SharedHTTPTransport] = None
+        
         # Register for configuration changes
         config_manager.add_observer(self._on_config_change)
     
@@ -47,8 +124,14 @@ class GlobalMCPManager:
                     await cls._instance.initialize()
         return cls._instance
     
+    @classmethod
+    def get_existing(cls) -> Optional['GlobalMCPManager']:
+        """Get the singleton instance if it has been created, without initializing it"""
+        return cls._instance
+    
     async def initialize(self) -> None:
-        """Initialize the MCP manager with current configuration"""
+        """Initialize the MCP manager with current configuration.
+        Servers start in the background; see is_ready() and wait_until_ready()."""
         async with self._initialization_lock:
             if self._initialized:
                 return
@@ -63,6 +146,9 @@ class GlobalMCPManager:
                 # Start MCP servers
                 await self._start_servers(mcp_servers_config)
                 
+                # Probe servers and restart the ones that die between explicit lifecycle changes
+                self._monitor_task = asyncio.create_task(self._supervise())
+                
                 self._initialized = True
                 logger.info("Global MCP Manager initialized successfully")
                 
@@ -70,156 +156,325 @@ class GlobalMCPManager:
                 logger.error(f"Failed to initialize Global MCP Manager: {e}", exc_info=True)
                 raise MCPServerError(f"MCP Manager initialization failed: {e}")
     
-    async def _start_servers(self, mcp_servers_config: Dict[str, Dict[str, Any]]) -> None:
-        """Start MCP servers based on configuration"""
+    async def _start_servers(self, mcp_servers_config: Dict[str, Dict[str, Any]], wait: bool = False) -> None:
+        """Start MCP servers concurrently based on configuration, waiting for them to settle if wait=True"""
         # Stop existing servers first
         await self._stop_servers()
         
-        self.servers = []
-        self.server_configs = mcp_servers_config.copy()
-        
         if not mcp_servers_config:
             logger.info("No MCP servers configured")
+            await self._publish_state_changes()
             return
         
-        # Initialize exit stack for server lifecycle management
-        self._exit_stack = AsyncExitStack()
-        
         for server_name, config in mcp_servers_config.items():
-            try:
-                # Expand environment variables in args
-                expanded_args = []
-                if "args" in config:
-                    for arg in config["args"]:
-                        if isinstance(arg, str):
-                            expanded_args.append(os.path.expandvars(arg))
-                        else:
-                            expanded_args.append(arg)
-                
-                # Create MCP server instance
-                server = MCPServerStdio(
-                    config["command"],
-                    args=expanded_args,
-                    env=config.get("env"),
-                    # Note: process_tool_call will be set by individual agents
-                )
-                
-                # Start the server
-                await self._exit_stack.enter_async_context(server)
-                self.servers.append(server)
-                
-                logger.info(f"Started MCP server: {server_name}")
-                
-            except Exception as e:
-                logger.error(f"Failed to start MCP server '{server_name}': {e}", exc_info=True)
-                # Continue starting other servers instead of failing completely
-                continue
+            self._launch_server(server_name, config)
+        
+        logger.info(f"Starting {len(self.registry)} MCP servers")
+        await self._publish_state_changes()
+        if wait:
+            await self.wait_until_ready()
+    
+    async def _reconfigure_servers(self, mcp_servers_config: Dict[str, Dict[str, Any]], wait: bool = False) -> None:
+        """
+        Apply a new server configuration incrementally.
+        Only removed servers and servers whose process settings changed are
+        stopped, and only added, changed and previously failed servers are
+        started; the others keep running with their limits updated in place.
+        """
+        old_configs = self.registry.configs()
+        removed = [name for name in old_configs if name not in mcp_servers_config]
+        added = [name for name in mcp_servers_config if name not in old_configs]
+        restarted = [
+            name for name, config in mcp_servers_config.items()
+            if name in old_configs and (
+                any(old_configs[name].get(key) != config.get(key) for key in PROCESS_CONFIG_KEYS)
+                # Give servers that failed to start another chance
+                or self.registry.get(name).state == FAILED
+            )
+        ]
+        logger.info(
+            f"Reconfiguring MCP servers: added {added or 'none'}, removed {removed or 'none'}, "
+            f"restarted {restarted or 'none'}"
+        )
         
-        logger.info(f"Started {len(self.servers)} MCP servers successfully")
+        # Stop removed and changed servers together
+        stopping = [self.registry.remove(name) for name in removed + restarted]
+        await asyncio.gather(*(handle.stop() for handle in stopping))
+        for name in removed:
+            self.disabled_servers.discard(name)
+        
+        for name, config in mcp_servers_config.items():
+            if name in added or name in restarted:
+                self._launch_server(name, config)
+            else:
+                self.registry.get(name).update_config(config)
+        
+        await self._publish_state_changes()
+        if wait:
+            await self.wait_until_ready()
+    
+    def _launch_server(self, server_name: str, config: Dict[str, Any], previous: Optional[ServerHandle] = None) -> None:
+        """Create a server, register its handle and start it (replacing previous when restarting)"""
+        try:
+            server = self._create_server(config)
+            error = None
+        except Exception as e:
+            logger.error(f"Failed to create MCP server '{server_name}': {e}", exc_info=True)
+            # Keep it registered as failed and continue with the other servers
+            server, error = None, str(e) or type(e).__name__
+        
+        handle = ServerHandle(
+            server_name, config, server, self._on_handle_state_change, error,
+            create_server=partial(self._create_server, config),
+            prepare=self._prepare_server if "url" not in config and config.get("preinstall", True) else None
+        )
+        if previous is not None:
+            handle.inherit(previous)
+        self.registry.add(handle)
+        handle.start()
+    
+    def _create_server(self, config: Dict[str, Any]) -> MCPServer:
+        """Create an MCP server instance from its configuration"""
+        if "url" in config:
+            return self._create_http_server(config)
+        
+        # Expand environment variables in args
+        expanded_args = []
+        if "args" in config:
+            for arg in config["args"]:
+                if isinstance(arg, str):
+                    expanded_args.append(os.path.expandvars(arg))
+                else:
+                    expanded_args.append(arg)
+        
+        # Spawn npx-launched packages from their local install when it is ready
+        command = config["command"]
+        if config.get("preinstall", True):
+            command, expanded_args = launch_cache.lookup(command, expanded_args) or (command, expanded_args)
+        
+        return MCPServerStdio(
+            command,
+            args=expanded_args,
+            env=config.get("env"),
+            # Note: process_tool_call is set when an agent is built for the server
+        )
+    
+    async def _prepare_server(self, server: MCPServerStdio) -> None:
+        """Install the package of an npx-launched server once and point the server at its entry point"""
+        if not isinstance(server, MCPServerStdio):
+            return
+        try:
+            resolved = await launch_cache.ensure_installed(server.command, list(server.args))
+        except Exception as e:
+            logger.warning(f"Could not install the package of `{server.command} {' '.join(server.args)}`, launching it with npx: {e}")
+            return
+        if resolved is not None:
+            server.command, server.args = resolved
+    
+    async def refresh_server_package(self, server_name: str) -> Dict[str, str]:
+        """Update an npx-launched server's package to the version its command asks for, then restart it"""
+        handle = self.registry.get(server_name)
+        if handle is None:
+            raise MCPServerError(f"MCP server '{server_name}' not found")
+        if "url" in handle.config:
+            raise MCPServerError(f"MCP server '{server_name}' is not launched from a package")
+        args = [os.path.expandvars(arg) for arg in handle.config.get("args", [])]
+        package, version = await launch_cache.refresh(handle.config["command"], args)
+        
+        logger.info(f"Restarting MCP server '{server_name}' on {package}@{version}")
+        self.registry.remove(server_name)
+        await handle.stop()
+        self._launch_server(server_name, handle.config, previous=handle)
+        await self._publish_state_changes()
+        await self.registry.get(server_name).wait_settled()
+        return {"package": package, "version": version}
+    
+    def _create_http_server(self, config: Dict[str, Any]) -> MCPServer:
+        """Create a client of a running streamable-HTTP or SSE server, pooling its connections"""
+        if self._http_transport is None:
+            self._http_transport = SharedHTTPTransport()
+        timeout = config.get("timeout", DEFAULT_HTTP_TIMEOUT)
+        read_timeout = config.get("read_timeout", DEFAULT_HTTP_READ_TIMEOUT)
+        # Headers are set on the client, as pydantic-ai accepts headers or a client but not both
+        http_client = httpx.AsyncClient(
+            transport=self._http_transport,
+            headers={name: os.path.expandvars(value) for name, value in (config.get("headers") or {}).items()},
+            timeout=httpx.Timeout(timeout, read=read_timeout),
+        )
+        server_class = MCPServerSSE if http_transport(config) == "sse" else MCPServerStreamableHTTP
+        return server_class(
+            config["url"],
+            http_client=http_client,
+            timeout=timeout,
+            read_timeout=read_timeout,
+            # Note: process_tool_call is set when an agent is built for the server
+        )
+    
+    async def _on_handle_state_change(self, handle: ServerHandle) -> None:
+        """Publish a server becoming ready or failing to start"""
+        if self.registry.get(handle.name) is handle:
+            await self._publish_state_changes()
+    
+    async def wait_until_ready(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every server is running or has failed to start.
+        Returns False if the timeout expired first."""
+        handles = list(self.registry)
+        if not handles:
+            return True
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(handle.wait_settled() for handle in handles)),
+                timeout=timeout
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+    
+    def is_ready(self) -> bool:
+        """Whether the manager is initialized and no server is still starting"""
+        return self._initialized and all(handle.state != STARTING for handle in self.registry)
     
     async def _stop_servers(self) -> None:
         """Stop all MCP servers"""
-        if self._exit_stack:
-            try:
-                await self._exit_stack.aclose()
-                logger.info("Stopped all MCP servers")
-            except Exception as e:
-                logger.error(f"Error stopping MCP servers: {e}", exc_info=True)
-            finally:
-                self._exit_stack = None
-        
-        self.servers = []
-        self.server_configs = {}
+        handles = self.registry.clear()
+        if handles:
+            await asyncio.gather(*(handle.stop() for handle in handles))
+            logger.info("Stopped all MCP servers")
     
     async def _on_config_change(self, event: ConfigChangeEvent) -> None:
-        """Handle configuration changes - restart servers only if MCP config changed"""
+        """Handle configuration changes - reconfigure only the MCP servers that changed"""
         if "mcp_servers" not in event.changed_keys:
             logger.info("Configuration changed but MCP servers config unchanged, no restart needed")
             return
         
-        logger.info("MCP servers configuration changed, restarting servers")
+        logger.info("MCP servers configuration changed, applying changes")
         
         try:
             # Get new MCP configuration
-            new_mcp_config = event.new_values.get("mcp_servers", {})
+            new_mcp_config = event.new_values.get("mcp_servers") or {}
             
-            # Restart servers with new configuration
-            await self._start_servers(new_mcp_config)
+            # Start, stop or restart only the servers whose configuration changed; servers report
+            # their own readiness, so a settings save does not wait for them to start
+            await self._reconfigure_servers(new_mcp_config)
             
-            logger.info("MCP servers restarted successfully after configuration change")
+            logger.info("MCP servers reconfigured after configuration change")
             
         except Exception as e:
-            logger.error(f"Failed to restart MCP servers after configuration change: {e}", exc_info=True)
+            logger.error(f"Failed to reconfigure MCP servers after configuration change: {e}", exc_info=True)
             # Try to restore previous state
             try:
-                old_mcp_config = event.old_values.get("mcp_servers", {})
+                old_mcp_config = event.old_values.get("mcp_servers") or {}
                 await self._start_servers(old_mcp_config)
                 logger.info("Restored previous MCP server configuration after failure")
             except Exception as restore_error:
                 logger.error(f"Failed to restore previous MCP configuration: {restore_error}", exc_info=True)
                 raise MCPServerError("Failed to restart MCP servers and could not restore previous state")
     
-    def get_servers(self) -> List[MCPServerStdio]:
-        """Get the list of active MCP servers"""
-        return self.servers.copy()
+    def get_servers(self) -> List[MCPServer]:
+        """Get the list of running MCP servers"""
+        return [handle.server for handle in self.registry if handle.state == RUNNING]
     
     def get_server_configs(self) -> Dict[str, Dict[str, Any]]:
         """Get the current server configurations"""
-        return self.server_configs.copy()
+        return self.registry.configs()
     
-    def get_enabled_servers(self) -> List[MCPServerStdio]:
-        """Get the list of enabled (not disabled) MCP servers"""
-        if not self.server_configs:
-            return []
-        
-        enabled_servers = []
-        for i, server in enumerate(self.servers):
-            # Map server index to server name (we need to track this better)
-            server_names = list(self.server_configs.keys())
-            if i < len(server_names):
-                server_name = server_names[i]
-                if server_name not in self.disabled_servers:
-                    enabled_servers.append(server)
-        
-        return enabled_servers
+    def get_enabled_servers(self) -> List[MCPServer]:
+        """Get the list of enabled (not disabled) running MCP servers"""
+        return [
+            handle.server for handle in self.registry
+            if handle.state == RUNNING and handle.name not in self.disabled_servers
+        ]
+    
+    def get_enabled_handles(self) -> List[ServerHandle]:
+        """Get the handles of enabled servers agents can use: running servers and lazy servers not failed"""
+        return [
+            handle for handle in self.registry
+            if handle.name not in self.disabled_servers and (
+                handle.state == RUNNING or (handle.lazy and handle.state in (IDLE, STARTING))
+            )
+        ]
+    
+    def get_server(self, server_name: str) -> Optional[ServerHandle]:
+        """Get the handle of a configured server"""
+        return self.registry.get(server_name)
+    
+    def get_server_name(self, server: MCPServer) -> Optional[str]:
+        """Get the configured name of a running server"""
+        handle = self.registry.for_server(server)
+        return handle.name if handle is not None else None
+    
+    def get_server_semaphore(self, server_name: str) -> asyncio.Semaphore:
+        """Get the semaphore bounding concurrent tool calls on a server"""
+        handle = self.registry.get(server_name)
+        if handle is None:
+            # Not (or no longer) configured; do not share a limit with other servers
+            return asyncio.Semaphore(DEFAULT_STDIO_CONCURRENCY)
+        return handle.semaphore
+    
+    @asynccontextmanager
+    async def use_server(self, server_name: Optional[str]) -> AsyncIterator[None]:
+        """Keep a server running for an approved tool call, starting it first if it is lazy"""
+        handle = self.registry.get(server_name) if server_name is not None else None
+        if handle is None:
+            yield
+            return
+        async with handle.in_use():
+            yield
+    
+    @asynccontextmanager
+    async def acquire_server(self, server_name: Optional[str], call_tool: Callable[..., Awaitable[Any]]) -> AsyncIterator[Callable[..., Awaitable[Any]]]:
+        """Wait for a free slot on a server (or its least-loaded pool instance) and yield the call function"""
+        handle = self.registry.get(server_name) if server_name is not None else None
+        if handle is None:
+            yield call_tool
+            return
+        async with handle.acquire(call_tool) as acquired:
+            yield acquired
+    
+    async def get_tool_timeout(self, server_name: str, tool_name: str) -> float:
+        """Get the execution deadline for a tool: per-tool, then per-server, then global setting"""
+        handle = self.registry.get(server_name)
+        config = handle.config if handle is not None else {}
+        tool_timeouts = config.get("tool_timeouts", {})
+        if tool_name in tool_timeouts:
+            return tool_timeouts[tool_name]
+        if "tool_timeout" in config:
+            return config["tool_timeout"]
+        return await config_manager.get_value("tool_timeout", DEFAULT_TOOL_TIMEOUT)
+    
+    def get_cache_ttl(self, server_name: Optional[str], tool_name: str) -> Optional[float]:
+        """Get the result cache TTL of a tool, or None unless its server config opts it in"""
+        handle = self.registry.get(server_name) if server_name is not None else None
+        if handle is None:
+            return None
+        return handle.config.get("cache_tools", {}).get(tool_name)
+    
+    def record_tool_call(self, server_name: Optional[str], latency: float, outcome: str = "ok") -> None:
+        """Add a finished tool call to its server's stats"""
+        handle = self.registry.get(server_name) if server_name is not None else None
+        if handle is not None:
+            handle.stats.record_call(latency, outcome)
     
     def get_server_states(self) -> Dict[str, Dict[str, Any]]:
         """Get current states of all configured MCP servers"""
         states = {}
         
-        # Get list of server names in the same order as servers list
-        server_names = list(self.server_configs.keys())
-        
-        for i, server_name in enumerate(server_names):
-            is_configured = True
-            is_enabled = server_name not in self.disabled_servers
-            is_running = False
-            
-            # Check if corresponding server is running
-            if i < len(self.servers):
-                server = self.servers[i]
-                try:
-                    # Check if the server process is alive
-                    if hasattr(server, '_process') and server._process:
-                        is_running = server._process.returncode is None
-                    else:
-                        # If no process attribute, assume running if server exists
-                        is_running = True
-                except Exception as e:
-                    logger.error(f"Error checking server {server_name} status: {e}")
-                    is_running = False
-            
-            states[server_name] = {
-                "configured": is_configured,
+        for handle in self.registry:
+            is_enabled = handle.name not in self.disabled_servers
+            states[handle.name] = {
+                "configured": True,
                 "enabled": is_enabled,
-                "running": is_running and is_enabled  # Only show as running if enabled
+                "running": handle.state == RUNNING and is_enabled,  # Only show as running if enabled
+                "state": handle.state,
+                "error": handle.error,
+                "restarts": handle.restarts
             }
         
         return states
     
     async def toggle_server(self, server_name: str, enabled: bool) -> bool:
         """Toggle an individual MCP server on/off"""
-        if server_name not in self.server_configs:
+        if server_name not in self.registry:
             logger.error(f"Server '{server_name}' not found in configuration")
             return False
         
@@ -233,6 +488,7 @@ class GlobalMCPManager:
                 self.disabled_servers.add(server_name)
                 logger.info(f"Disabled MCP server: {server_name}")
             
+            await self._publish_state_changes()
             return True
             
         except Exception as e:
@@ -246,31 +502,129 @@ class GlobalMCPManager:
         try:
             config = await config_manager.load_config()
             mcp_servers_config = config.get("mcp_servers", {})
-            await self._start_servers(mcp_servers_config)
+            await self._start_servers(mcp_servers_config, wait=True)
             logger.info("MCP servers restarted successfully")
             
         except Exception as e:
             logger.error(f"Failed to restart MCP servers: {e}", exc_info=True)
             raise MCPServerError(f"Failed to restart MCP servers: {e}")
     
-    async def health_check(self) -> Dict[str, bool]:
-        """Perform health check on all MCP servers"""
-        health_status = {}
+    @classmethod
+    def add_state_observer(cls, callback: Callable[[Dict[str, Optional[Dict[str, Any]]]], Awaitable[None]]) -> None:
+        """Add an observer for server state transitions"""
+        cls._state_observers.append(callback)
+    
+    @classmethod
+    def remove_state_observer(cls, callback: Callable[[Dict[str, Optional[Dict[str, Any]]]], Awaitable[None]]) -> None:
+        """Remove an observer for server state transitions"""
+        if callback in cls._state_observers:
+            cls._state_observers.remove(callback)
+    
+    async def _publish_state_changes(self) -> None:
+        """Notify observers of servers whose state changed since the last publish"""
+        states = self.get_server_states()
+        changes: Dict[str, Optional[Dict[str, Any]]] = {
+            name: state for name, state in states.items()
+            if self._last_states.get(name) != state
+        }
+        for name in self._last_states.keys() - states.keys():
+            changes[name] = None  # Server removed from configuration
+        self._last_states = states
         
-        for i, server in enumerate(self.servers):
-            server_name = f"server_{i}"  # We don't have names in the server objects
+        if not changes:
+            return
+        logger.info(f"MCP server state changed: {', '.join(changes)}")
+        for observer in list(self._state_observers):
             try:
-                # Simple health check - just verify the server process is alive
-                # More sophisticated health checks could be added here
-                if hasattr(server, '_process') and server._process:
-                    health_status[server_name] = server._process.returncode is None
-                else:
-                    health_status[server_name] = False
+                await observer(changes)
             except Exception as e:
-                logger.error(f"Health check failed for {server_name}: {e}")
-                health_status[server_name] = False
+                logger.error(f"Error notifying MCP state observer: {e}", exc_info=True)
+    
+    async def _supervise(self) -> None:
+        """Periodically check every server and publish state transitions"""
+        while True:
+            await asyncio.sleep(SUPERVISOR_INTERVAL)
+            try:
+                handles = list(self.registry)
+                await asyncio.gather(*(self._supervise_server(handle) for handle in handles))
+                await self._publish_state_changes()
+            except Exception as e:
+                logger.error(f"Error supervising MCP servers: {e}", exc_info=True)
+    
+    async def _supervise_pool(self, pool: ServerPool, now: float) -> None:
+        """Probe the extra instances of a pooled server and replace those that stopped answering"""
+        async def check(instance) -> None:
+            if instance.last_probe_at is not None and now - instance.last_probe_at < PROBE_INTERVAL:
+                return
+            if not await instance.probe(PROBE_TIMEOUT) and instance.probe_failures >= PROBE_FAILURE_THRESHOLD:
+                await pool.replace(instance)
         
-        return health_status
+        await asyncio.gather(*(check(instance) for instance in list(pool.instances) if instance.state == RUNNING))
+    
+    async def _supervise_server(self, handle: ServerHandle) -> None:
+        """Probe a running server and restart it with backoff once it is found dead"""
+        loop = asyncio.get_running_loop()
+        now = loop.time()
+        
+        if handle.is_idle_expired(now):
+            await handle.stop_idle()
+            return
+        if handle.pool is not None:
+            await self._supervise_pool(handle.pool, now)
+            await handle.pool.scale_down(now)
+        
+        if handle.state == RUNNING and handle.down_since is None:
+            if not handle.is_alive:
+                handle.last_error = handle.last_error or "server exited"
+            elif handle.last_probe_at is None or time.time() - handle.last_probe_at >= PROBE_INTERVAL:
+                if await handle.probe(PROBE_TIMEOUT) or handle.probe_failures < PROBE_FAILURE_THRESHOLD:
+                    return
+            else:
+                return
+            logger.warning(f"MCP server '{handle.name}' is down: {handle.last_error}")
+            handle.down_since = now
+        elif handle.state == FAILED and handle.server is not None and handle.down_since is None:
+            # Failed to start; retried like a crash (servers that cannot be created are not)
+            handle.down_since = now
+        
+        if handle.down_since is None or handle.gave_up:
+            return
+        
+        # Give up on servers that keep dying instead of restarting them forever
+        while handle.restart_times and now - handle.restart_times[0] > CRASH_LOOP_WINDOW:
+            handle.restart_times.popleft()
+        if len(handle.restart_times) >= CRASH_LOOP_LIMIT:
+            handle.gave_up = True
+            # Release what is left of the server before marking it failed
+            await handle.stop()
+            handle.state = FAILED
+            handle.error = (
+                f"crash loop: restarted {len(handle.restart_times)} times in {CRASH_LOOP_WINDOW:.0f}s "
+                f"(last error: {handle.last_error})"
+            )
+            logger.error(f"Not restarting MCP server '{handle.name}': {handle.error}")
+            return
+        
+        delay = min(RESTART_BACKOFF_BASE * 2 ** len(handle.restart_times), RESTART_BACKOFF_MAX)
+        if now - handle.down_since < delay:
+            return
+        await self._restart_server(handle)
+    
+    async def _restart_server(self, handle: ServerHandle) -> None:
+        """Replace a dead server with a fresh instance, keeping its history"""
+        if self.registry.get(handle.name) is not handle:
+            return
+        logger.info(f"Restarting MCP server '{handle.name}' (restart {handle.restarts + 1})")
+        self.registry.remove(handle.name)
+        await handle.stop()
+        handle.restarts += 1
+        handle.restart_times.append(asyncio.get_running_loop().time())
+        metrics.incr("mcp.server_restarts")
+        self._launch_server(handle.name, handle.config, previous=handle)
+    
+    async def health_check(self) -> Dict[str, bool]:
+        """Perform health check on all MCP servers"""
+        return {handle.name: handle.state == RUNNING for handle in self.registry}
     
     async def shutdown(self) -> None:
         """Shutdown the MCP manager and all servers"""
@@ -279,8 +633,16 @@ class GlobalMCPManager:
         # Unregister from configuration changes
         config_manager.remove_observer(self._on_config_change)
         
+        if self._monitor_task:
+            self._monitor_task.cancel()
+            self._monitor_task = None
+        
         # Stop all servers
         await self._stop_servers()
+        await self._publish_state_changes()
+        if self._http_transport is not None:
+            await self._http_transport.close_pool()
+            self._http_transport = None
         
         self._initialized = False
         logger.info("Global MCP Manager shutdown complete")
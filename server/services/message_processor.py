@@ -4,7 +4,7 @@ Message Stream Processor - Handles processing of AI agent response events
 """
 
 import logging
-from typing import Dict
+from typing import Dict, Tuple
 
 from pydantic_ai import Agent
 from pydantic_ai.messages import (
@@ -16,19 +16,21 @@ from pydantic_ai.messages import (
     TextPartDelta,
     ThinkingPart,
     ThinkingPartDelta,
+    ToolCallPart,
     ToolCallPartDelta,
 )
 
-from core.messaging import WebSocketMessenger
+from core.config import config_manager
+from services.event_pipeline import EventPipeline
 from services.tool_approval import ToolApprovalManager
 
 logger = logging.getLogger(__name__)
 
 class MessageStreamProcessor:
-    """Processes AI agent response events and coordinates with other components"""
+    """Normalizes AI agent response events and emits them into the session's event pipeline"""
     
-    def __init__(self, messenger: WebSocketMessenger, approval_manager: ToolApprovalManager):
-        self.messenger = messenger
+    def __init__(self, events: EventPipeline, approval_manager: ToolApprovalManager):
+        self.events = events
         self.approval_manager = approval_manager
     
     async def process_agent_stream(self, run):
@@ -59,47 +61,80 @@ class MessageStreamProcessor:
                     logger.info("Processing end node - conversation complete")
                     # Only send final complete if not already sent during model streaming
                     if not getattr(self, '_sent_complete', False):
-                        await self.messenger.send_assistant_complete()
+                        await self.events.emit("assistant_complete")
                         self._sent_complete = True
                 else:
                     logger.warning(f"Unknown node type: {type(node).__name__}")
                     
         except Exception as e:
             logger.error(f"Error processing agent stream: {e}", exc_info=True)
-            await self.messenger.send_error(f"Error processing message: {str(e)}")
+            await self.events.emit("error", message=f"Error processing message: {str(e)}")
+        finally:
+            # Drop early approvals for calls the agent never executed
+            self.approval_manager.discard_prefetched()
+            # Make sure every sink has seen the run before the caller moves on
+            await self.events.flush()
     
     async def _process_model_request(self, node, run):
         """Process model request node and stream text responses"""
         started = False
         thinking_started = False
+        # Tool calls being generated, by part index: (tool_call_id, tool_name)
+        tool_parts: Dict[int, Tuple[str, str]] = {}
+        # Raise approvals while the model is still generating the rest of the response
+        early_approval = await config_manager.get_value("early_tool_approval", False)
+        last_tool_index = None
         async with node.stream(run.ctx) as request_stream:
             async for event in request_stream:
+                # A new part means the previous tool call's arguments are complete
+                if early_approval and isinstance(event, PartStartEvent) and last_tool_index is not None and event.index != last_tool_index:
+                    self._prefetch_tool_approval(request_stream, last_tool_index)
+                    last_tool_index = None
+                
+                # Stream tool call arguments while the model is still generating them
+                if isinstance(event, PartStartEvent) and isinstance(event.part, ToolCallPart):
+                    if thinking_started:
+                        await self.events.emit("thinking_complete")
+                        thinking_started = False
+                    tool_parts[event.index] = (event.part.tool_call_id, event.part.tool_name)
+                    last_tool_index = event.index
+                    await self._emit_tool_args(event.part.tool_call_id, event.part.tool_name, event.part.args)
+                
+                elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, ToolCallPartDelta):
+                    if event.index in tool_parts:
+                        tool_call_id, tool_name = tool_parts[event.index]
+                        args = event.delta.args_delta
+                        if isinstance(args, dict):
+                            # Dict deltas are merged into the call; send the merged arguments
+                            args = request_stream.get().parts[event.index].args
+                        await self._emit_tool_args(tool_call_id, tool_name, args)
+                
                 # Handle thinking events
-                if isinstance(event, PartStartEvent) and isinstance(event.part, ThinkingPart):
+                elif isinstance(event, PartStartEvent) and isinstance(event.part, ThinkingPart):
                     logger.info(f"Thinking part start: {event.part.content[:100]}...")
-                    await self.messenger.send_thinking_start()
+                    await self.events.emit("thinking_start")
                     thinking_started = True
                     # Send initial thinking content if available
                     if event.part.content:
-                        await self.messenger.send_thinking_delta(event.part.content)
+                        await self.events.emit("thinking_delta", content=event.part.content)
                 
                 elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, ThinkingPartDelta):
                     # Stream thinking content to client
                     if event.delta.content_delta:
-                        await self.messenger.send_thinking_delta(event.delta.content_delta)
+                        await self.events.emit("thinking_delta", content=event.delta.content_delta)
                 
                 # Handle text events
                 elif isinstance(event, PartDeltaEvent) and isinstance(event.delta, TextPartDelta):
                     # If we were thinking and now getting text, complete thinking first
                     if thinking_started:
-                        await self.messenger.send_thinking_complete()
+                        await self.events.emit("thinking_complete")
                         thinking_started = False
                     
                     if not started:
-                        await self.messenger.send_assistant_start()
+                        await self.events.emit("assistant_start")
                         started = True
                     # Stream text to client
-                    await self.messenger.send_text_delta(event.delta.content_delta)
+                    await self.events.emit("text_delta", content=event.delta.content_delta)
                 
                 elif isinstance(event, PartStartEvent):
                     logger.info(f"Part start event: {event}")
@@ -107,52 +142,90 @@ class MessageStreamProcessor:
                     if hasattr(event.part, 'content') and not isinstance(event.part, ThinkingPart):
                         # If we were thinking and now getting text, complete thinking first
                         if thinking_started:
-                            await self.messenger.send_thinking_complete()
+                            await self.events.emit("thinking_complete")
                             thinking_started = False
                         
                         if not started:
-                            await self.messenger.send_assistant_start()
+                            await self.events.emit("assistant_start")
                             started = True
-                        await self.messenger.send_text_delta(event.part.content)
+                        await self.events.emit("text_delta", content=event.part.content)
                 
                 elif isinstance(event, FinalResultEvent):
                     logger.info(f"Final result event: {event}")
                     # Complete thinking if it was in progress
                     if thinking_started:
-                        await self.messenger.send_thinking_complete()
+                        await self.events.emit("thinking_complete")
                         thinking_started = False
+            
+            if early_approval and last_tool_index is not None:
+                self._prefetch_tool_approval(request_stream, last_tool_index)
         
         # Close any open bubbles
         if thinking_started:
-            await self.messenger.send_thinking_complete()
+            await self.events.emit("thinking_complete")
         if started:
-            await self.messenger.send_assistant_complete()
+            await self.events.emit("assistant_complete")
             # Mark that we've sent a completion for this run
             self._sent_complete = True
     
+    def _prefetch_tool_approval(self, request_stream, index: int):
+        """Start the approval of a tool call whose arguments have finished streaming"""
+        parts = request_stream.get().parts
+        if index >= len(parts) or not isinstance(parts[index], ToolCallPart):
+            return
+        part = parts[index]
+        try:
+            args = part.args_as_dict()
+        except Exception:
+            # Malformed arguments are rejected by validation; nothing to approve yet
+            return
+        self.approval_manager.prefetch_approval(part.tool_call_id, part.tool_name, args)
+    
+    async def _emit_tool_args(self, tool_call_id: str, tool_name: str, args):
+        """Emit a change to a tool call's arguments: JSON text to append (args_delta), or,
+        for models that stream arguments as dicts, all arguments so far replacing the previous ones (args)"""
+        if not args:
+            return
+        if isinstance(args, str):
+            await self.events.emit("tool_args_delta", tool_id=tool_call_id, tool_name=tool_name, args_delta=args)
+        else:
+            await self.events.emit("tool_args_delta", tool_id=tool_call_id, tool_name=tool_name, args=dict(args))
+    
     async def _process_tool_calls(self, node, run):
         """Process CallToolsNode - this handles both tool calls AND text-only responses"""
         tool_calls_pending = {}
         tool_session_started = False
+        # The approvals of calls run concurrently are sent as one batch; calls run
+        # one at a time cannot wait for the approvals of the calls after them
+        tool_calls = [part for part in node.model_response.parts if isinstance(part, ToolCallPart)]
+        batch_approvals = not run.ctx.deps.tool_manager.should_call_sequentially(tool_calls)
         
-        async with node.stream(run.ctx) as handle_stream:
-            logger.info("Processing CallToolsNode stream...")
-            async for event in handle_stream:
-                logger.info(f"Received event in CallToolsNode stream: {type(event).__name__}")
-                
-                if isinstance(event, FunctionToolCallEvent):
-                    # First tool call event - start tool session
-                    if not tool_session_started:
-                        await self.messenger.send_tool_session_start()
-                        tool_session_started = True
-                    await self._handle_tool_call_event(event, tool_calls_pending)
-                
-                elif isinstance(event, FunctionToolResultEvent):
-                    await self._handle_tool_result_event(event, tool_calls_pending)
+        try:
+            async with node.stream(run.ctx) as handle_stream:
+                logger.info("Processing CallToolsNode stream...")
+                async for event in handle_stream:
+                    logger.info(f"Received event in CallToolsNode stream: {type(event).__name__}")
+                    
+                    if isinstance(event, FunctionToolCallEvent):
+                        # First tool call event - start tool session
+                        if not tool_session_started:
+                            await self.events.emit("tool_session_start")
+                            tool_session_started = True
+                        # Every call is announced before any of them runs
+                        if batch_approvals:
+                            self.approval_manager.expect_call(event.part.tool_call_id)
+                        await self._handle_tool_call_event(event, tool_calls_pending)
+                    
+                    elif isinstance(event, FunctionToolResultEvent):
+                        # Calls rejected before reaching approval (e.g. invalid arguments) end here
+                        self.approval_manager.settle_call(event.tool_call_id)
+                        await self._handle_tool_result_event(event, tool_calls_pending)
+        finally:
+            self.approval_manager.settle_all()
         
         # Complete tool session if we started one
         if tool_session_started:
-            await self.messenger.send_tool_session_complete()
+            await self.events.emit("tool_session_complete")
         # If no tool events were yielded, this was a text-only response - no tool session needed
     
     async def _handle_tool_call_event(self, event: FunctionToolCallEvent, tool_calls_pending: Dict):
@@ -164,7 +237,7 @@ class MessageStreamProcessor:
         tool_calls_pending[tool_call_id] = {'name': tool_name, 'started': True}
         
         # Use new graph-aligned event with tool ID
-        await self.messenger.send_tool_start(tool_name, tool_call_id)
+        await self.events.emit("tool_start", tool_name=tool_name, tool_id=tool_call_id)
     
     async def _handle_tool_result_event(self, event: FunctionToolResultEvent, tool_calls_pending: Dict):
         """Handle a function tool result event - send result to UI based on content"""
@@ -185,10 +258,10 @@ class MessageStreamProcessor:
         
         # Only differentiate blocked tools, treat errors and successes the same
         if "Tool execution denied by user" in content:
-            await self.messenger.send_tool_blocked(tool_call_id, tool_name)
+            await self.events.emit("tool_blocked", tool_id=tool_call_id, tool_name=tool_name)
         else:
             # All tool executions (success or error) are treated the same
             if content:
-                await self.messenger.send_tool_complete(tool_call_id, tool_name, content)
+                await self.events.emit("tool_complete", tool_id=tool_call_id, tool_name=tool_name, content=content)
             else:
-                await self.messenger.send_tool_complete(tool_call_id, tool_name, "Tool executed (no output)")
+                await self.events.emit("tool_complete", tool_id=tool_call_id, tool_name=tool_name, content="Tool executed (no output)")
@@ -4,52 +4,221 @@ Tool Approval Manager - Handles tool execution approval workflow
 """
 
 import asyncio
+import secrets
 import uuid
 import logging
-from typing import Dict
+from typing import Any, Dict, List, Optional, Set, Tuple, Union
 
 from core.messaging import WebSocketMessenger
 from core.config import config_manager
+from services.approval_policy import ALLOW, DENY, REMEMBER_SCOPES, approval_policy, find_grant
+from services.event_pipeline import EventPipeline
 
 logger = logging.getLogger(__name__)
 
+# Pending approval and batch IDs across all sessions, so out-of-band endpoints can resolve them
+_approval_owners: Dict[str, "ToolApprovalManager"] = {}
+
+def _find_owner(request_id: str, token: Optional[str], conversation_id: Optional[str]) -> Optional["ToolApprovalManager"]:
+    """The session waiting on an approval or batch ID, if the caller is allowed to answer it"""
+    manager = _approval_owners.get(request_id)
+    if manager is None:
+        logger.warning(f"Received approval response for unknown ID: {request_id}")
+        return None
+    if not manager.authorizes(token, conversation_id):
+        logger.warning(f"Rejected approval response for {request_id}: not from its stream or conversation")
+        return None
+    return manager
+
+async def resolve_approval(approval_id: str, approved: bool, remember: Optional[str] = None, *,
+                           token: Optional[str] = None, conversation_id: Optional[str] = None) -> bool:
+    """Resolve a pending approval on behalf of its session's stream (token) or conversation.
+    Returns False if no session the caller may answer for is waiting on the given approval ID."""
+    manager = _find_owner(approval_id, token, conversation_id)
+    if manager is None:
+        return False
+    await manager.handle_approval_response(approval_id, approved, remember)
+    return True
+
+async def resolve_approval_batch(batch_id: str, approved: Optional[bool] = None,
+                                 decisions: Optional[Dict[str, bool]] = None,
+                                 remember: Optional[str] = None, *,
+                                 token: Optional[str] = None, conversation_id: Optional[str] = None) -> bool:
+    """Resolve the approvals of a batch at once. Per-call decisions override the bulk decision.
+    Returns False if no session the caller may answer for is waiting on the given batch ID."""
+    manager = _find_owner(batch_id, token, conversation_id)
+    if manager is None:
+        return False
+    await manager.handle_batch_response(batch_id, approved, decisions, remember)
+    return True
+
 class ToolApprovalManager:
     """Manages tool execution approval workflow"""
     
-    def __init__(self, messenger: WebSocketMessenger):
+    def __init__(self, messenger: Union[WebSocketMessenger, EventPipeline], auto_approve: Optional[bool] = None):
+        # Chat sessions pass their event pipeline so requests stay ordered with stream events
         self.messenger = messenger
         self.pending_approvals: Dict[str, asyncio.Future] = {}
+        # Per-session override of the auto_approve_tools setting (None = use settings)
+        self.auto_approve = auto_approve
+        # Approvals raised early from the model stream: tool_call_id -> (args, decision task)
+        self.prefetched: Dict[str, Tuple[dict, asyncio.Task]] = {}
+        # Tool calls of the model response being executed that have not asked or been decided yet;
+        # requests are held back until none is left, so the response's calls are sent as one batch
+        self._expected: Set[str] = set()
+        # Requests waiting for the rest of their batch, and sent batches by ID
+        self._outgoing: List[Dict[str, Any]] = []
+        self._flush_task: Optional[asyncio.Task] = None
+        self.batches: Dict[str, List[str]] = {}
+        self._batch_of: Dict[str, str] = {}
+        # (server, tool, tool_call_id) of each pending request, for remembering decisions
+        self._requests: Dict[str, Tuple[Optional[str], str, Optional[str]]] = {}
+        # Tools the user allowed for the rest of this session: {(server, tool)}
+        self.session_grants: Set[Tuple[Optional[str], str]] = set()
+        # Conversations this session granted tools for, forgotten when the session ends
+        self.granted_conversations: Set[str] = set()
+        # Calls whose approval was raised early, before their server was known
+        self._early_calls: Set[str] = set()
+        # Early approvals remembered "always", persisted once the call runs: tool_call_id -> tool
+        self._unresolved_always: Dict[str, str] = {}
+        # Conversation currently running, for conversation-scoped grants and observers' answers
+        self.conversation_id: Optional[str] = None
+        # Secret of the stream this session reports to; answers carrying it are from the session's own client
+        self.token = secrets.token_urlsafe(16)
+    
+    def authorizes(self, token: Optional[str], conversation_id: Optional[str]) -> bool:
+        """Whether an answer comes from this session's stream or an observer of its running conversation"""
+        if token is not None and secrets.compare_digest(token, self.token):
+            return True
+        return conversation_id is not None and conversation_id == self.conversation_id
+    
+    def expect_call(self, tool_call_id: str) -> None:
+        """Hold back approval requests until this call of the current model response has asked or been decided"""
+        self._expected.add(tool_call_id)
+    
+    def settle_call(self, tool_call_id: Optional[str]) -> None:
+        """Stop waiting for a call (asked, decided without asking, or finished) and send the batch once none is left"""
+        self._expected.discard(tool_call_id)
+        self._schedule_flush()
+    
+    def settle_all(self) -> None:
+        """Stop waiting for any call, e.g. once the model response's tool calls are done"""
+        self._expected.clear()
+        self._schedule_flush()
     
-    async def request_approval(self, tool_name: str, args: dict) -> bool:
-        """Request user approval for tool execution"""
+    def prefetch_approval(self, tool_call_id: str, tool_name: str, args: dict) -> None:
+        """Start the approval for a streamed tool call before the agent executes it.
+        The decision is consumed by request_approval with the same tool_call_id."""
+        if tool_call_id in self.prefetched:
+            return
+        logger.info(f"Prefetching approval for tool: {tool_name} ({tool_call_id})")
+        task = asyncio.create_task(self._request_approval(tool_name, args, tool_call_id, early=True))
+        self.prefetched[tool_call_id] = (args, task)
+        self._early_calls.add(tool_call_id)
+    
+    def discard_prefetched(self) -> int:
+        """Cancel early approvals that were never consumed (e.g. the call failed validation).
+        Returns the number of approvals discarded."""
+        discarded = 0
+        for _, task in self.prefetched.values():
+            if not task.done():
+                task.cancel()
+                discarded += 1
+        self.prefetched.clear()
+        self._early_calls.clear()
+        self._unresolved_always.clear()
+        return discarded
+    
+    async def request_approval(self, tool_name: str, args: dict, tool_call_id: Optional[str] = None,
+                               server_name: Optional[str] = None) -> bool:
+        """Request user approval for tool execution, reusing an early decision for the same call"""
+        prefetched = self.prefetched.pop(tool_call_id, None) if tool_call_id else None
+        if prefetched is not None:
+            prefetched_args, task = prefetched
+            if prefetched_args == args:
+                # Already asked on its own while the model was streaming
+                self.settle_call(tool_call_id)
+                decision = await task
+                self._early_calls.discard(tool_call_id)
+                await self._resolve_always_grant(tool_call_id, server_name)
+                if decision is not None:
+                    logger.info(f"Using early approval for tool: {tool_name} ({tool_call_id})")
+                    return decision
+                # The policy needed the server to decide
+            else:
+                # The user must approve the arguments that are actually executed
+                logger.warning(f"Arguments of {tool_call_id} changed since early approval, asking again")
+                task.cancel()
+                self._early_calls.discard(tool_call_id)
+                self._unresolved_always.pop(tool_call_id, None)
+        return await self._request_approval(tool_name, args, tool_call_id, server_name)
+    
+    def policy_decision(self, server_name: Optional[str], tool_name: str, args: dict) -> Optional[str]:
+        """Decide a call from remembered grants, then rules: ALLOW, DENY, ASK,
+        or None when the decision depends on a server that is not known yet"""
+        conversation_grants = approval_policy.conversation_grants.get(self.conversation_id, set())
+        for grants in (self.session_grants, conversation_grants):
+            granted = find_grant(grants, server_name, tool_name)
+            if granted is None:
+                return None
+            if granted:
+                return ALLOW
+        return approval_policy.evaluate(server_name, tool_name, args)
+    
+    async def _request_approval(self, tool_name: str, args: dict, tool_call_id: Optional[str] = None,
+                                server_name: Optional[str] = None, early: bool = False) -> Optional[bool]:
+        """Ask the client to approve a tool call and wait for the decision.
+        Early requests return None instead of asking when the policy cannot decide without the server."""
+        config = config_manager.snapshot
+        
         # Check if auto-approval is enabled
-        from core.config import config_manager
-        auto_approve = await config_manager.get_value("auto_approve_tools", False)
+        if self.auto_approve is not None:
+            auto_approve = self.auto_approve
+        else:
+            auto_approve = config.get("auto_approve_tools", False)
         
         if auto_approve:
             logger.info(f"Auto-approving tool: {tool_name} (auto_approve_tools is enabled)")
+            self.settle_call(tool_call_id)
             return True
         
+        # Consult approval rules and remembered decisions before bothering the user
+        approval_policy.load(config.get("approval_rules", ()))
+        decision = self.policy_decision(server_name, tool_name, args)
+        if decision == ALLOW:
+            logger.info(f"Auto-approving tool: {tool_name} (allowed by approval policy)")
+            self.settle_call(tool_call_id)
+            return True
+        if decision == DENY:
+            logger.info(f"Denying tool: {tool_name} (denied by approval policy)")
+            self.settle_call(tool_call_id)
+            return False
+        if decision is None and early:
+            return None
+        
         approval_id = str(uuid.uuid4())
         
         logger.info(f"Requesting approval for tool: {tool_name} with ID: {approval_id}")
         
-        # Send approval request to client
-        await self.messenger.send_message(
-            "approval_request",
-            approval_id=approval_id,
-            tool_name=tool_name,
-            args=args
-        )
-        
-        # Create a future to wait for the response
+        # Create a future to wait for the response before the client can answer
         loop = asyncio.get_running_loop()
         approval_future = loop.create_future()
         self.pending_approvals[approval_id] = approval_future
+        self._requests[approval_id] = (server_name, tool_name, tool_call_id)
+        _approval_owners[approval_id] = self
         
         try:
+            # Queue the request; the calls of one model response are sent together
+            self._outgoing.append({
+                "approval_id": approval_id,
+                "tool_name": tool_name,
+                "tool_id": tool_call_id,
+                "args": args
+            })
+            self.settle_call(tool_call_id)
+            
             # Wait for approval response with timeout
-            timeout = await config_manager.get_value("approval_timeout", 60.0)
+            timeout = config.get("approval_timeout", 60.0)
             approved = await asyncio.wait_for(approval_future, timeout=timeout)  # configurable timeout
             logger.info(f"Approval received for {approval_id}: {approved}")
             return approved
@@ -62,11 +231,84 @@ class ToolApprovalManager:
         finally:
             # Clean up
             self.pending_approvals.pop(approval_id, None)
+            self._requests.pop(approval_id, None)
+            _approval_owners.pop(approval_id, None)
+            self._forget_batch_member(approval_id)
+    
+    def _schedule_flush(self) -> None:
+        """Start sending queued requests unless other calls of the response may still ask"""
+        if not self._outgoing or self._expected:
+            return
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush_requests())
+    
+    async def _flush_requests(self) -> None:
+        """Send the queued requests, one message per batch"""
+        # Requests queued while a batch is being sent go out next
+        while self._outgoing and not self._expected:
+            requests, self._outgoing = self._outgoing, []
+            await self._send_requests(requests)
+    
+    async def _send_requests(self, requests: List[Dict[str, Any]]) -> None:
+        # Skip calls that were cancelled while waiting for the rest of their batch
+        requests = [r for r in requests if r["approval_id"] in self.pending_approvals]
+        if not requests:
+            return
+        if len(requests) == 1:
+            await self.messenger.send_message("approval_request", conversation_id=self.conversation_id, **requests[0])
+            return
+        
+        batch_id = str(uuid.uuid4())
+        self.batches[batch_id] = [r["approval_id"] for r in requests]
+        for request in requests:
+            self._batch_of[request["approval_id"]] = batch_id
+        _approval_owners[batch_id] = self
+        logger.info(f"Requesting approval for {len(requests)} tools in batch {batch_id}")
+        await self.messenger.send_message("approval_batch_request", batch_id=batch_id,
+                                          conversation_id=self.conversation_id, items=requests)
+    
+    def _forget_batch_member(self, approval_id: str) -> None:
+        """Drop a settled approval from its batch, and the batch once all are settled"""
+        batch_id = self._batch_of.pop(approval_id, None)
+        if batch_id is None:
+            return
+        if not any(member in self.pending_approvals for member in self.batches.get(batch_id, [])):
+            self.batches.pop(batch_id, None)
+            _approval_owners.pop(batch_id, None)
     
-    async def handle_approval_response(self, approval_id: str, approved: bool):
+    def cancel_pending(self) -> int:
+        """Deny every pending approval (e.g. when the client is gone).
+        Returns the number of approvals that were failed."""
+        # Requests still waiting for their batch are never sent
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        self._outgoing = []
+        self._expected.clear()
+        failed = 0
+        for future in self.pending_approvals.values():
+            if not future.done():
+                future.set_result(False)
+                failed += 1
+        return failed
+    
+    async def handle_batch_response(self, batch_id: str, approved: Optional[bool] = None,
+                                    decisions: Optional[Dict[str, bool]] = None, remember: Optional[str] = None):
+        """Resolve the approvals of a batch; calls without a decision stay pending"""
+        decisions = decisions or {}
+        members = list(self.batches.get(batch_id, []))
+        logger.info(f"Received batch approval response for {batch_id}: approved={approved}, {len(decisions)} individual decisions")
+        for approval_id in members:
+            decision = decisions.get(approval_id, approved)
+            if decision is not None:
+                await self.handle_approval_response(approval_id, decision, remember)
+    
+    async def handle_approval_response(self, approval_id: str, approved: bool, remember: Optional[str] = None):
         """Process approval response from the client"""
         logger.info(f"Received approval response for {approval_id}: {approved}")
         
+        if approved and remember and approval_id in self._requests:
+            await self._remember(remember, *self._requests[approval_id])
+        
         if approval_id in self.pending_approvals:
             future = self.pending_approvals[approval_id]
             if not future.done():
@@ -77,3 +319,43 @@ class ToolApprovalManager:
         else:
             logger.warning(f"Received approval response for unknown ID: {approval_id}")
             logger.info(f"Current pending approvals: {list(self.pending_approvals.keys())}")
+    
+    def forget_grants(self) -> None:
+        """Drop the conversation grants this session made (e.g. when it ends)"""
+        for conversation_id in self.granted_conversations:
+            approval_policy.forget_conversation(conversation_id)
+        self.granted_conversations.clear()
+    
+    async def _resolve_always_grant(self, tool_call_id: Optional[str], server_name: Optional[str]) -> None:
+        """Persist an "always" decision made on an early approval once the call's server is known"""
+        tool_name = self._unresolved_always.pop(tool_call_id, None)
+        if tool_name is not None:
+            await self._remember("always", server_name, tool_name)
+    
+    async def _remember(self, scope: str, server_name: Optional[str], tool_name: str,
+                        tool_call_id: Optional[str] = None):
+        """Allow a tool without asking for the given scope"""
+        if scope not in REMEMBER_SCOPES:
+            logger.warning(f"Ignoring unknown approval scope: {scope}")
+            return
+        if scope == "always" and server_name is None:
+            # A persisted rule without a server would allow the tool name on every server
+            if tool_call_id in self._early_calls:
+                self._unresolved_always[tool_call_id] = tool_name
+                logger.info(f"Persisting approval of {tool_name} once its server is known")
+                return
+            logger.warning(f"Not persisting approval of {tool_name} without a server, remembering it for this session")
+            scope = "session"
+        if scope == "always":
+            try:
+                await approval_policy.grant_always(server_name, tool_name)
+                return
+            except Exception as e:
+                logger.error(f"Failed to persist approval rule for {tool_name}: {e}")
+                scope = "session"
+        if scope == "conversation" and self.conversation_id:
+            approval_policy.grant_conversation(self.conversation_id, server_name, tool_name)
+            self.granted_conversations.add(self.conversation_id)
+        else:
+            self.session_grants.add((server_name, tool_name))
+        logger.info(f"Remembered approval of {tool_name} for this {scope}")
@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+"""
+Tool Result Cache - Reuses results of idempotent MCP tool calls across turns and conversations
+"""
+
+import asyncio
+import json
+import logging
+import os
+import tempfile
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+from core.config import config_manager
+from core.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Results kept in memory unless the tool_cache_max_entries setting says otherwise
+DEFAULT_MAX_ENTRIES = 256
+# File cached results are persisted to when the tool_cache_persist setting is enabled
+TOOL_CACHE_FILE = "tool_cache.json"
+# Seconds a store waits so bursts of new results are written to disk once
+TOOL_CACHE_WRITE_DELAY = 1.0
+
+def cache_key(server_name: Optional[str], tool_name: str, args: Dict[str, Any]) -> str:
+    """Key of a tool call: server, tool and arguments in canonical (sorted, compact) JSON"""
+    return json.dumps([server_name, tool_name, args], sort_keys=True, separators=(",", ":"), default=str)
+
+def _is_plain_json(value: Any) -> bool:
+    """Whether a result survives a round trip through JSON unchanged"""
+    if value is None or isinstance(value, (str, bool, int, float)):
+        return True
+    if isinstance(value, list):
+        return all(_is_plain_json(item) for item in value)
+    if isinstance(value, dict):
+        return all(isinstance(key, str) and _is_plain_json(item) for key, item in value.items())
+    return False
+
+@dataclass
+class CacheEntry:
+    """A cached result and the wall-clock time it expires at"""
+    value: Any
+    expires_at: float
+
+class ToolResultCache:
+    """
+    Size-bounded LRU cache of tool results with a per-tool TTL.
+    Tools opt in through their server's `cache_tools` config (tool name ->
+    TTL seconds). Only successful results are stored. With the
+    `tool_cache_persist` setting, JSON results are also written to disk and
+    loaded again on the first lookup after a restart.
+    """
+
+    def __init__(self, cache_file: str = TOOL_CACHE_FILE):
+        self.cache_file = Path(cache_file)
+        self.entries: "OrderedDict[str, CacheEntry]" = OrderedDict()
+        # Lookup counts per "server/tool": {"hits": n, "misses": n}
+        self.tool_stats: Dict[str, Dict[str, int]] = {}
+        self._loaded = False
+        self._pending_write: Optional[asyncio.Task] = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def max_entries(self) -> int:
+        return config_manager.snapshot.get("tool_cache_max_entries", DEFAULT_MAX_ENTRIES)
+
+    @property
+    def persist(self) -> bool:
+        return bool(config_manager.snapshot.get("tool_cache_persist", False))
+
+    async def get(self, server_name: Optional[str], tool_name: str, args: Dict[str, Any]) -> Tuple[bool, Any]:
+        """Look up a call; returns (hit, result)"""
+        if self.persist and not self._loaded:
+            await self.load()
+        key = cache_key(server_name, tool_name, args)
+        entry = self.entries.get(key)
+        hit = entry is not None and entry.expires_at > time.time()
+        if entry is not None and not hit:
+            del self.entries[key]
+            metrics.incr("tool_cache.expirations")
+        elif hit:
+            self.entries.move_to_end(key)
+
+        stats = self.tool_stats.setdefault(f"{server_name}/{tool_name}", {"hits": 0, "misses": 0})
+        stats["hits" if hit else "misses"] += 1
+        metrics.incr("tool_cache.hits" if hit else "tool_cache.misses")
+        return (True, entry.value) if hit else (False, None)
+
+    def put(self, server_name: Optional[str], tool_name: str, args: Dict[str, Any], value: Any, ttl: float) -> None:
+        """Store a successful result for ttl seconds, evicting the least recently used entries"""
+        key = cache_key(server_name, tool_name, args)
+        self.entries[key] = CacheEntry(value, time.time() + ttl)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            metrics.incr("tool_cache.evictions")
+        if self.persist and _is_plain_json(value):
+            self._schedule_write()
+
+    def clear(self, server_name: Optional[str] = None) -> int:
+        """Drop every entry, or those of one server. Returns the number dropped."""
+        if server_name is None:
+            dropped = len(self.entries)
+            self.entries.clear()
+        else:
+            prefix = json.dumps([server_name])[:-1] + ","
+            keys = [key for key in self.entries if key.startswith(prefix)]
+            for key in keys:
+                del self.entries[key]
+            dropped = len(keys)
+        if dropped and self.persist:
+            self._schedule_write()
+        return dropped
+
+    def stats(self) -> Dict[str, Any]:
+        """Entry count and hit rates, overall and per tool"""
+        hits = sum(stats["hits"] for stats in self.tool_stats.values())
+        lookups = hits + sum(stats["misses"] for stats in self.tool_stats.values())
+        return {
+            "entries": len(self.entries),
+            "max_entries": self.max_entries,
+            "persist": self.persist,
+            "hits": hits,
+            "misses": lookups - hits,
+            "hit_rate": hits / lookups if lookups else None,
+            "tools": {
+                tool: {**stats, "hit_rate": stats["hits"] / (stats["hits"] + stats["misses"])}
+                for tool, stats in self.tool_stats.items()
+            },
+        }
+
+    async def load(self) -> None:
+        """Merge unexpired entries from the cache file into memory"""
+        self._loaded = True
+        try:
+            data = await asyncio.to_thread(self._read_file)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable tool cache file {self.cache_file}: {e}")
+            return
+        now = time.time()
+        loaded = 0
+        for key, value, expires_at in data:
+            if expires_at > now and key not in self.entries:
+                self.entries[key] = CacheEntry(value, expires_at)
+                loaded += 1
+        if loaded:
+            logger.info(f"Loaded {loaded} cached tool results from {self.cache_file}")
+
+    async def flush(self) -> None:
+        """Wait until every stored result has been written out"""
+        while self._pending_write is not None or self._write_lock.locked():
+            pending = self._pending_write
+            if pending is not None:
+                await asyncio.gather(pending, return_exceptions=True)
+            else:
+                # A write is in progress; wait for it to release the lock
+                async with self._write_lock:
+                    pass
+
+    def _schedule_write(self) -> None:
+        if self._pending_write is None:
+            self._pending_write = asyncio.create_task(self._write_pending())
+
+    async def _write_pending(self) -> None:
+        try:
+            await asyncio.sleep(TOOL_CACHE_WRITE_DELAY)
+        finally:
+            self._pending_write = None
+        # One write at a time, each taking the entries as they are once it runs, so an older one never lands last
+        async with self._write_lock:
+            now = time.time()
+            data = [
+                [key, entry.value, entry.expires_at]
+                for key, entry in self.entries.items()
+                if entry.expires_at > now and _is_plain_json(entry.value)
+            ]
+            try:
+                await asyncio.to_thread(self._write_file, data)
+            except OSError as e:
+                logger.error(f"Error saving tool cache to {self.cache_file}: {e}")
+
+    def _read_file(self) -> list:
+        """Read persisted entries. Blocking; run it off-loop."""
+        if not self.cache_file.exists():
+            return []
+        with open(self.cache_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_file(self, data: list) -> None:
+        """Atomically replace the cache file. Blocking; run it off-loop."""
+        directory = self.cache_file.resolve().parent
+        fd, temp_path = tempfile.mkstemp(dir=directory, prefix=f".{self.cache_file.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.cache_file)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
+            raise
+
+# Global tool result cache instance
+tool_result_cache = ToolResultCache()
@@ -129,4 +129,41 @@ def test_ws_missing_conversation_id(tmp_path, monkeypatch):
             ws.send_json({"type": "chat_message", "content": "hello"})
             err = ws.receive_json()
             assert err.get("type") == "error"
-            assert err.get("message") == "Missing conversation_id" 
\ No newline at end of file
+            assert err.get("message") == "Missing conversation_id" 
+
+def test_ws_heartbeat_reclaims_idle_session(monkeypatch):
+    asyncio.get_event_loop().run_until_complete(init_db())
+
+    # Shrink the heartbeat so the idle timeout fires quickly
+    from core.config import config_manager
+    from core.metrics import metrics
+    heartbeat = {"ws_ping_interval": 0.05, "ws_idle_timeout": 0.2}
+    original_get_value = config_manager.get_value
+
+    async def fake_get_value(key, default=None):
+        if key in heartbeat:
+            return heartbeat[key]
+        return await original_get_value(key, default)
+    monkeypatch.setattr(config_manager, "get_value", fake_get_value)
+    metrics.reset()
+
+    with TestClient(app) as client:
+        with client.websocket_connect("/ws") as ws:
+            assert ws.receive_json().get("type") == "system_ready"
+            # Client-initiated ping is answered directly
+            ws.send_json({"type": "ping", "ts": 1})
+            msg = ws.receive_json()
+            while msg.get("type") == "ping":
+                msg = ws.receive_json()
+            assert msg == {"type": "pong", "ts": 1}
+            # Stop answering server pings until the session is reclaimed
+            while True:
+                msg = ws.receive()
+                if msg["type"] == "websocket.close":
+                    break
+                assert json.loads(msg["text"])["type"] == "ping"
+
+        health = client.get("/api/health").json()
+        assert health["metrics"]["websocket.idle_timeouts"] == 1
+        assert health["metrics"]["websocket.sessions_reclaimed"] == 1
+        assert health["connections"] == 0
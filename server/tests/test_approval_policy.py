@@ -0,0 +1,124 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import json
+import pytest
+
+from dataclasses import replace
+
+from core.config import config_manager, freeze
+from core.messaging import QueueMessenger
+from services.approval_policy import ALLOW, ASK, DENY, ApprovalPolicy
+from services.tool_approval import ToolApprovalManager, approval_policy
+
+RULES = [
+    {"action": "deny", "tool": "*", "args": {"command": r"\brm\s+-rf\b"}},
+    {"action": "allow", "server": "desktop-commander", "tool": "read_*", "path_under": "/home/me/project"},
+    {"action": "allow", "tool": "resolve-library-id"},
+    {"action": "ask", "tool": "write_*"},
+]
+
+@pytest.mark.parametrize("server, tool, args, expected", [
+    ("desktop-commander", "read_file", {"path": "/home/me/project/src/a.py"}, ALLOW),
+    # Relative paths depend on the server's working directory
+    ("desktop-commander", "read_file", {"path": "src/a.py"}, ASK),
+    ("desktop-commander", "read_file", {"path": ".ssh/id_rsa"}, ASK),
+    ("desktop-commander", "read_file", {"path": "/home/me/project/../secrets"}, ASK),
+    ("desktop-commander", "read_multiple_files", {"path": ["/home/me/project/a", "/etc/passwd"]}, ASK),
+    ("other", "read_file", {"path": "/home/me/project/a"}, ASK),
+    ("desktop-commander", "start_process", {"command": "rm -rf /"}, DENY),
+    ("context7", "resolve-library-id", {"libraryName": "react"}, ALLOW),
+    # The server is unknown while the call is still streaming
+    (None, "read_file", {"path": "/home/me/project/a"}, None),
+    (None, "resolve-library-id", {}, ALLOW),
+])
+def test_rules_first_match_wins(server, tool, args, expected):
+    policy = ApprovalPolicy()
+    policy.load(RULES)
+    assert policy.evaluate(server, tool, args) == expected
+
+def test_path_rules_follow_symlinks(tmp_path):
+    project = tmp_path / "project"
+    project.mkdir()
+    (project / "a.py").write_text("")
+    (project / "escape").symlink_to(tmp_path)
+    policy = ApprovalPolicy()
+    policy.load([{"action": "allow", "tool": "read_file", "path_under": str(project)}])
+    assert policy.evaluate("fs", "read_file", {"path": str(project / "a.py")}) == ALLOW
+    assert policy.evaluate("fs", "read_file", {"path": str(project / "escape" / "secrets")}) == ASK
+
+def test_invalid_rules_are_rejected():
+    errors = config_manager._validate_approval_rules([{"action": "maybe"}, {"action": "deny", "args": {"x": "("}}])
+    assert len(errors) == 2
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_remembered_session_decision_skips_prompt(monkeypatch):
+    snapshot = config_manager.snapshot
+    values = freeze({**snapshot.to_dict(), "auto_approve_tools": False, "approval_rules": []})
+    monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=values))
+
+    messenger = QueueMessenger()
+    manager = ToolApprovalManager(messenger)
+    first = asyncio.create_task(manager.request_approval("write_file", {"path": "a"}, "call-1", "desktop-commander"))
+    message_type, frame = await asyncio.wait_for(messenger.queue.get(), timeout=1)
+    assert message_type == "approval_request"
+    await manager.handle_approval_response(json.loads(frame)["approval_id"], True, remember="session")
+    assert await first is True
+
+    # The same tool is now allowed without a round trip, other tools still ask
+    assert await manager.request_approval("write_file", {"path": "b"}, "call-2", "desktop-commander") is True
+    assert messenger.queue.empty()
+    assert manager.policy_decision("desktop-commander", "move_file", {}) == ASK
+    assert approval_policy.conversation_grants == {}
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_always_grants_are_only_persisted_with_a_server(monkeypatch):
+    snapshot = config_manager.snapshot
+    values = freeze({**snapshot.to_dict(), "auto_approve_tools": False, "approval_rules": []})
+    monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=values))
+    persisted = []
+    async def grant_always(server_name, tool_name):
+        persisted.append((server_name, tool_name))
+    monkeypatch.setattr(approval_policy, "grant_always", grant_always)
+
+    messenger = QueueMessenger()
+    manager = ToolApprovalManager(messenger)
+
+    # Raised early from the model stream: the rule waits until the call runs on its server
+    manager.prefetch_approval("call-1", "write_file", {"path": "a"})
+    message_type, frame = await asyncio.wait_for(messenger.queue.get(), timeout=1)
+    await manager.handle_approval_response(json.loads(frame)["approval_id"], True, remember="always")
+    assert persisted == []
+    assert await manager.request_approval("write_file", {"path": "a"}, "call-1", "desktop-commander") is True
+    assert persisted == [("desktop-commander", "write_file")]
+
+    # Without a server the decision is only remembered for the session
+    call = asyncio.create_task(manager.request_approval("move_file", {"path": "a"}, "call-2"))
+    message_type, frame = await asyncio.wait_for(messenger.queue.get(), timeout=1)
+    await manager.handle_approval_response(json.loads(frame)["approval_id"], True, remember="always")
+    assert await call is True
+    assert persisted == [("desktop-commander", "write_file")]
+    assert (None, "move_file") in manager.session_grants
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_conversation_grants_end_with_the_session(monkeypatch):
+    snapshot = config_manager.snapshot
+    values = freeze({**snapshot.to_dict(), "auto_approve_tools": False, "approval_rules": []})
+    monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=values))
+
+    messenger = QueueMessenger()
+    manager = ToolApprovalManager(messenger)
+    manager.conversation_id = "conv-1"
+    call = asyncio.create_task(manager.request_approval("write_file", {"path": "a"}, "call-1", "fs"))
+    message_type, frame = await asyncio.wait_for(messenger.queue.get(), timeout=1)
+    await manager.handle_approval_response(json.loads(frame)["approval_id"], True, remember="conversation")
+    assert await call is True
+    assert approval_policy.conversation_grants == {"conv-1": {("fs", "write_file")}}
+
+    manager.forget_grants()
+    assert approval_policy.conversation_grants == {}
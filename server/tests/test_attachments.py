@@ -0,0 +1,69 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import hashlib
+import os
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+from services.attachment_service import attachment_store
+
+PNG_BYTES = b"\x89PNG\r\n\x1a\n" + b"\x00" * 64
+
+@pytest.fixture(autouse=True)
+def temp_store(tmp_path, monkeypatch):
+    # Redirect attachment storage to a temporary directory
+    monkeypatch.setattr(attachment_store, "base_dir", tmp_path / "attachments")
+    monkeypatch.setattr(attachment_store, "_index", {})
+    return tmp_path
+
+def test_upload_and_fetch_attachment():
+    client = TestClient(app)
+    r = client.post("/api/attachments?name=pixel.png", content=PNG_BYTES, headers={"Content-Type": "image/png"})
+    assert r.status_code == 200
+    attachment = r.json()["attachment"]
+    assert attachment["id"] == hashlib.sha256(PNG_BYTES).hexdigest()
+    assert attachment["media_type"] == "image/png"
+    assert attachment["size"] == len(PNG_BYTES)
+
+    # Served back by ID, also after the in-memory index is dropped
+    attachment_store._index.clear()
+    r = client.get(f"/api/attachments/{attachment['id']}")
+    assert r.status_code == 200
+    assert r.content == PNG_BYTES
+
+def test_upload_rejects_unsupported_content():
+    client = TestClient(app)
+    r = client.post("/api/attachments?name=notes.txt", content=b"just some text", headers={"Content-Type": "image/png"})
+    assert r.status_code == 415
+    assert list(attachment_store.pending_dir.iterdir()) == []
+
+def test_upload_rejects_oversized_content(monkeypatch):
+    monkeypatch.setattr(attachment_store, "max_size", 16)
+    client = TestClient(app)
+    r = client.post("/api/attachments", content=PNG_BYTES)
+    assert r.status_code == 413
+
+def test_unknown_attachment_returns_404():
+    client = TestClient(app)
+    assert client.get("/api/attachments/not-a-digest").status_code == 404
+
+def test_unclaimed_uploads_are_swept():
+    client = TestClient(app)
+    used = client.post("/api/attachments", content=PNG_BYTES).json()["attachment"]["id"]
+    unused = client.post("/api/attachments", content=PNG_BYTES + b"\x01").json()["attachment"]["id"]
+
+    # Claiming moves an upload out of the pending directory
+    attachment = attachment_store.get(used)
+    asyncio.run(attachment_store.claim(attachment))
+    assert attachment.path.parent == attachment_store.base_dir
+
+    # Stale pending uploads are deleted, claimed ones kept
+    for path in attachment_store.pending_dir.iterdir():
+        os.utime(path, (0, 0))
+    assert asyncio.run(attachment_store.sweep_unused()) == 1
+    assert client.get(f"/api/attachments/{unused}").status_code == 404
+    assert client.get(f"/api/attachments/{used}").status_code == 200
@@ -0,0 +1,335 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import json
+import pytest
+from fastapi.testclient import TestClient
+from pydantic_ai import Agent
+from pydantic_ai.models.test import TestModel
+
+from core.database import init_db, get_conversation_by_id
+from core.messaging import QueueMessenger
+from services.mcp_agent import MCPAgentManager
+from services.tool_approval import ToolApprovalManager
+from main import app
+
+@pytest.fixture(autouse=True)
+def temp_env(tmp_path, monkeypatch):
+    # Redirect the DB file and run the agent against a local test model
+    monkeypatch.setattr("core.database.DB_FILE", str(tmp_path / "test.db"))
+
+    async def fake_get_mcp_manager():
+        class _Dummy:
+            pass
+        return _Dummy()
+    monkeypatch.setattr("main.get_mcp_manager", fake_get_mcp_manager)
+
+    async def fake_create_agent(self):
+        return Agent(TestModel(custom_output_text="Hello from the test model"))
+    monkeypatch.setattr(MCPAgentManager, "create_agent", fake_create_agent)
+
+def parse_sse(body: str):
+    events = []
+    for frame in body.strip().split("\n\n"):
+        lines = dict(line.split(": ", 1) for line in frame.splitlines())
+        events.append((lines["event"], json.loads(lines["data"])))
+    return events
+
+def test_chat_stream_emits_websocket_events():
+    asyncio.run(init_db())
+    with TestClient(app) as client:
+        r = client.post("/api/chat/stream", json={"content": "hi", "conversation_id": "conv-sse"})
+        assert r.status_code == 200
+        assert r.headers["content-type"].startswith("text/event-stream")
+        assert r.headers["x-conversation-id"] == "conv-sse"
+
+    events = parse_sse(r.text)
+    types = [event_type for event_type, _ in events]
+    assert types[0] == "assistant_start"
+    assert types[-2:] == ["assistant_complete", "conversation_saved"]
+    text = "".join(data["content"] for event_type, data in events if event_type == "text_delta")
+    assert text == "Hello from the test model"
+
+    conversation = asyncio.run(get_conversation_by_id("conv-sse"))
+    assert conversation is not None
+
+def test_chat_stream_requires_content():
+    with TestClient(app) as client:
+        r = client.post("/api/chat/stream", json={"content": "  "})
+        assert r.status_code == 400
+
+def test_approval_endpoint_resolves_pending_request():
+    with TestClient(app) as client:
+        async def scenario():
+            messenger = QueueMessenger()
+            manager = ToolApprovalManager(messenger)
+            request = asyncio.create_task(manager.request_approval("read_file", {"path": "/tmp/x"}))
+            message_type, frame = await messenger.queue.get()
+            assert message_type == "approval_request"
+            message = json.loads(frame)
+            return request, message["approval_id"], manager.token
+
+        request, approval_id, token = client.portal.call(scenario)
+        # Only the stream that raised the request may answer it
+        r = client.post(f"/api/approvals/{approval_id}", json={"approved": False})
+        assert r.status_code == 422
+        r = client.post(f"/api/approvals/{approval_id}", json={"approved": False}, headers={"X-Approval-Token": "guessed"})
+        assert r.status_code == 404
+        r = client.post(f"/api/approvals/{approval_id}", json={"approved": True}, headers={"X-Approval-Token": token})
+        assert r.status_code == 200
+
+        async def wait_for_decision():
+            return await request
+        assert client.portal.call(wait_for_decision) is True
+
+        r = client.post(f"/api/approvals/{approval_id}", json={"approved": True}, headers={"X-Approval-Token": token})
+        assert r.status_code == 404
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_observers_receive_every_event_of_a_run():
+    from services.chat_service import ChatSession
+    from services.conversation_hub import conversation_hub
+
+    await init_db()
+    owner, observer = QueueMessenger(), QueueMessenger()
+    await conversation_hub.subscribe("conv-watched", observer, announce=False)
+    session = ChatSession(messenger=owner, auto_approve=True)
+    try:
+        await session.handle_chat_message("hi", "conv-watched")
+        for _ in range(10):
+            await asyncio.sleep(0)
+
+        def types(messenger):
+            frames = []
+            while not messenger.queue.empty():
+                frames.append(messenger.queue.get_nowait()[0])
+            return frames
+
+        # Events emitted after the stream ends still reach observers before the channel is released
+        owner_types = types(owner)
+        assert owner_types[-2:] == ["assistant_complete", "conversation_saved"]
+        assert [t for t in types(observer) if t != "conversation_state"] == owner_types
+    finally:
+        conversation_hub.disconnect(observer)
+        await session.cleanup()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_call_arguments_are_streamed():
+    from pydantic_ai.messages import ModelRequest, ToolReturnPart
+    from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+    from services.event_pipeline import EventPipeline, RecorderSink
+    from services.message_processor import MessageStreamProcessor
+
+    async def stream(messages, info):
+        if any(isinstance(p, ToolReturnPart) for m in messages if isinstance(m, ModelRequest) for p in m.parts):
+            yield "done"
+            return
+        yield {0: DeltaToolCall(name="write_file", json_args='{"path": "a.txt", ', tool_call_id="call-1")}
+        yield {0: DeltaToolCall(json_args='"content": "hello"}')}
+
+    agent = Agent(FunctionModel(stream_function=stream))
+
+    @agent.tool_plain
+    def write_file(path: str, content: str) -> str:
+        return "ok"
+
+    events = EventPipeline()
+    recorder = events.add_sink(RecorderSink())
+    processor = MessageStreamProcessor(events, ToolApprovalManager(events, auto_approve=True))
+    async with agent.iter("write it") as run:
+        await processor.process_agent_stream(run)
+    await events.close()
+
+    deltas = [e.data for e in recorder.events if e.type == "tool_args_delta"]
+    assert {d["tool_id"] for d in deltas} == {"call-1"}
+    assert {d["tool_name"] for d in deltas} == {"write_file"}
+    assert json.loads("".join(d["args_delta"] for d in deltas)) == {"path": "a.txt", "content": "hello"}
+    # Arguments arrive before the tool starts executing
+    types = [e.type for e in recorder.events]
+    assert types.index("tool_args_delta") < types.index("tool_start")
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_dict_tool_arguments_are_streamed_as_snapshots():
+    from pydantic_ai.messages import ModelRequest, ToolReturnPart
+    from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+    from services.event_pipeline import EventPipeline, RecorderSink
+    from services.message_processor import MessageStreamProcessor
+
+    async def stream(messages, info):
+        if any(isinstance(p, ToolReturnPart) for m in messages if isinstance(m, ModelRequest) for p in m.parts):
+            yield "done"
+            return
+        yield {0: DeltaToolCall(name="write_file", json_args={"path": "a.txt"}, tool_call_id="call-1")}
+        yield {0: DeltaToolCall(json_args={"content": "hello"})}
+
+    agent = Agent(FunctionModel(stream_function=stream))
+
+    @agent.tool_plain
+    def write_file(path: str, content: str) -> str:
+        return "ok"
+
+    events = EventPipeline()
+    recorder = events.add_sink(RecorderSink())
+    processor = MessageStreamProcessor(events, ToolApprovalManager(events, auto_approve=True))
+    async with agent.iter("write it") as run:
+        await processor.process_agent_stream(run)
+    await events.close()
+
+    # Each event carries all arguments so far instead of a fragment to append
+    snapshots = [e.data["args"] for e in recorder.events if e.type == "tool_args_delta"]
+    assert snapshots == [{"path": "a.txt"}, {"path": "a.txt", "content": "hello"}]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_early_approval_overlaps_model_generation(monkeypatch):
+    from pydantic_ai import RunContext
+    from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+    from pydantic_ai.messages import ModelRequest, ToolReturnPart
+    from dataclasses import replace
+    from core.config import config_manager, freeze
+    from services.event_pipeline import EventPipeline, EventSink, RecorderSink
+    from services.message_processor import MessageStreamProcessor
+
+    snapshot = config_manager.snapshot
+    values = freeze({**snapshot.to_dict(), "early_tool_approval": True, "auto_approve_tools": False, "approval_rules": []})
+    monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=values))
+
+    events = EventPipeline()
+    manager = ToolApprovalManager(events)
+    requested = asyncio.Event()
+
+    class ApprovingSink(EventSink):
+        async def handle(self, event):
+            if event.type == "approval_request":
+                requested.set()
+                await manager.handle_approval_response(event.data["approval_id"], True)
+
+    recorder = events.add_sink(RecorderSink())
+    events.add_sink(ApprovingSink())
+
+    async def stream(messages, info):
+        if any(isinstance(p, ToolReturnPart) for m in messages if isinstance(m, ModelRequest) for p in m.parts):
+            yield "done"
+            return
+        yield {0: DeltaToolCall(name="read_file", json_args='{"path": "a.txt"}', tool_call_id="call-1")}
+        yield {1: DeltaToolCall(name="read_file", json_args='{"path": "b.txt"}', tool_call_id="call-2")}
+        # The first call is already awaiting review while the model keeps generating
+        await asyncio.wait_for(requested.wait(), timeout=1)
+
+    agent = Agent(FunctionModel(stream_function=stream))
+
+    @agent.tool
+    async def read_file(ctx: RunContext, path: str) -> str:
+        approved = await manager.request_approval("read_file", {"path": path}, ctx.tool_call_id)
+        return "ok" if approved else "denied"
+
+    processor = MessageStreamProcessor(events, manager)
+    async with agent.iter("read both") as run:
+        await processor.process_agent_stream(run)
+    await events.close()
+
+    requests = [e.data for e in recorder.events if e.type == "approval_request"]
+    assert sorted(r["tool_id"] for r in requests) == ["call-1", "call-2"]
+    results = [e.data["content"] for e in recorder.events if e.type == "tool_complete"]
+    assert results == ["ok", "ok"]
+    assert manager.prefetched == {}
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_concurrent_approvals_are_batched():
+    messenger = QueueMessenger()
+    manager = ToolApprovalManager(messenger, auto_approve=False)
+    # The calls of one model response, as announced by the stream processor
+    for p in "abc":
+        manager.expect_call(f"call-{p}")
+    calls = [asyncio.create_task(manager.request_approval("read_file", {"path": p}, f"call-{p}")) for p in "abc"]
+
+    message_type, frame = await asyncio.wait_for(messenger.queue.get(), timeout=1)
+    assert message_type == "approval_batch_request"
+    batch = json.loads(frame)
+    assert [item["tool_id"] for item in batch["items"]] == ["call-a", "call-b", "call-c"]
+
+    # Deny one call individually, approve the rest in bulk
+    denied = batch["items"][1]["approval_id"]
+    from services.tool_approval import resolve_approval_batch
+    assert not await resolve_approval_batch(batch["batch_id"], True, token="guessed")
+    assert await resolve_approval_batch(batch["batch_id"], True, {denied: False}, token=manager.token)
+    assert await asyncio.gather(*calls) == [True, False, True]
+    assert manager.batches == {}
+    assert not await resolve_approval_batch(batch["batch_id"], True, token=manager.token)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_single_approval_is_sent_without_waiting():
+    messenger = QueueMessenger()
+    manager = ToolApprovalManager(messenger, auto_approve=False)
+    call = asyncio.create_task(manager.request_approval("read_file", {"path": "a"}, "call-a"))
+    for _ in range(5):
+        await asyncio.sleep(0)
+    message_type, frame = messenger.queue.get_nowait()
+    assert message_type == "approval_request"
+    await manager.handle_approval_response(json.loads(frame)["approval_id"], True)
+    assert await call is True
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_calls_of_one_response_are_approved_as_a_batch(monkeypatch):
+    from pydantic_ai import RunContext
+    from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+    from pydantic_ai.messages import ModelRequest, ToolReturnPart
+    from dataclasses import replace
+    from core.config import config_manager, freeze
+    from services.event_pipeline import EventPipeline, EventSink, RecorderSink
+    from services.message_processor import MessageStreamProcessor
+
+    snapshot = config_manager.snapshot
+    values = freeze({**snapshot.to_dict(), "early_tool_approval": False, "auto_approve_tools": False,
+                     "approval_rules": [{"tool": "list_dir", "action": "allow"}]})
+    monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=values))
+
+    events = EventPipeline()
+    manager = ToolApprovalManager(events)
+
+    class ApprovingSink(EventSink):
+        async def handle(self, event):
+            if event.type == "approval_batch_request":
+                await manager.handle_batch_response(event.data["batch_id"], True)
+
+    recorder = events.add_sink(RecorderSink())
+    events.add_sink(ApprovingSink())
+
+    async def stream(messages, info):
+        if any(isinstance(p, ToolReturnPart) for m in messages if isinstance(m, ModelRequest) for p in m.parts):
+            yield "done"
+            return
+        yield {0: DeltaToolCall(name="read_file", json_args='{"path": "a.txt"}', tool_call_id="call-1")}
+        yield {1: DeltaToolCall(name="list_dir", json_args='{"path": "."}', tool_call_id="call-2")}
+        yield {2: DeltaToolCall(name="read_file", json_args='{"path": "b.txt"}', tool_call_id="call-3")}
+
+    agent = Agent(FunctionModel(stream_function=stream))
+
+    @agent.tool
+    async def read_file(ctx: RunContext, path: str) -> str:
+        approved = await manager.request_approval("read_file", {"path": path}, ctx.tool_call_id)
+        return "ok" if approved else "denied"
+
+    @agent.tool
+    async def list_dir(ctx: RunContext, path: str) -> str:
+        approved = await manager.request_approval("list_dir", {"path": path}, ctx.tool_call_id)
+        return "ok" if approved else "denied"
+
+    processor = MessageStreamProcessor(events, manager)
+    async with agent.iter("read both") as run:
+        await asyncio.wait_for(processor.process_agent_stream(run), timeout=5)
+    await events.close()
+
+    # The call allowed by policy does not hold up the others, which are asked together
+    batches = [e.data for e in recorder.events if e.type == "approval_batch_request"]
+    assert [[item["tool_id"] for item in b["items"]] for b in batches] == [["call-1", "call-3"]]
+    assert not [e for e in recorder.events if e.type == "approval_request"]
+    assert [e.data["content"] for e in recorder.events if e.type == "tool_complete"] == ["ok", "ok", "ok"]
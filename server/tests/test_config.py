@@ -0,0 +1,146 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import json
+import os
+import pytest
+
+from core.config import ConfigManager
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_saves_swap_immutable_snapshots(tmp_path):
+    manager = ConfigManager(str(tmp_path / "settings.json"))
+    first = manager.snapshot
+    with pytest.raises(TypeError):
+        first.values["debug_mode"] = True
+
+    config = await manager.load_config()
+    config["debug_mode"] = True
+    await manager.save_config(config)
+
+    assert manager.snapshot.version == first.version + 1
+    assert manager.snapshot.get("debug_mode") is True
+    # Readers holding the old snapshot keep a consistent view
+    assert first.get("debug_mode") is False
+    # The app's own write is not mistaken for an external edit
+    assert not await manager.reload_if_changed()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_external_edits_are_picked_up(tmp_path):
+    path = tmp_path / "settings.json"
+    manager = ConfigManager(str(path))
+    version = manager.snapshot.version
+    events = []
+    manager.add_observer(events.append)
+
+    def edit(**changes):
+        data = json.loads(path.read_text())
+        data.update(changes)
+        path.write_text(json.dumps(data))
+        stat = path.stat()
+        os.utime(path, (stat.st_atime, stat.st_mtime + 1))
+
+    edit(approval_timeout=5.0)
+    assert await manager.reload_if_changed()
+    assert manager.snapshot.get("approval_timeout") == 5.0
+    assert manager.snapshot.version == version + 1
+    assert events[-1].changed_keys == {"approval_timeout"}
+
+    # An invalid edit keeps the last good configuration
+    edit(approval_timeout="soon")
+    assert not await manager.reload_if_changed()
+    assert manager.snapshot.get("approval_timeout") == 5.0
+    assert len(events) == 1
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_rapid_saves_are_coalesced_into_one_write(tmp_path, monkeypatch):
+    import asyncio
+
+    path = tmp_path / "settings.json"
+    manager = ConfigManager(str(path))
+    manager.snapshot
+    writes = []
+    write_file = manager._write_file
+    monkeypatch.setattr(manager, "_write_file", lambda config: writes.append(config) or write_file(config))
+    events = []
+    manager.add_observer(events.append)
+
+    async def toggle(timeout):
+        config = await manager.load_config()
+        config["approval_timeout"] = timeout
+        await manager.save_config(config)
+
+    await asyncio.gather(*(toggle(float(timeout)) for timeout in range(10, 15)))
+
+    # Every change is observed, but the file is written once with the final state
+    assert len(events) == 5
+    assert len(writes) == 1
+    assert json.loads(path.read_text())["approval_timeout"] == manager.snapshot.get("approval_timeout")
+    assert not await manager.reload_if_changed()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_failed_write_keeps_previous_file(tmp_path, monkeypatch):
+    path = tmp_path / "settings.json"
+    manager = ConfigManager(str(path))
+    version = manager.snapshot.version
+    original = path.read_text()
+    events = []
+    manager.add_observer(events.append)
+
+    def fail(src, dst):
+        raise OSError("disk full")
+    monkeypatch.setattr(os, "replace", fail)
+
+    config = await manager.load_config()
+    config["debug_mode"] = True
+    with pytest.raises(Exception, match="disk full"):
+        await manager.save_config(config)
+
+    # The live file is untouched and no temporary file is left behind
+    assert path.read_text() == original
+    assert [p.name for p in tmp_path.iterdir()] == ["settings.json"]
+    # Readers and observers are back on the configuration that is on disk
+    assert manager.snapshot.get("debug_mode") is False
+    assert manager.snapshot.version == version + 2
+    assert [(event.changed_keys, event.new_values) for event in events] == [
+        ({"debug_mode"}, {"debug_mode": True}),
+        ({"debug_mode"}, {"debug_mode": False}),
+    ]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_slow_observers_do_not_hold_up_other_saves(tmp_path):
+    manager = ConfigManager(str(tmp_path / "settings.json"))
+    release = asyncio.Event()
+    seen = []
+
+    async def slow_observer(event):
+        seen.append(event.changed_keys)
+        await release.wait()
+
+    manager.add_observer(slow_observer)
+    config = await manager.load_config()
+    first = asyncio.create_task(manager.save_config({**config, "debug_mode": True}))
+    await asyncio.sleep(0.01)
+
+    # Another save swaps its snapshot in while the first one's observer is still busy
+    second = asyncio.create_task(manager.save_config({**config, "debug_mode": True, "approval_timeout": 5.0}))
+    await asyncio.sleep(0.01)
+    assert manager.snapshot.get("approval_timeout") == 5.0
+    assert seen == [{"debug_mode"}]
+
+    # Observers still see the changes in order
+    release.set()
+    await asyncio.gather(first, second)
+    assert seen == [{"debug_mode"}, {"approval_timeout"}]
+
+    # Reloading never reuses a version clients have seen
+    version = manager.snapshot.version
+    manager.invalidate()
+    assert manager.snapshot.version == version + 1
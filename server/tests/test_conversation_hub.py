@@ -0,0 +1,203 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import json
+import pytest
+
+from core.messaging import QueueMessenger
+from services import conversation_hub as conversation_hub_module
+from services.conversation_hub import ConversationHub
+
+def drain(messenger: QueueMessenger):
+    frames = []
+    while not messenger.queue.empty():
+        message_type, frame = messenger.queue.get_nowait()
+        frames.append(json.loads(frame))
+    return frames
+
+async def settle():
+    """Let the subscribers' writer tasks deliver their queued frames"""
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+class StalledMessenger(QueueMessenger):
+    """An observer whose connection never accepts another frame"""
+    async def write_frame(self, message_type, frame):
+        await asyncio.Event().wait()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_run_is_fanned_out_and_replayed_to_late_joiners():
+    hub = ConversationHub()
+    owner, early, late = QueueMessenger(), QueueMessenger(), QueueMessenger()
+
+    channel = await hub.subscribe("conv-1", owner)
+    await hub.subscribe("conv-1", early)
+    assert channel.begin_run(owner)
+    owner.channel = channel
+
+    await owner.send_message("assistant_start")
+    await owner.send_message("text_delta", content="Hel")
+
+    # A late joiner first learns the run is active, then receives the partial response
+    await hub.subscribe("conv-1", late)
+    assert drain(late) == [
+        {"type": "conversation_state", "conversation_id": "conv-1", "running": True},
+        {"type": "assistant_start"},
+        {"type": "text_delta", "content": "Hel"},
+    ]
+
+    await owner.send_message("text_delta", content="lo")
+    await settle()
+    for messenger in (owner, early, late):
+        assert [f for f in drain(messenger) if f["type"] == "text_delta"][-1] == {"type": "text_delta", "content": "lo"}
+
+    owner.channel = None
+    hub.release(channel, owner)
+    assert not channel.is_running
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_late_joiners_get_a_compact_partial_state(monkeypatch):
+    monkeypatch.setattr(conversation_hub_module, "REPLAY_TOOL_RESULT_CHARS", 5)
+    hub = ConversationHub()
+    owner, late = QueueMessenger(), QueueMessenger()
+    channel = await hub.subscribe("conv-4", owner, announce=False)
+    assert channel.begin_run(owner)
+    owner.channel = channel
+
+    await owner.send_message("assistant_start")
+    for chunk in ("Let", " me", " check"):
+        await owner.send_message("text_delta", content=chunk)
+    for chunk in ('{"q":', ' "x"}'):
+        await owner.send_message("tool_args_delta", tool_id="t1", tool_name="search", args_delta=chunk)
+    await owner.send_message("tool_complete", tool_id="t1", tool_name="search", content="0123456789")
+    await owner.send_message("text_delta", content="Done")
+
+    await hub.subscribe("conv-4", late)
+    assert drain(late)[1:] == [
+        {"type": "assistant_start"},
+        {"type": "text_delta", "content": "Let me check"},
+        {"type": "tool_args_delta", "tool_id": "t1", "tool_name": "search", "args_delta": '{"q": "x"}'},
+        {"type": "tool_complete", "tool_id": "t1", "tool_name": "search", "content": "01234\n... (5 more characters)"},
+        {"type": "text_delta", "content": "Done"},
+    ]
+
+    owner.channel = None
+    hub.release(channel, owner)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_duplicate_runs_are_rejected_and_idle_channels_dropped():
+    hub = ConversationHub()
+    first, second = QueueMessenger(), QueueMessenger()
+
+    channel = await hub.subscribe("conv-2", first)
+    await hub.subscribe("conv-2", second)
+    assert channel.begin_run(first)
+    assert not channel.begin_run(second)
+
+    hub.release(channel, first)
+    assert channel.begin_run(second)
+    hub.release(channel, second)
+
+    hub.unsubscribe_all(first)
+    hub.unsubscribe("conv-2", second)
+    assert "conv-2" not in hub.channels
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stalled_observers_do_not_block_the_run(monkeypatch):
+    monkeypatch.setattr(conversation_hub_module, "SUBSCRIBER_QUEUE_SIZE", 4)
+    hub = ConversationHub()
+    owner, stalled, other = QueueMessenger(), StalledMessenger(), QueueMessenger()
+
+    channel = await hub.subscribe("conv-3", owner, announce=False)
+    await hub.subscribe("conv-3", stalled, announce=False)
+    await hub.subscribe("conv-3", other)
+    assert channel.begin_run(owner)
+    owner.channel = channel
+
+    for i in range(10):
+        await asyncio.wait_for(owner.send_message("text_delta", content=str(i)), timeout=1)
+    await settle()
+
+    # The run and the healthy observer get every frame; the stalled one is dropped
+    for messenger in (owner, other):
+        assert [f["content"] for f in drain(messenger) if f["type"] == "text_delta"] == [str(i) for i in range(10)]
+    assert stalled not in channel.subscribers
+
+    # Only the run's own client may stop it
+    assert not channel.cancel_run(other)
+    owner.channel = None
+    hub.release(channel, owner)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_settings_changes_are_pushed_to_connected_clients(monkeypatch):
+    from core.config import ConfigChangeEvent
+    from services import live_updates as live_updates_module
+
+    hub = ConversationHub()
+    monkeypatch.setattr(live_updates_module, "conversation_hub", hub)
+    client = QueueMessenger()
+    hub.connect(client)
+
+    publisher = live_updates_module.LiveUpdatePublisher()
+    publisher.start()
+    try:
+        event = ConfigChangeEvent({"auto_approve_tools"}, {"auto_approve_tools": False}, {"auto_approve_tools": True})
+        await publisher._on_config_change(event)
+        await publisher._on_mcp_state_change({"context7": None})
+        # Observers return before anything is sent
+        assert drain(client) == []
+        await publisher.flush()
+    finally:
+        publisher.stop()
+
+    assert drain(client) == [
+        {"type": "settings_changed", "changes": {"auto_approve_tools": True}, "redacted": []},
+        {"type": "mcp_server_state", "servers": {"context7": None}},
+    ]
+
+    hub.disconnect(client)
+    assert not hub.connections
+
+def test_pushed_settings_carry_no_credentials():
+    from services.live_updates import redact_setting
+
+    provider = {"provider": "openai", "model": "gpt-4o", "config": {"api_key": "sk-secret", "base_url": "http://llm"}}
+    assert redact_setting("llm_provider", provider) == (
+        {"provider": "openai", "model": "gpt-4o", "config": {"base_url": "http://llm"}}, True
+    )
+    unknown = {"provider": "custom", "model": "m", "config": {"token": "secret"}}
+    assert redact_setting("llm_provider", unknown)[0]["config"] == {}
+
+    servers = {
+        "github": {"command": "npx", "env": {"GITHUB_TOKEN": "ghp_secret"}},
+        "docs": {"url": "http://docs/mcp", "headers": {"Authorization": "Bearer secret"}},
+        "plain": {"command": "uvx"},
+    }
+    assert redact_setting("mcp_servers", servers) == (
+        {"github": {"command": "npx"}, "docs": {"url": "http://docs/mcp"}, "plain": {"command": "uvx"}}, True
+    )
+    assert redact_setting("mcp_servers", {"plain": {"command": "uvx"}}) == ({"plain": {"command": "uvx"}}, False)
+    assert redact_setting("system_prompt", "Be brief.") == ("Be brief.", False)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stalled_clients_are_dropped_from_broadcasts(monkeypatch):
+    monkeypatch.setattr(conversation_hub_module, "BROADCAST_SEND_TIMEOUT", 0.05)
+    hub = ConversationHub()
+    stalled, healthy = StalledMessenger(), QueueMessenger()
+    hub.connect(stalled)
+    hub.connect(healthy)
+
+    await asyncio.wait_for(hub.broadcast("mcp_server_state", servers={"docs": None}), timeout=1)
+    assert hub.connections == {healthy}
+
+    # Later updates no longer wait on the stalled client
+    await asyncio.wait_for(hub.broadcast("mcp_server_state", servers={"web": None}), timeout=0.04)
+    assert [f["servers"] for f in drain(healthy)] == [{"docs": None}, {"web": None}]
@@ -0,0 +1,153 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import json
+import pytest
+
+from core.messaging import QueueMessenger
+from core.metrics import metrics
+from services.event_pipeline import CheckpointSink, EventPipeline, EventSink, MessengerSink, RecorderSink, checkpoint_path, load_checkpoint
+
+class SlowSink(EventSink):
+    name = "slow"
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.seen = []
+
+    async def handle(self, event):
+        await self.release.wait()
+        self.seen.append(event.type)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_sinks_receive_events_in_order():
+    messenger = QueueMessenger()
+    pipeline = EventPipeline()
+    pipeline.add_sink(MessengerSink(messenger))
+    recorder = pipeline.add_sink(RecorderSink())
+
+    await pipeline.emit("assistant_start")
+    await pipeline.emit("text_delta", content="Hi")
+    await pipeline.send_message("approval_request", approval_id="a1", tool_name="t", args={})
+    await pipeline.flush()
+
+    frames = [json.loads(frame) for _, frame in (messenger.queue.get_nowait() for _ in range(3))]
+    assert [f["type"] for f in frames] == ["assistant_start", "text_delta", "approval_request"]
+    assert frames[1] == {"type": "text_delta", "content": "Hi"}
+    assert [e.seq for e in recorder.events] == [1, 2, 3]
+    await pipeline.close()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_slow_lossy_sink_does_not_stall_the_stream():
+    metrics.reset()
+    pipeline = EventPipeline()
+    slow = pipeline.add_sink(SlowSink(), max_buffer=2, lossy=True)
+    recorder = pipeline.add_sink(RecorderSink())
+
+    # Emitting must not wait on the blocked sink
+    for i in range(5):
+        await asyncio.wait_for(pipeline.emit("text_delta", content=str(i)), timeout=1)
+    await pipeline.sinks[1].flush()
+    assert len(recorder.events) == 5
+    assert metrics.get("events.dropped.slow") >= 2
+
+    slow.release.set()
+    await pipeline.flush()
+    assert 1 <= len(slow.seen) <= 3
+    await pipeline.close()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_checkpoints_hold_the_unsaved_part_of_a_run(tmp_path):
+    pipeline = EventPipeline()
+    pipeline.add_sink(CheckpointSink(str(tmp_path), interval=0))
+
+    # Events outside a run are not checkpointed
+    await pipeline.emit("error", message="rejected")
+    await pipeline.flush()
+    assert not list(tmp_path.iterdir())
+
+    pipeline.begin_run("conv-1")
+    await pipeline.emit("assistant_start")
+    await pipeline.emit("text_delta", content="Let me ")
+    await pipeline.emit("text_delta", content="check.")
+    await pipeline.emit("tool_start", tool_name="read_file", tool_id="call-1")
+    await pipeline.emit("tool_complete", tool_id="call-1", tool_name="read_file", content="hi")
+    await pipeline.flush()
+    checkpoint = load_checkpoint("conv-1", str(tmp_path))
+    assert checkpoint["text"] == "Let me check."
+    assert checkpoint["tools"] == {"call-1": {"tool_name": "read_file", "status": "completed", "content": "hi"}}
+
+    # A new run starts from scratch; saving the conversation drops the checkpoint
+    pipeline.begin_run("conv-1")
+    await pipeline.emit("text_delta", content="Again")
+    await pipeline.flush()
+    assert load_checkpoint("conv-1", str(tmp_path))["text"] == "Again"
+    await pipeline.emit("conversation_saved", conversation_id="conv-1")
+    await pipeline.end_run()
+    await pipeline.flush()
+    assert load_checkpoint("conv-1", str(tmp_path)) is None
+
+    # A run that ends unsaved (cancelled or failed) leaves no checkpoint behind
+    pipeline.begin_run("conv-2")
+    await pipeline.emit("text_delta", content="Half")
+    await pipeline.emit("error", message="boom")
+    await pipeline.flush()
+    assert load_checkpoint("conv-2", str(tmp_path))["error"] == "boom"
+    await pipeline.end_run()
+    await pipeline.flush()
+    assert load_checkpoint("conv-2", str(tmp_path)) is None
+    assert not list(tmp_path.iterdir())
+    await pipeline.close()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_checkpoints_stay_inside_their_directory(tmp_path):
+    directory = tmp_path / "checkpoints"
+    settings = tmp_path / "settings.json"
+    settings.write_text("{}")
+    pipeline = EventPipeline()
+    pipeline.add_sink(CheckpointSink(str(directory), interval=0))
+
+    # Client-supplied IDs only pick a hashed file name in the directory
+    pipeline.begin_run("../settings")
+    await pipeline.emit("text_delta", content="x")
+    await pipeline.flush()
+    assert [path.parent for path in directory.iterdir()] == [directory.resolve()]
+    assert load_checkpoint("../settings", str(directory))["text"] == "x"
+    await pipeline.emit("conversation_saved", conversation_id="../settings")
+    await pipeline.end_run()
+    await pipeline.flush()
+    assert settings.read_text() == "{}"
+
+    # A checkpoint file planted as a symlink out of the directory is never followed
+    checkpoint_path("conv-1", str(directory)).symlink_to(settings)
+    with pytest.raises(ValueError):
+        checkpoint_path("conv-1", str(directory))
+    assert load_checkpoint("conv-1", str(directory)) is None
+    await pipeline.close()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_internal_events_are_not_sent_to_clients():
+    messenger = QueueMessenger()
+    pipeline = EventPipeline()
+    pipeline.add_sink(MessengerSink(messenger))
+    pipeline.begin_run("conv-1")
+    await pipeline.emit("assistant_complete")
+    await pipeline.end_run()
+    await pipeline.flush()
+    assert messenger.queue.qsize() == 1
+    assert messenger.queue.get_nowait()[0] == "assistant_complete"
+    await pipeline.close()
+
+def test_sinks_must_implement_handle():
+    class Incomplete(EventSink):
+        pass
+
+    with pytest.raises(TypeError):
+        Incomplete()
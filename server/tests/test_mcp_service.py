@@ -0,0 +1,651 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import os
+from types import SimpleNamespace
+import pytest
+
+from pydantic_ai.tools import ToolDefinition
+
+from services.mcp_catalog import ToolCatalogStore
+from services.mcp_service import GlobalMCPManager, FAILED, IDLE, RUNNING, STARTING
+
+class FakeServer:
+    def __init__(self, delay=0.0, error=None):
+        self.delay = delay
+        self.error = error
+        self.exited = False
+
+    async def __aenter__(self):
+        await asyncio.sleep(self.delay)
+        if self.error:
+            raise RuntimeError(self.error)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.exited = True
+
+@pytest.fixture
+def mcp_manager(monkeypatch):
+    fakes = {
+        "fast": FakeServer(delay=0.05),
+        "slow": FakeServer(delay=0.1),
+        "hung": FakeServer(delay=60),
+        "broken": FakeServer(error="command not found"),
+    }
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", lambda config: fakes[config["command"]])
+    return manager, fakes
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_servers_start_concurrently_with_timeouts(mcp_manager):
+    manager, fakes = mcp_manager
+    config = {
+        "fast": {"command": "fast"},
+        "slow": {"command": "slow"},
+        "hung": {"command": "hung", "startup_timeout": 0.2},
+        "broken": {"command": "broken"},
+    }
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+
+    # Starting returns immediately; servers report their own readiness
+    await manager._start_servers(config)
+    manager._initialized = True
+    assert loop.time() - started < 0.05
+    assert not manager.is_ready()
+    assert manager.get_server_states()["slow"]["state"] == STARTING
+
+    assert await manager.wait_until_ready(timeout=1)
+    # Bounded by the slowest timeout, not the sum of start times
+    assert loop.time() - started < 0.5
+    assert manager.is_ready()
+
+    states = manager.get_server_states()
+    assert states["fast"]["state"] == RUNNING and states["fast"]["running"]
+    assert states["slow"]["state"] == RUNNING
+    assert states["hung"]["state"] == FAILED and "0.2s" in states["hung"]["error"]
+    assert states["broken"]["state"] == FAILED and states["broken"]["error"] == "command not found"
+    assert manager.get_enabled_servers() == [fakes["fast"], fakes["slow"]]
+
+    await manager.shutdown()
+    assert fakes["fast"].exited and fakes["slow"].exited
+    assert not fakes["hung"].exited
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_settings_changes_do_not_wait_for_servers_to_start(mcp_manager):
+    from core.config import ConfigChangeEvent
+
+    manager, fakes = mcp_manager
+    old = {"fast": {"command": "fast"}}
+    await manager._start_servers(old, wait=True)
+    new = {**old, "hung": {"command": "hung", "startup_timeout": 0.2}}
+
+    # The observer returns once the change is applied; the new server reports its own readiness
+    await asyncio.wait_for(manager._on_config_change(ConfigChangeEvent({"mcp_servers"}, {"mcp_servers": old}, {"mcp_servers": new})), 0.1)
+    assert manager.get_server("hung").state == STARTING
+    assert manager.get_server("fast").state == RUNNING
+
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_reconfiguration_only_touches_changed_servers(monkeypatch):
+    created = []
+
+    def create_server(config):
+        server = FakeServer()
+        created.append((config["command"], server))
+        return server
+
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    await manager._start_servers({
+        "keep": {"command": "keep"},
+        "tune": {"command": "tune"},
+        "change": {"command": "change", "args": ["a"]},
+        "remove": {"command": "remove"},
+    }, wait=True)
+    servers = dict(created)
+    created.clear()
+
+    await manager._reconfigure_servers({
+        "keep": {"command": "keep"},
+        "tune": {"command": "tune", "max_concurrency": 4, "tool_timeout": 5},
+        "change": {"command": "change", "args": ["b"]},
+        "add": {"command": "add"},
+    }, wait=True)
+
+    assert sorted(command for command, _ in created) == ["add", "change"]
+    assert servers["remove"].exited and servers["change"].exited
+    assert not servers["keep"].exited and not servers["tune"].exited
+    assert manager.get_server("keep").server is servers["keep"]
+    assert manager.get_server_semaphore("tune")._value == 4
+    assert set(manager.get_server_states()) == {"keep", "tune", "change", "add"}
+    assert all(state["running"] for state in manager.get_server_states().values())
+
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_registry_tracks_servers_by_name(monkeypatch):
+    manager = GlobalMCPManager()
+
+    def create_server(config):
+        if config["command"] == "missing":
+            raise FileNotFoundError("missing")
+        return FakeServer()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+
+    # A server that cannot be created does not shift the others
+    await manager._start_servers({
+        "missing": {"command": "missing"},
+        "files": {"command": "files", "env": {"TOKEN": "secret"}},
+    }, wait=True)
+    files = manager.get_server("files")
+    assert manager.get_server_name(files.server) == "files"
+    assert manager.get_enabled_servers() == [files.server]
+    assert manager.get_server_states()["missing"]["state"] == FAILED
+    assert await manager.health_check() == {"missing": False, "files": True}
+
+    manager.record_tool_call("files", 0.5)
+    manager.record_tool_call("files", 1.5, "error")
+    details = files.describe()
+    assert details["stats"]["tool_calls"] == 2 and details["stats"]["tool_errors"] == 1
+    assert details["stats"]["average_latency"] == 1.0
+    assert details["config"]["env"] == ["TOKEN"]
+    assert details["uptime"] is not None
+
+    await manager.shutdown()
+
+class PingClient:
+    def __init__(self):
+        self.healthy = True
+
+    async def send_ping(self):
+        if not self.healthy:
+            raise ConnectionError("broken pipe")
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_supervisor_restarts_dead_servers_until_crash_loop(monkeypatch):
+    import services.mcp_service as mcp_service
+
+    monkeypatch.setattr(mcp_service, "PROBE_INTERVAL", 0)
+    monkeypatch.setattr(mcp_service, "PROBE_FAILURE_THRESHOLD", 1)
+    monkeypatch.setattr(mcp_service, "RESTART_BACKOFF_BASE", 0)
+    monkeypatch.setattr(mcp_service, "CRASH_LOOP_LIMIT", 2)
+    clients = []
+
+    def create_server(config):
+        server = FakeServer()
+        server._client = PingClient()
+        clients.append(server._client)
+        return server
+
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    await manager._start_servers({"flaky": {"command": "flaky"}}, wait=True)
+
+    # A healthy server is probed and left alone
+    await manager._supervise_server(manager.get_server("flaky"))
+    handle = manager.get_server("flaky")
+    assert handle.probe_latency is not None and handle.restarts == 0
+
+    # A server that stops answering pings is replaced, keeping its history
+    for expected_restarts in (1, 2):
+        clients[-1].healthy = False
+        await manager._supervise_server(manager.get_server("flaky"))
+        await manager.wait_until_ready()
+        handle = manager.get_server("flaky")
+        assert handle.state == RUNNING
+        assert handle.restarts == expected_restarts
+        assert handle.last_error == "probe failed: broken pipe"
+
+    # ...until it keeps dying and the supervisor gives up
+    clients[-1].healthy = False
+    await manager._supervise_server(handle)
+    assert manager.get_server("flaky") is handle
+    assert handle.gave_up and handle.state == FAILED
+    assert handle.error.startswith("crash loop")
+    assert manager.get_server_states()["flaky"]["restarts"] == 2
+
+    await manager.shutdown()
+
+class FakeToolServer(FakeServer):
+    def __init__(self):
+        super().__init__()
+        self.listed = 0
+
+    async def get_tools(self, ctx):
+        self.listed += 1
+        return {"lookup": SimpleNamespace(tool_def=ToolDefinition(name="lookup"))}
+
+    def tool_for_tool_def(self, tool_def):
+        return SimpleNamespace(tool_def=tool_def)
+
+    async def call_tool(self, name, args, ctx, tool):
+        return f"{name} done"
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_lazy_servers_start_on_use_and_stop_when_idle(monkeypatch, tmp_path):
+    monkeypatch.setattr("services.mcp_registry.tool_catalog_store", ToolCatalogStore(tmp_path / "mcp_catalog.json"))
+    server = FakeToolServer()
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", lambda config: server)
+    await manager._start_servers({"docs": {"command": "docs", "lazy": True, "idle_timeout": 0.05}}, wait=True)
+    manager._initialized = True
+
+    handle = manager.get_server("docs")
+    assert handle.state == IDLE and manager.is_ready()
+    assert manager.get_enabled_handles() == [handle]
+    toolset = handle.toolset
+
+    # Listing tools the first time starts the server; later runs use the cached catalog
+    assert list(await toolset.get_tools(None)) == ["lookup"]
+    assert handle.state == RUNNING
+    await handle.stop_idle()
+    assert list(await toolset.get_tools(None)) == ["lookup"]
+    assert server.listed == 1 and handle.state == IDLE
+
+    # A call starts it again, and the supervisor stops it once idle
+    assert await toolset.call_tool("lookup", {}, None, None) == "lookup done"
+    assert handle.state == RUNNING
+    await asyncio.sleep(0.06)
+    await manager._supervise_server(handle)
+    assert handle.state == IDLE and server.exited
+
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_lazy_servers_serve_their_stored_catalog_until_started(monkeypatch, tmp_path):
+    catalog_file = tmp_path / "mcp_catalog.json"
+    config = {"docs": {"command": "docs", "lazy": True}}
+    servers = []
+    def create_server(config):
+        servers.append(FakeToolServer())
+        return servers[-1]
+
+    monkeypatch.setattr("services.mcp_registry.tool_catalog_store", ToolCatalogStore(catalog_file))
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    await manager._start_servers(config, wait=True)
+    assert list(await manager.get_server("docs").toolset.get_tools(None)) == ["lookup"]
+    await manager.shutdown()
+    assert catalog_file.exists()
+
+    # After a restart the stored tools are served without starting the server...
+    monkeypatch.setattr("services.mcp_registry.tool_catalog_store", ToolCatalogStore(catalog_file))
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    await manager._start_servers(config, wait=True)
+    handle = manager.get_server("docs")
+    assert list(await handle.toolset.get_tools(None)) == ["lookup"]
+    assert handle.state == IDLE and servers[-1].listed == 0
+
+    # ...until it starts, when its own listing replaces them
+    await handle.ensure_running()
+    await handle.toolset.get_tools(None)
+    assert servers[-1].listed == 1
+    await manager.shutdown()
+
+    # A changed config does not get the tools listed with the old one
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    await manager._start_servers({"docs": {"command": "docs", "args": ["--v2"], "lazy": True}}, wait=True)
+    await manager.get_server("docs").toolset.get_tools(None)
+    assert manager.get_server("docs").state == RUNNING and servers[-1].listed == 1
+    await manager.shutdown()
+
+class InterceptedToolServer(FakeToolServer):
+    """Routes calls through process_tool_call like pydantic-ai's MCPServer"""
+    process_tool_call = None
+
+    async def direct_call_tool(self, name, args, metadata=None):
+        return f"{name} done"
+
+    async def call_tool(self, name, args, ctx, tool):
+        return await self.process_tool_call(ctx, self.direct_call_tool, name, args)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_lazy_servers_start_only_for_approved_calls(monkeypatch):
+    from functools import partial
+    from services.mcp_agent import MCPAgentManager, process_tool_call
+    from services.tool_approval import ToolApprovalManager
+
+    server = InterceptedToolServer()
+    server.process_tool_call = partial(process_tool_call, "docs")
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", lambda config: server)
+    async def get_mcp_manager():
+        return manager
+    monkeypatch.setattr("services.mcp_agent.get_mcp_manager", get_mcp_manager)
+    await manager._start_servers({"docs": {"command": "docs", "lazy": True}}, wait=True)
+    handle = manager.get_server("docs")
+
+    approvals = []
+    agent_manager = MCPAgentManager(ToolApprovalManager(None, auto_approve=False))
+    async def request_approval(tool_name, args, tool_call_id=None, server_name=None):
+        return approvals.pop(0)
+    monkeypatch.setattr(agent_manager.approval_manager, "request_approval", request_approval)
+    ctx = SimpleNamespace(deps=agent_manager, tool_call_id="1")
+
+    approvals.append(False)
+    assert await handle.toolset.call_tool("lookup", {}, ctx, None) == "Tool execution denied by user"
+    assert handle.state == IDLE
+
+    approvals.append(True)
+    assert await handle.toolset.call_tool("lookup", {}, ctx, None) == "lookup done"
+    assert handle.state == RUNNING and handle.active_uses == 0
+
+    await manager.shutdown()
+
+class NotifyingClient:
+    def __init__(self):
+        self.handled = []
+        self._message_handler = self.handle
+
+    async def handle(self, message):
+        self.handled.append(message)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_catalog_is_cached_until_the_server_reports_a_change(monkeypatch):
+    from mcp import types as mcp_types
+    from core.metrics import metrics
+
+    server = FakeToolServer()
+    server._client = NotifyingClient()
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", lambda config: server)
+    await manager._start_servers({"files": {"command": "files"}}, wait=True)
+    handle = manager.get_server("files")
+    hits = metrics.get("mcp.catalog.hits.tools")
+
+    for _ in range(3):
+        assert list(await handle.toolset.get_tools(None)) == ["lookup"]
+    assert server.listed == 1
+    assert metrics.get("mcp.catalog.hits.tools") == hits + 2
+
+    # The server announces new tools; the next run lists them again
+    notification = mcp_types.ServerNotification(
+        mcp_types.ToolListChangedNotification(method="notifications/tools/list_changed")
+    )
+    await server._client._message_handler(notification)
+    assert server._client.handled == [notification]
+    await handle.toolset.get_tools(None)
+    assert server.listed == 2
+
+    await manager.shutdown()
+
+class PooledServer(FakeServer):
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._client = PingClient()
+
+    async def direct_call_tool(self, name, args, metadata=None):
+        self.calls += 1
+        await asyncio.sleep(0.05)
+        return name
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_pooled_servers_scale_with_queued_calls(monkeypatch):
+    servers = []
+    def create_server(config):
+        servers.append(PooledServer())
+        return servers[-1]
+
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    config = {"command": "search", "stateless": True, "pool": {"min_instances": 1, "max_instances": 3, "idle_timeout": 0.05}}
+    await manager._start_servers({"search": config}, wait=True)
+    handle = manager.get_server("search")
+    assert handle.pool.describe()["instances"] == 1
+
+    async def call():
+        async with manager.acquire_server("search", servers[0].direct_call_tool) as call_tool:
+            return await call_tool("query", {})
+
+    # Queued calls grow the pool and are spread over every instance
+    assert await asyncio.gather(*(call() for _ in range(6))) == ["query"] * 6
+    assert len(servers) == 3
+    assert all(server.calls for server in servers)
+    assert handle.describe()["pool"]["in_flight"] == [0, 0, 0]
+
+    # Extra instances are stopped once idle, down to the minimum
+    await asyncio.sleep(0.06)
+    await manager._supervise_server(handle)
+    assert handle.pool.describe()["instances"] == 1
+    assert servers[1].exited and servers[2].exited and not servers[0].exited
+
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_dead_pool_instances_are_replaced(monkeypatch):
+    import services.mcp_service as mcp_service
+
+    monkeypatch.setattr(mcp_service, "PROBE_INTERVAL", 0)
+    monkeypatch.setattr(mcp_service, "PROBE_FAILURE_THRESHOLD", 1)
+    servers = []
+    def create_server(config):
+        servers.append(PooledServer())
+        return servers[-1]
+
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    config = {"command": "search", "stateless": True, "max_concurrency": 1, "pool": {"min_instances": 2, "max_instances": 2}}
+    await manager._start_servers({"search": config}, wait=True)
+    handle = manager.get_server("search")
+    await asyncio.sleep(0.01)
+    assert handle.pool.describe()["instances"] == 2
+
+    # The extra instance's process dies: it stops answering pings but its task stays open
+    dead = servers[1]
+    dead._client.healthy = False
+    await manager._supervise_server(handle)
+    await asyncio.sleep(0.01)
+    assert dead.exited
+    assert len(servers) == 3 and handle.pool.describe()["instances"] == 2
+
+    async def call():
+        async with manager.acquire_server("search", servers[0].direct_call_tool) as call_tool:
+            return await call_tool("query", {})
+
+    # Calls are routed to the primary and the replacement only
+    assert await asyncio.gather(call(), call()) == ["query", "query"]
+    assert dead.calls == 0 and servers[2].calls == 1
+
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stopping_a_pooled_server_fails_queued_calls(monkeypatch):
+    from core.exceptions import MCPServerError
+
+    servers = []
+    def create_server(config):
+        servers.append(PooledServer())
+        return servers[-1]
+
+    manager = GlobalMCPManager()
+    monkeypatch.setattr(manager, "_create_server", create_server)
+    config = {"command": "search", "stateless": True, "max_concurrency": 1, "pool": {"min_instances": 1, "max_instances": 1}}
+    await manager._start_servers({"search": config}, wait=True)
+    handle = manager.get_server("search")
+    release = asyncio.Event()
+
+    async def busy():
+        async with manager.acquire_server("search", servers[0].direct_call_tool):
+            await release.wait()
+
+    async def queued():
+        async with manager.acquire_server("search", servers[0].direct_call_tool) as call_tool:
+            return await call_tool("query", {})
+
+    holder = asyncio.create_task(busy())
+    await asyncio.sleep(0)
+    waiter = asyncio.create_task(queued())
+    await asyncio.sleep(0.01)
+    assert not waiter.done()
+
+    # The queued call is woken and fails instead of growing a pool that is gone
+    await handle.pool.stop()
+    with pytest.raises(MCPServerError, match="stopped"):
+        await asyncio.wait_for(waiter, timeout=1)
+    assert len(servers) == 1
+
+    release.set()
+    await holder
+    await manager.shutdown()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_url_servers_share_pooled_http_connections():
+    import uvicorn
+    from mcp.server.fastmcp import FastMCP
+    from pydantic_ai.mcp import MCPServerSSE
+
+    sidecar = FastMCP("echo", stateless_http=True)
+
+    @sidecar.tool()
+    def echo(text: str) -> str:
+        return text
+
+    http_server = uvicorn.Server(uvicorn.Config(sidecar.streamable_http_app(), host="127.0.0.1", port=0, log_level="warning"))
+    serving = asyncio.create_task(http_server.serve())
+    while not http_server.started:
+        await asyncio.sleep(0.01)
+    url = f"http://127.0.0.1:{http_server.servers[0].sockets[0].getsockname()[1]}/mcp"
+
+    manager = GlobalMCPManager()
+    try:
+        await manager._start_servers({
+            "first": {"url": url, "headers": {"X-Client": "elaris"}},
+            "second": {"url": url, "timeout": 2},
+            "down": {"url": "http://127.0.0.1:9/mcp"},
+        }, wait=True)
+        first, second, down = (manager.get_server(name) for name in ("first", "second", "down"))
+        assert first.state == RUNNING and second.state == RUNNING
+        assert down.state == FAILED and "connection" in down.error.lower()
+        assert first.semaphore._value == 8
+        assert first.describe()["config"]["headers"] == ["X-Client"]
+
+        # Stopping one server leaves the shared connection pool usable by the other
+        assert first.server.http_client._transport is second.server.http_client._transport
+        await first.stop()
+        assert await second.server.direct_call_tool("echo", {"text": "hi"}) == "hi"
+        assert await second.probe(5)
+
+        assert isinstance(manager._create_server({"url": "http://127.0.0.1:9/sse"}), MCPServerSSE)
+    finally:
+        await manager.shutdown()
+        http_server.should_exit = True
+        await serving
+
+FAKE_NPM = """#!/usr/bin/env python3
+import json, sys
+from pathlib import Path
+prefix = Path(sys.argv[sys.argv.index("--prefix") + 1])
+name, version = sys.argv[-1].rsplit("@", 1)
+package = prefix / "node_modules" / name
+(package / "dist").mkdir(parents=True)
+(package / "dist" / "index.js").write_text("#!/usr/bin/env node")
+manifest = {"name": name, "version": "2.0.0" if version == "latest" else version, "bin": {"docs-mcp": "dist/index.js"}}
+(package / "package.json").write_text(json.dumps(manifest))
+"""
+
+def test_npx_commands_are_parsed_into_packages():
+    from services.mcp_launcher import parse_npx
+
+    launch = parse_npx("npx", ["-y", "@acme/docs-mcp@1.2.3", "stdio"])
+    assert (launch.package, launch.version, launch.args) == ("@acme/docs-mcp", "1.2.3", ["stdio"])
+    assert parse_npx("/usr/bin/npx", ["--yes", "@acme/docs-mcp"]).version == "latest"
+    assert parse_npx("npx", ["-p", "@acme/docs-mcp", "docs"]) is None
+    assert parse_npx("npx", ["-y", "./local-server"]) is None
+    assert parse_npx("node", ["server.js"]) is None
+
+@pytest.fixture
+def launcher(monkeypatch, tmp_path):
+    from core.config import ConfigManager
+    from services.mcp_launcher import LaunchCache
+
+    bin_dir = tmp_path / "bin"
+    bin_dir.mkdir()
+    (bin_dir / "npm").write_text(FAKE_NPM)
+    (bin_dir / "npm").chmod(0o755)
+    monkeypatch.setenv("PATH", f"{bin_dir}{os.pathsep}{os.environ['PATH']}")
+
+    config = ConfigManager(str(tmp_path / "settings.json"))
+    cache = LaunchCache(str(tmp_path / "packages"))
+    monkeypatch.setattr("services.mcp_launcher.config_manager", config)
+    monkeypatch.setattr("services.mcp_service.launch_cache", cache)
+    return cache, config
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_npx_servers_are_installed_once_and_spawned_directly(launcher, tmp_path):
+    cache, config_manager = launcher
+
+    async def set_pins(pins):
+        await config_manager.update_value("mcp_package_pins", pins)
+
+    manager = GlobalMCPManager()
+    config = {"command": "npx", "args": ["-y", "@acme/docs-mcp", "stdio"]}
+    server = manager._create_server(config)
+    assert server.command == "npx"
+
+    # The first start installs and pins the package, later starts spawn its entry point directly
+    await manager._prepare_server(server)
+    entry = str((tmp_path / "packages" / "@acme__docs-mcp" / "node_modules" / "@acme/docs-mcp" / "dist" / "index.js").resolve())
+    assert server.args == [entry, "stdio"] and os.path.basename(server.command) == "node"
+    assert manager._create_server(config).args == [entry, "stdio"]
+    await cache.flush()
+    assert config_manager.snapshot.get("mcp_package_pins") == {"@acme/docs-mcp": "2.0.0"}
+
+    # Changing the pin reinstalls; preinstall=False keeps npx
+    await set_pins({"@acme/docs-mcp": "1.5.0"})
+    assert manager._create_server(config).command == "npx"
+    assert await cache.ensure_installed("npx", config["args"]) is not None
+    assert cache.installed_version("@acme/docs-mcp") == "1.5.0"
+    assert manager._create_server({**config, "preinstall": False}).command == "npx"
+
+    # An exact version in the command wins over the pin and is not pinned itself
+    exact = ["-y", "@acme/docs-mcp@1.7.0", "stdio"]
+    assert await cache.ensure_installed("npx", exact) is not None
+    assert cache.installed_version("@acme/docs-mcp") == "1.7.0"
+    await cache.flush()
+    assert config_manager.snapshot.get("mcp_package_pins") == {"@acme/docs-mcp": "1.5.0"}
+
+    # Refreshing installs the version the command asks for and moves the pin
+    assert await cache.refresh("npx", config["args"]) == ("@acme/docs-mcp", "2.0.0")
+    await cache.flush()
+    assert config_manager.snapshot.get("mcp_package_pins") == {"@acme/docs-mcp": "2.0.0"}
+    assert not [path for path in (tmp_path / "packages").iterdir() if path.name.startswith(".")]
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_installs_from_a_settings_observer_do_not_wait_on_the_save(launcher):
+    cache, config_manager = launcher
+    args = ["-y", "@acme/docs-mcp", "stdio"]
+
+    # Servers are (re)configured, and their packages installed, from inside the save that changed them
+    async def on_change(event):
+        if "mcp_servers" in event.changed_keys:
+            assert await cache.ensure_installed("npx", args) is not None
+    config_manager.add_observer(on_change)
+
+    config = await config_manager.load_config()
+    config["mcp_servers"] = {"docs": {"command": "npx", "args": args}}
+    await asyncio.wait_for(config_manager.save_config(config), timeout=10)
+    await asyncio.wait_for(cache.flush(), timeout=10)
+    assert config_manager.snapshot.get("mcp_package_pins") == {"@acme/docs-mcp": "2.0.0"}
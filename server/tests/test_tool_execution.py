@@ -0,0 +1,229 @@
+import sys
+from pathlib import Path
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import asyncio
+import pytest
+from contextlib import asynccontextmanager
+
+from types import SimpleNamespace
+
+from dataclasses import replace
+
+from core.config import ConfigChangeEvent, config_manager, freeze, thaw
+from services.mcp_agent import AgentCache, MCPAgentManager, process_tool_call
+from services.tool_approval import ToolApprovalManager
+from services.tool_cache import ToolResultCache
+
+class FakeMCPManager:
+    def __init__(self, max_concurrency=1, timeout=1.0, cache_tools=None):
+        self.semaphore = asyncio.Semaphore(max_concurrency)
+        self.timeout = timeout
+        self.cache_tools = cache_tools or {}
+
+    @asynccontextmanager
+    async def use_server(self, server_name):
+        yield
+
+    @asynccontextmanager
+    async def acquire_server(self, server_name, call_tool):
+        async with self.semaphore:
+            yield call_tool
+
+    async def get_tool_timeout(self, server_name, tool_name):
+        return self.timeout
+
+    def get_cache_ttl(self, server_name, tool_name):
+        return self.cache_tools.get(tool_name)
+
+    def get_enabled_handles(self):
+        return []
+
+    def record_tool_call(self, server_name, latency, outcome="ok"):
+        pass
+
+@pytest.fixture
+def agent_manager(monkeypatch):
+    def install(fake):
+        async def fake_get_mcp_manager():
+            return fake
+        monkeypatch.setattr("services.mcp_agent.get_mcp_manager", fake_get_mcp_manager)
+        return MCPAgentManager(ToolApprovalManager(None, auto_approve=True))
+    return install
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_calls_respect_server_concurrency(agent_manager):
+    manager = agent_manager(FakeMCPManager(max_concurrency=2))
+    running, peak = 0, 0
+
+    async def call_tool(name, args):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return args["n"]
+
+    results = await asyncio.gather(*(
+        manager._process_tool_call("srv", None, call_tool, "work", {"n": n}) for n in range(5)
+    ))
+    assert results == [0, 1, 2, 3, 4]
+    assert peak == 2
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_call_timeout_is_reported_to_the_model(agent_manager):
+    manager = agent_manager(FakeMCPManager(timeout=0.01))
+
+    async def call_tool(name, args):
+        await asyncio.sleep(1)
+
+    result = await manager._process_tool_call("srv", None, call_tool, "slow", {})
+    assert "timed out" in result
+    assert manager.tool_tasks == set()
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_tool_call_timeout_covers_waiting_for_a_server_slot(agent_manager):
+    fake = FakeMCPManager(timeout=0.05)
+    manager = agent_manager(fake)
+    calls = []
+
+    async def call_tool(name, args):
+        calls.append(name)
+        return name
+
+    # Every slot stays taken, so the call times out while queued and never runs
+    async with fake.semaphore:
+        result = await manager._process_tool_call("srv", None, call_tool, "queued", {})
+    assert "timed out" in result
+    assert calls == []
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_stop_cancels_in_flight_tool_calls(agent_manager):
+    manager = agent_manager(FakeMCPManager(max_concurrency=4, timeout=10))
+    started = asyncio.Event()
+
+    async def call_tool(name, args):
+        started.set()
+        await asyncio.sleep(10)
+
+    # pydantic-ai runs tool calls as their own tasks
+    tasks = [asyncio.create_task(manager._process_tool_call("srv", None, call_tool, "hang", {})) for _ in range(2)]
+    await started.wait()
+    assert manager.cancel_tool_calls() == 2
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, asyncio.CancelledError) for r in results)
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_opted_in_tool_results_are_cached(agent_manager, monkeypatch, tmp_path):
+    cache = ToolResultCache(tmp_path / "tool_cache.json")
+    monkeypatch.setattr("services.mcp_agent.tool_result_cache", cache)
+    monkeypatch.setattr(ToolResultCache, "max_entries", property(lambda self: 2))
+    monkeypatch.setattr(ToolResultCache, "persist", property(lambda self: True))
+    monkeypatch.setattr("services.tool_cache.TOOL_CACHE_WRITE_DELAY", 0)
+    manager = agent_manager(FakeMCPManager(cache_tools={"docs": 60}))
+    calls = []
+
+    async def call_tool(name, args):
+        calls.append(args)
+        if args.get("fail"):
+            raise RuntimeError("upstream down")
+        return {"answer": args["q"]}
+
+    # Identical arguments in any order hit the cache; tools that did not opt in never do
+    assert await manager._process_tool_call("srv", None, call_tool, "docs", {"q": "a", "lang": "py"}) == {"answer": "a"}
+    assert await manager._process_tool_call("srv", None, call_tool, "docs", {"lang": "py", "q": "a"}) == {"answer": "a"}
+    await manager._process_tool_call("srv", None, call_tool, "search", {"q": "a"})
+    await manager._process_tool_call("srv", None, call_tool, "search", {"q": "a"})
+    assert len(calls) == 3
+
+    # Failures are not cached
+    for _ in range(2):
+        assert "upstream down" in await manager._process_tool_call("srv", None, call_tool, "docs", {"q": "b", "fail": True})
+    assert len(calls) == 5
+
+    # The least recently used entry is evicted; the rest survive a restart through the cache file
+    await manager._process_tool_call("srv", None, call_tool, "docs", {"q": "c"})
+    await manager._process_tool_call("srv", None, call_tool, "docs", {"q": "d"})
+    await cache.flush()
+    restarted = ToolResultCache(tmp_path / "tool_cache.json")
+    assert (await restarted.get("srv", "docs", {"q": "d"})) == (True, {"answer": "d"})
+    assert (await restarted.get("srv", "docs", {"q": "a", "lang": "py"}))[0] is False
+
+    stats = cache.stats()
+    assert stats["tools"]["srv/docs"] == {"hits": 1, "misses": 5, "hit_rate": 1 / 6}
+    assert cache.clear("srv") == 2 and cache.stats()["entries"] == 0
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_agents_are_shared_until_their_config_changes(agent_manager, monkeypatch):
+    cache = AgentCache()
+    monkeypatch.setattr("services.mcp_agent.agent_cache", cache)
+    monkeypatch.setenv("OPENAI_API_KEY", "")
+
+    def configure(**changes):
+        values = {
+            "system_prompt": "Be brief.",
+            "llm_provider": {"provider": "openai", "model": "gpt-4o", "config": {"api_key": "sk-test"}},
+            **changes,
+        }
+        monkeypatch.setattr(config_manager, "_snapshot", replace(config_manager.snapshot, values=freeze(values)))
+
+    configure()
+    first = agent_manager(FakeMCPManager())
+    second = MCPAgentManager(ToolApprovalManager(None, auto_approve=True))
+    agent = await first.create_agent()
+    assert await second.create_agent() is agent
+
+    # A new system prompt builds a new agent on the same model and provider client
+    configure(system_prompt="Be thorough.")
+    cache._on_config_change(ConfigChangeEvent({"system_prompt"}, {}, {}))
+    rebuilt = await first.create_agent()
+    assert rebuilt is not agent
+    assert rebuilt.model is agent.model
+
+    # A new provider configuration builds a new model
+    configure(llm_provider={"provider": "openai", "model": "gpt-4o-mini", "config": {"api_key": "sk-test"}})
+    cache._on_config_change(ConfigChangeEvent({"llm_provider"}, {}, {}))
+    assert (await first.create_agent()).model is not agent.model
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_agent_cache_evicts_the_least_recently_used_agent(agent_manager, monkeypatch):
+    from pydantic_ai.models.test import TestModel
+
+    cache = AgentCache()
+    monkeypatch.setattr("services.mcp_agent.agent_cache", cache)
+    monkeypatch.setattr("services.mcp_agent.MAX_CACHED_AGENTS", 2)
+    monkeypatch.setattr(cache, "_get_model", lambda provider_config: TestModel())
+    manager = agent_manager(FakeMCPManager())
+
+    async def agent_for(prompt):
+        snapshot = config_manager.snapshot
+        monkeypatch.setattr(config_manager, "_snapshot", replace(snapshot, values=freeze({**thaw(snapshot.values), "system_prompt": prompt})))
+        return await manager.create_agent()
+
+    first = await agent_for("a")
+    await agent_for("b")
+    # Using the first agent again keeps it over the second
+    assert await agent_for("a") is first
+    await agent_for("c")
+    assert await agent_for("a") is first
+    assert len(cache.agents) == 2
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("anyio_backend", ["asyncio"])
+async def test_shared_servers_route_tool_calls_to_the_running_session(agent_manager):
+    manager = agent_manager(FakeMCPManager())
+    other = MCPAgentManager(ToolApprovalManager(None, auto_approve=False))
+
+    async def call_tool(name, args):
+        return "done"
+
+    result = await process_tool_call("srv", SimpleNamespace(deps=manager, tool_call_id="1"), call_tool, "work", {})
+    assert result == "done"
+    assert not other.tool_tasks